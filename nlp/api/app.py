@@ -1,15 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import logging
-from src.data_preprocessing import DataPreprocessor
-from src.model import FAQClassifier
-from src.answer_finder import AnswerFinder
+from src.engine import FAQEngine
+from src.config import MICRO_BATCHING_ENABLED, PREDICT_BATCH_CHUNK_SIZE, ADMIN_TOKEN
 import threading
 import time
 from collections import deque
 import statistics
 import os
 import json
+import hmac
 
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -26,9 +26,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Variables globales pour les modèles
-preprocessor = None
-classifier = None
-answer_finder = None
+engine = None
 models_loaded = False
 loading_error = None
 
@@ -42,18 +40,16 @@ performance_stats = {
 
 def load_models():
     """Charge les modèles en arrière-plan."""
-    global preprocessor, classifier, answer_finder, models_loaded, loading_error
+    global engine, models_loaded, loading_error
     try:
         logger.info("Début du chargement des modèles...")
         start_time = time.time()
         
-        # Charger les modèles
-        preprocessor = DataPreprocessor()
-        classifier = FAQClassifier.load()
-        answer_finder = AnswerFinder()
+        # Charger les modèles (un seul encodeur partagé par tout le pipeline)
+        engine = FAQEngine(micro_batching=MICRO_BATCHING_ENABLED)
         
         # Vérifier que tout est chargé
-        if preprocessor and classifier and answer_finder:
+        if engine.classifier and engine.answer_finder:
             models_loaded = True
             load_time = time.time() - start_time
             logger.info(f"Modèles chargés avec succès en {load_time:.2f} secondes")
@@ -99,45 +95,24 @@ def predict_category():
  
         question = data['question']
 
-        # Prétraiter la question
-        embedding = preprocessor.preprocess_single_text(question)
-        # Reshape l'embedding en 2D (1, n_features)
-        embedding = embedding.reshape(1, -1)
-        
-        # Prédire la catégorie
-        prediction = classifier.predict_with_confidence(embedding, questions=[question])
-        
-        # Trouver la meilleure réponse
-        answer = answer_finder.find_best_answer(
-            question,
-            prediction[0]['category'],
-            min_similarity=0.7
-        )
+        # Encoder une seule fois, classer puis chercher la réponse
+        result = engine.predict(question, min_similarity=0.7)
         
         # Mettre à jour les statistiques
         request_time = time.time() - start_time
         performance_stats['request_times'].append(request_time)
         
         # Vérifier si le cache a été utilisé
-        cache_stats = preprocessor.get_cache_stats()
-        if cache_stats['size'] > 0:
+        if result['cache_hit']:
             performance_stats['cache_hits'] += 1
 
-        return jsonify({
-            "success": True,
-            "category": prediction[0]['category'],
-            "probabilities": prediction[0]['probabilities'],
-            "confidence": prediction[0]['confidence'],
-            "answer": answer['answer'],
-            "similarity": answer['similarity'],
-            "best_question": answer['best_question'],
-            "answer_is_confident": answer['is_confident'],
-            "answer_alternatives": answer['alternatives'],
-            "performance": {
-                "request_time": request_time,
-                "cache_hit": cache_stats['size'] > 0
-            }
-        })
+        response = _format_result(result)
+        response["performance"] = {
+            "request_time": request_time,
+            "cache_hit": result['cache_hit'],
+            "response_cache_hit": result['response_cache_hit']
+        }
+        return jsonify(response)
     except Exception as e:
         logger.error(f"Erreur lors de la prédiction: {str(e)}")
         return jsonify({
@@ -145,6 +120,128 @@ def predict_category():
             "error": f"Erreur lors de la prédiction: {str(e)}"
         }), 500
 
+def _format_result(result):
+    """Met en forme un résultat de FAQEngine pour la réponse JSON."""
+    prediction = result['prediction']
+    answer = result['answer']
+    return {
+        "success": True,
+        "category": prediction['category'],
+        "probabilities": prediction['probabilities'],
+        "confidence": prediction['confidence'],
+        "answer": answer['answer'],
+        "similarity": answer['similarity'],
+        "best_question": answer['best_question'],
+        "answer_is_confident": answer['is_confident'],
+        "answer_alternatives": answer['alternatives']
+    }
+
+def _iter_batch_questions(payload):
+    """Itère sur les questions d'un tableau JSON ou d'un flux NDJSON."""
+    if payload is None:
+        # NDJSON : une question par ligne, lue au fil de l'eau
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+    else:
+        yield from payload
+
+def _extract_question(item):
+    """Retourne la question d'un élément (chaîne ou objet avec 'question')."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict) and isinstance(item.get('question'), str):
+        return item['question']
+    return None
+
+def _predict_chunk(chunk):
+    """
+    Encode, classe et cherche les réponses d'une tranche de questions.
+    
+    Une erreur du moteur donne une ligne d'erreur par question de la tranche :
+    la réponse est déjà partie (200), le flux continue avec la tranche suivante.
+    """
+    try:
+        results = engine.predict_batch([question for _, question in chunk], min_similarity=0.7)
+        if len(results) != len(chunk):
+            raise RuntimeError(f"{len(results)} résultats pour {len(chunk)} questions")
+        responses = []
+        for (position, question), result in zip(chunk, results):
+            response = _format_result(result)
+            response["index"] = position
+            response["question"] = question
+            responses.append(response)
+        return responses
+    except Exception as e:
+        logger.error(f"Erreur lors de la prédiction d'une tranche de {len(chunk)} questions: {str(e)}")
+        return [{
+            "index": position,
+            "success": False,
+            "error": f"Erreur lors de la prédiction: {str(e)}"
+        } for position, _ in chunk]
+
+def _stream_batch_predictions(payload):
+    """Produit les résultats NDJSON tranche par tranche."""
+    chunk = []
+    for position, item in enumerate(_iter_batch_questions(payload)):
+        question = _extract_question(item)
+        if question is None:
+            yield json.dumps({
+                "index": position,
+                "success": False,
+                "error": "Question manquante ou invalide"
+            }, ensure_ascii=False) + "\n"
+            continue
+        
+        chunk.append((position, question))
+        if len(chunk) >= PREDICT_BATCH_CHUNK_SIZE:
+            for result in _predict_chunk(chunk):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            chunk = []
+    
+    if chunk:
+        for result in _predict_chunk(chunk):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+@app.route('/predict-batch', methods=['POST'])
+def predict_batch():
+    """Endpoint pour prédire un lot de questions, résultats renvoyés en NDJSON."""
+    if not models_loaded:
+        if loading_error:
+            return jsonify({
+                "success": False,
+                "error": f"Erreur de chargement des modèles: {loading_error}"
+            }), 500
+        return jsonify({
+            "success": False,
+            "error": "Les modèles sont en cours de chargement. Veuillez réessayer dans quelques secondes."
+        }), 503
+    
+    performance_stats['total_requests'] += 1
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        payload = None
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('questions')
+        if not isinstance(data, list):
+            return jsonify({
+                "success": False,
+                "error": "Un tableau JSON de questions ou un flux NDJSON est requis"
+            }), 400
+        payload = data
+    
+    return Response(
+        stream_with_context(_stream_batch_predictions(payload)),
+        mimetype='application/x-ndjson'
+    )
+
 @app.route('/performance', methods=['GET'])
 def get_performance():
     """Endpoint pour obtenir les statistiques de performance."""
@@ -171,7 +268,9 @@ def get_performance():
             "min_time": min(times),
             "max_time": max(times),
             "median_time": statistics.median(times),
-            "uptime": time.time() - performance_stats['start_time'] if performance_stats['start_time'] else 0
+            "uptime": time.time() - performance_stats['start_time'] if performance_stats['start_time'] else 0,
+            "batching": engine.batcher.get_stats() if engine.batcher is not None else None,
+            "caches": engine.get_cache_stats()
         }
     })
 
@@ -185,8 +284,7 @@ def clear_cache():
         }), 503
     
     try:
-        preprocessor.clear_cache()
-        answer_finder.clear_cache()
+        engine.clear_cache()
         return jsonify({
             "success": True,
             "message": "Cache vidé avec succès"
@@ -197,6 +295,59 @@ def clear_cache():
             "error": f"Erreur lors du vidage du cache: {str(e)}"
         }), 500
 
+@app.route('/admin/faqs', methods=['POST'])
+def update_faqs():
+    """
+    Endpoint d'administration : applique un lot d'ajouts, modifications et
+    suppressions de FAQs au serveur en cours d'exécution.
+    
+    Corps attendu : {"upsert": [{"id"?, "question", "answer", "category"}], "delete": [id, ...]}
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({
+            "success": False,
+            "error": "Administration désactivée (FAQ_ADMIN_TOKEN non défini)"
+        }), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({
+            "success": False,
+            "error": "Jeton d'administration invalide"
+        }), 401
+    if not models_loaded:
+        return jsonify({
+            "success": False,
+            "error": "Les modèles ne sont pas encore chargés"
+        }), 503
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('upsert', []), list) \
+            or not isinstance(data.get('delete', []), list):
+        return jsonify({
+            "success": False,
+            "error": "Un objet JSON avec les listes 'upsert' et/ou 'delete' est requis"
+        }), 400
+    
+    try:
+        start_time = time.time()
+        summary = engine.update_faqs(data.get('upsert', []), data.get('delete', []))
+        return jsonify({
+            "success": True,
+            "upserted": summary['upserted'],
+            "deleted": summary['deleted'],
+            "update_time": time.time() - start_time
+        })
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des FAQs: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Erreur lors de la mise à jour des FAQs: {str(e)}"
+        }), 500
+
 @app.route('/status', methods=['GET'])
 def get_status():
     """Endpoint pour vérifier l'état des modèles."""
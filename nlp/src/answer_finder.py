@@ -4,145 +4,238 @@ from pathlib import Path
 import logging
 import faiss
 import os
+import copy
 from .data_preprocessing import DataPreprocessor
-from .config import DATA_DIR, MODELS_DIR
+from .normalization import normalize_question, normalize_questions
+from .config import (
+    DATA_DIR, SIMILARITY_CACHE_SIZE, CACHE_TTL, CROSS_CATEGORY_K, FAISS_INDEX_TYPE, FAISS_STORAGE,
+    KEYWORD_CANNED_ANSWERS
+)
 from .model_singleton import ModelSingleton
+from .cache import LRUCache
+from .faq_index import FAQIndex, index_params, resolve_index_type
 
 logger = logging.getLogger(__name__)
 
 class AnswerFinder:
-    def __init__(self, faq_data_path=None):
+    def __init__(self, faq_data_path=None, preprocessor=None, full_rebuild=False):
         """
         Initialise le chercheur de réponses avec FAISS pour une recherche rapide.
         
         Args:
             faq_data_path (str, optional): Chemin vers le fichier CSV des FAQ
+            preprocessor (DataPreprocessor, optional): Préprocesseur partagé
+                (et son cache) ; un nouveau est créé si absent
+            full_rebuild (bool): Réencoder toute la base au lieu des seules
+                catégories modifiées
         """
         # Utiliser le singleton pour le modèle
         model_singleton = ModelSingleton()
-        self.preprocessor = DataPreprocessor()
-        self.question_embeddings = {}
-        self.faiss_indices = {}
-        self.similarity_cache = {}  # Cache pour les similarités
+        self.preprocessor = preprocessor if preprocessor is not None else DataPreprocessor()
+        self.index = None  # Index FAISS unique sur toutes les catégories
+        self.similarity_cache = LRUCache(max_entries=SIMILARITY_CACHE_SIZE, ttl=CACHE_TTL)  # Cache pour les similarités
+        self._lexical = None  # (index, {catégorie: {question normalisée: ligne}})
         
         try:
             # Charger les données FAQ
-            if faq_data_path:
-                self.faq_data = pd.read_csv(faq_data_path)
-            else:
-                self.faq_data = pd.read_csv(DATA_DIR / "faqs_clean.csv")
+            self.faq_data_path = Path(faq_data_path) if faq_data_path else DATA_DIR / "faqs_clean.csv"
+            self.faq_data = pd.read_csv(self.faq_data_path)
             
-            # Vérifier si les indices FAISS existent déjà
-            if self._check_faiss_indices():
-                self._load_faiss_indices()
-            else:
-                self._prepare_embeddings()
-                self._save_faiss_indices()
+            # Charger l'index FAISS et ne reconstruire que ce qui a changé
+            self.last_sync = self.sync_index(full=full_rebuild)
             
             logger.info(f"Base de connaissances chargée avec {len(self.faq_data)} questions/réponses")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation: {str(e)}")
             raise
     
-    def _check_faiss_indices(self) -> bool:
-        """Vérifie si les indices FAISS existent déjà."""
-        index_dir = MODELS_DIR / "faiss_indices"
-        if not index_dir.exists():
-            return False
-        
-        # Vérifier que tous les indices nécessaires existent
-        for category in self.faq_data['Categorie'].unique():
-            index_path = index_dir / f"{category}.index"
-            if not index_path.exists():
-                return False
-        
-        return True
+    def artifact_paths(self) -> list:
+        """Fichiers d'index lus au chargement, utilisés pour détecter une reconstruction."""
+        return [FAQIndex.path()]
+    
+    def _index_matches_encoder(self) -> bool:
+        """Vérifie que l'index chargé provient de l'encodeur courant."""
+        if self.index.encoder_fingerprint is not None:
+            return self.index.encoder_fingerprint == ModelSingleton().get_fingerprint()
+        return self.index.dim == self.preprocessor.model.config.hidden_size
     
-    def _load_faiss_indices(self):
-        """Charge les indices FAISS pré-calculés."""
-        index_dir = MODELS_DIR / "faiss_indices"
-        logger.info("Chargement des indices FAISS pré-calculés...")
-        
-        for category in self.faq_data['Categorie'].unique():
-            try:
-                # Charger l'index
-                index_path = index_dir / f"{category}.index"
-                index = faiss.read_index(str(index_path))
-                
-                # Charger les données associées
-                data_path = index_dir / f"{category}_data.npz"
-                data = np.load(data_path, allow_pickle=True)
-                
-                self.question_embeddings[category] = {
-                    'questions': data['questions'].tolist(),
-                    'answers': data['answers'].tolist(),
-                    'embeddings': data['embeddings']
-                }
-                self.faiss_indices[category] = index
-                
-                logger.debug(f"Index FAISS chargé pour la catégorie {category}")
-            except Exception as e:
-                logger.error(f"Erreur lors du chargement de l'index pour {category}: {str(e)}")
-                raise
+    def sync_index(self, full: bool = False) -> dict:
+        """
+        Met l'index FAISS sauvegardé en accord avec le CSV, l'encodeur et la
+        configuration, en refaisant le moins de travail possible :
+        
+        - autre encodeur (ou index absent, ou `full`) : tout est réencodé ;
+        - autres paramètres d'index : l'index est reconstruit à partir des
+          vecteurs sauvegardés, sans réencodage ;
+        - sinon, seules les catégories dont le contenu a changé dans le CSV
+          sont réencodées et remplacées dans l'index.
+        
+        Returns:
+            dict: Action effectuée ('full', 'reindex', 'categories' ou 'none'),
+                catégories et nombre de questions réencodées
+        """
+        if full or not FAQIndex.exists():
+            self.rebuild_indices()
+            return {'action': 'full', 'categories': list(self.index.categories), 'embedded': len(self.faq_data)}
+        
+        logger.info("Chargement de l'index FAISS pré-calculé...")
+        self.index = FAQIndex.load()
+        
+        # Un index construit avec un autre encodeur (autre modèle, nombre de
+        # couches ou précision) n'est pas comparable aux embeddings des questions
+        if not self._index_matches_encoder():
+            logger.warning("Index FAISS construit avec un autre encodeur, reconstruction...")
+            self.rebuild_indices()
+            return {'action': 'full', 'categories': list(self.index.categories), 'embedded': len(self.faq_data)}
+        
+        action = 'none'
+        index_type = resolve_index_type(FAISS_INDEX_TYPE, len(self.index))
+        if self.index.params != index_params(index_type, FAISS_STORAGE):
+            logger.warning(f"Index FAISS {self.index.params} différent de la configuration, "
+                           f"reconstruction à partir des vecteurs sauvegardés...")
+            self.index = self.index.rebuilt(index_type, FAISS_STORAGE)
+            action = 'reindex'
+        
+        ids = self._row_ids()
+        row_categories = self.faq_data['Categorie'].to_numpy(dtype=object)
+        questions = self.faq_data['question'].to_numpy(dtype=object)
+        answers = self.faq_data['Réponse'].to_numpy(dtype=object)
+        stale = self.index.stale_categories(ids, row_categories, questions, answers)
+        embedded = 0
+        if stale:
+            logger.info(f"Catégories modifiées dans le CSV, réencodage: {', '.join(map(str, stale))}")
+            rows = np.isin(row_categories, stale)
+            old_rows = self.index.live_rows()
+            old_rows = old_rows[np.isin([self.index.category_of(row) for row in old_rows], stale)]
+            embeddings = self.preprocessor.embed_batch(questions[rows].tolist()) if rows.any() \
+                else np.empty((0, self.index.dim))
+            self.index = self.index.updated(ids[rows], embeddings, row_categories[rows].tolist(),
+                                            questions[rows].tolist(), answers[rows].tolist(), old_rows)
+            embedded = int(rows.sum())
+            action = 'categories'
+        
+        if action != 'none':
+            self.index.save()
+            # Relire l'index projeté en mémoire plutôt que garder la copie construite
+            self.index = FAQIndex.load()
+            self.similarity_cache.clear()
+        return {'action': action, 'categories': stale, 'embedded': embedded}
+    
+    def rebuild_indices(self):
+        """Recalcule les embeddings de la base FAQ avec l'encodeur courant et réécrit l'index FAISS."""
+        # Encoder toute la base en une seule passe par lots
+        embeddings = self.preprocessor.embed_batch(self.faq_data['question'].tolist())
+        self.index = FAQIndex.build(
+            embeddings,
+            self.faq_data['Categorie'].tolist(),
+            self.faq_data['question'].tolist(),
+            self.faq_data['Réponse'].tolist(),
+            encoder_fingerprint=ModelSingleton().get_fingerprint(),
+            ids=self._row_ids()
+        )
+        self.index.save()
+        # Relire l'index projeté en mémoire plutôt que garder la copie construite
+        self.index = FAQIndex.load()
+        self.similarity_cache.clear()
+    
+    def _row_ids(self) -> np.ndarray:
+        """Identifiants stables des FAQs : colonne 'id' du CSV, ou position de la ligne."""
+        if 'id' in self.faq_data.columns:
+            return self.faq_data['id'].to_numpy(dtype='int64')
+        return np.arange(len(self.faq_data), dtype='int64')
+    
+    def with_changes(self, upserts: list = (), delete_ids: list = ()) -> tuple:
+        """
+        Applique des ajouts, modifications et suppressions de FAQs.
+        
+        Seules les questions ajoutées ou modifiées sont encodées. Le nouvel
+        index et le CSV sont sauvegardés, puis un nouveau chercheur est
+        retourné ; celui-ci reste inchangé et continue de servir les requêtes
+        en cours jusqu'à ce que l'appelant remplace sa référence.
+        
+        Args:
+            upserts (list): Dictionnaires {'question', 'answer', 'category'} et
+                éventuellement 'id' (FAQ existante à remplacer)
+            delete_ids (list): Identifiants des FAQs à supprimer
+            
+        Returns:
+            tuple: (nouvel AnswerFinder, {'upserted': [ids], 'deleted': [ids]})
+        """
+        delete_ids = [int(faq_id) for faq_id in delete_ids]
+        for faq_id in delete_ids:
+            if not self.index.is_live(faq_id):
+                raise ValueError(f"FAQ inconnue: {faq_id}")
+        
+        next_id = len(self.index.category_ids)
+        ids, questions, answers, categories = [], [], [], []
+        for change in upserts:
+            for field in ('question', 'answer', 'category'):
+                if not isinstance(change.get(field), str) or not change[field].strip():
+                    raise ValueError(f"Champ '{field}' manquant ou vide")
+            if change.get('id') is None:
+                faq_id = next_id
+                next_id += 1
+            else:
+                faq_id = int(change['id'])
+                if not self.index.is_live(faq_id) or faq_id in delete_ids:
+                    raise ValueError(f"FAQ inconnue: {faq_id}")
+            if faq_id in ids:
+                raise ValueError(f"FAQ {faq_id} modifiée deux fois")
+            ids.append(faq_id)
+            questions.append(change['question'].strip())
+            answers.append(change['answer'].strip())
+            categories.append(change['category'].strip())
+        
+        embeddings = self.preprocessor.embed_batch(questions) if questions else np.empty((0, self.index.dim))
+        index = self.index.updated(ids, embeddings, categories, questions, answers, delete_ids)
+        
+        # Le CSV porte les identifiants pour qu'une reconstruction complète les conserve
+        faq_data = self.faq_data.assign(id=self._row_ids())
+        faq_data = faq_data[~faq_data['id'].isin(delete_ids + ids)]
+        changed = pd.DataFrame({'question': questions, 'Réponse': answers, 'Categorie': categories, 'id': ids})
+        faq_data = pd.concat([faq_data, changed], ignore_index=True).sort_values('id', kind='stable')
+        faq_data = faq_data.reset_index(drop=True)
+        
+        index.save()
+        tmp_path = self.faq_data_path.with_name(self.faq_data_path.name + ".tmp")
+        faq_data.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.faq_data_path)
+        
+        finder = copy.copy(self)
+        finder.faq_data = faq_data
+        finder.index = FAQIndex.load()
+        finder.similarity_cache = LRUCache(max_entries=SIMILARITY_CACHE_SIZE, ttl=CACHE_TTL)
+        logger.info(f"FAQs mises à jour: {len(ids)} ajoutées ou modifiées, {len(delete_ids)} supprimées")
+        return finder, {'upserted': ids, 'deleted': delete_ids}
     
-    def _save_faiss_indices(self):
-        """Sauvegarde les indices FAISS et les données associées."""
-        index_dir = MODELS_DIR / "faiss_indices"
-        index_dir.mkdir(parents=True, exist_ok=True)
-        logger.info("Sauvegarde des indices FAISS...")
-        
-        for category in self.faq_data['Categorie'].unique():
-            try:
-                # Sauvegarder l'index
-                index_path = index_dir / f"{category}.index"
-                faiss.write_index(self.faiss_indices[category], str(index_path))
-                
-                # Sauvegarder les données associées
-                data_path = index_dir / f"{category}_data.npz"
-                np.savez(
-                    data_path,
-                    questions=self.question_embeddings[category]['questions'],
-                    answers=self.question_embeddings[category]['answers'],
-                    embeddings=self.question_embeddings[category]['embeddings']
-                )
-                
-                logger.debug(f"Index FAISS sauvegardé pour la catégorie {category}")
-            except Exception as e:
-                logger.error(f"Erreur lors de la sauvegarde de l'index pour {category}: {str(e)}")
-                raise
+    @staticmethod
+    def _to_similarities(distances: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Convertit les distances en similarités (1 - distance normalisée par requête)."""
+        valid = rows >= 0
+        distances = np.where(valid, distances, 0)
+        max_distance = np.max(distances, axis=1, keepdims=True)
+        similarities = 1 - (distances / (max_distance + 1e-8))  # Éviter division par zéro
+        return np.where(valid, similarities, 0)
     
-    def _prepare_embeddings(self):
-        """Prépare les embeddings et les indices FAISS pour toutes les questions par catégorie."""
-        for category in self.faq_data['Categorie'].unique():
-            try:
-                category_data = self.faq_data[self.faq_data['Categorie'] == category]
-                
-                # Préparer les embeddings
-                embeddings = []
-                for question in category_data['question']:
-                    embedding = self.preprocessor.preprocess_single_text(question)
-                    embeddings.append(embedding)
-                
-                embeddings = np.array(embeddings).astype('float32')
-                
-                # Créer l'index FAISS
-                index = faiss.IndexFlatL2(embeddings.shape[1])
-                index.add(embeddings)
-                
-                # Stocker les données par catégorie
-                self.question_embeddings[category] = {
-                    'questions': category_data['question'].tolist(),
-                    'answers': category_data['Réponse'].tolist(),
-                    'embeddings': embeddings
-                }
-                self.faiss_indices[category] = index
-                
-                logger.debug(f"Préparé {len(embeddings)} embeddings pour la catégorie {category}")
-            except Exception as e:
-                logger.error(f"Erreur lors de la préparation des embeddings pour {category}: {str(e)}")
-                raise
+    def _search(self, question_embeddings: np.ndarray, categories: list, k: int = 3, global_k: int = 0) -> tuple:
+        """
+        Recherche dans la catégorie de chaque question et, si demandé, dans toute la base, en un appel.
+        
+        Returns:
+            tuple: (lignes, similarités) dans la catégorie, puis (lignes, similarités)
+                globales ou (None, None)
+        """
+        distances, rows, global_distances, global_rows = self.index.search(
+            question_embeddings, categories, k, global_k
+        )
+        similarities = self._to_similarities(distances, rows)
+        global_similarities = None
+        if global_rows is not None:
+            global_similarities = self._to_similarities(global_distances, global_rows)
+        return rows, similarities, global_rows, global_similarities
     
-    def _compute_similarities(self, question_embedding: np.ndarray, category: str, k: int = 3) -> tuple:
+    def _compute_similarities(self, question_embedding: np.ndarray, category: str, k: int = 3,
+                              global_k: int = 0) -> tuple:
         """
         Calcule les similarités entre une question et les FAQs d'une catégorie.
         
@@ -150,33 +243,30 @@ class AnswerFinder:
             question_embedding: L'embedding de la question
             category: La catégorie à chercher
             k: Nombre de résultats à retourner
+            global_k: Nombre de résultats toutes catégories confondues (0 = aucun)
         
         Returns:
-            tuple: (distances, indices, similarities)
+            tuple: (lignes, similarités, lignes globales, similarités globales)
         """
         try:
             # Vérifier le cache
-            cache_key = f"{category}_{hash(question_embedding.tobytes())}"
-            if cache_key in self.similarity_cache:
-                return self.similarity_cache[cache_key]
-            
-            index = self.faiss_indices[category]
-            distances, indices = index.search(question_embedding, k)
+            cache_key = f"{category}_{k}_{global_k}_{hash(question_embedding.tobytes())}"
+            cached = self.similarity_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            # Convertir les distances en similarités (1 - distance normalisée)
-            max_distance = np.max(distances)
-            similarities = 1 - (distances / (max_distance + 1e-8))  # Éviter division par zéro
+            result = self._search(question_embedding, [category], k, global_k)
             
             # Mettre en cache
-            result = (distances, indices, similarities)
-            self.similarity_cache[cache_key] = result
+            self.similarity_cache.set(cache_key, result)
             
             return result
         except Exception as e:
             logger.error(f"Erreur lors du calcul des similarités: {str(e)}")
             raise
     
-    def find_best_answer(self, question: str, predicted_category: str, min_similarity: float = 0.7) -> dict:
+    def find_best_answer(self, question: str, predicted_category: str, min_similarity: float = 0.7,
+                         other_categories: bool = False) -> dict:
         """
         Trouve la meilleure réponse pour une question dans une catégorie en utilisant FAISS.
         
@@ -184,6 +274,8 @@ class AnswerFinder:
             question (str): La question à répondre
             predicted_category (str): La catégorie prédite
             min_similarity (float): Seuil minimum de similarité (0-1)
+            other_categories (bool): Ajouter aux alternatives les questions proches
+                des autres catégories (classification incertaine)
         
         Returns:
             dict: {
@@ -191,59 +283,209 @@ class AnswerFinder:
                 'similarity': float,  # Score de similarité (0-1)
                 'best_question': str,  # Question la plus similaire
                 'is_confident': int,  # Si la similarité est suffisante (0 ou 1)
-                'alternatives': list  # Autres réponses similaires
+                'alternatives': list  # Autres réponses similaires (avec leur catégorie)
             }
         """
-        if predicted_category not in self.question_embeddings:
-            return {
-                'answer': "Désolé, je n'ai pas de réponse dans cette catégorie.",
-                'similarity': 0.0,
-                'best_question': "",
-                'is_confident': 0,  # Convertir en int
-                'alternatives': []
-            }
+        if not self.index.has_category(predicted_category):
+            return self._empty_answer()
         
         try:
             # Préparer l'embedding de la question
             question_embedding = self.preprocessor.preprocess_single_text(question)
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de réponse: {str(e)}")
+            return self._error_answer()
+        
+        return self.find_best_answer_from_embedding(question_embedding, predicted_category, min_similarity,
+                                                    other_categories)
+    
+    def find_best_answer_from_embedding(self, question_embedding: np.ndarray, predicted_category: str,
+                                        min_similarity: float = 0.7, other_categories: bool = False) -> dict:
+        """
+        Trouve la meilleure réponse à partir d'un embedding déjà calculé.
+        
+        Args:
+            question_embedding (np.ndarray): L'embedding de la question
+            predicted_category (str): La catégorie prédite
+            min_similarity (float): Seuil minimum de similarité (0-1)
+            other_categories (bool): Voir find_best_answer
+        
+        Returns:
+            dict: Même format que find_best_answer
+        """
+        if not self.index.has_category(predicted_category):
+            return self._empty_answer()
+        
+        try:
             question_embedding = question_embedding.reshape(1, -1).astype('float32')
             
-            # Calculer les similarités
-            distances, indices, similarities = self._compute_similarities(question_embedding, predicted_category)
-            
-            # Trouver la meilleure correspondance
-            best_idx = indices[0][0]
-            best_similarity = float(similarities[0][0])  # Convertir en float
-            
-            # Vérifier si la similarité est suffisante
-            is_confident = int(best_similarity >= min_similarity)  # Convertir en int
-            
-            # Préparer les alternatives
-            alternatives = []
-            for i in range(1, len(indices[0])):
-                if similarities[0][i] >= min_similarity:
-                    alternatives.append({
-                        'question': self.question_embeddings[predicted_category]['questions'][indices[0][i]],
-                        'answer': self.question_embeddings[predicted_category]['answers'][indices[0][i]],
-                        'similarity': float(similarities[0][i])  # Convertir en float
-                    })
+            # Calculer les similarités (et les voisins globaux si la catégorie est incertaine)
+            global_k = CROSS_CATEGORY_K if other_categories else 0
+            rows, similarities, global_rows, global_similarities = self._compute_similarities(
+                question_embedding, predicted_category, global_k=global_k
+            )
             
-            return {
-                'answer': self.question_embeddings[predicted_category]['answers'][best_idx],
-                'similarity': best_similarity,
-                'best_question': self.question_embeddings[predicted_category]['questions'][best_idx],
-                'is_confident': is_confident,  # Déjà converti en int
-                'alternatives': alternatives
-            }
+            return self._build_answer(
+                predicted_category, rows[0], similarities[0], min_similarity,
+                global_rows[0] if global_rows is not None else None,
+                global_similarities[0] if global_similarities is not None else None
+            )
         except Exception as e:
             logger.error(f"Erreur lors de la recherche de réponse: {str(e)}")
+            return self._error_answer()
+    
+    def find_best_answers_batch(self, question_embeddings: np.ndarray, predicted_categories: list,
+                                min_similarity: float = 0.7, k: int = 3, other_categories=False) -> list:
+        """
+        Trouve la meilleure réponse pour un lot de questions déjà encodées.
+        
+        Une seule recherche sur l'index global, restreinte à la catégorie
+        prédite de chaque question, et une recherche globale si au moins une
+        question en a besoin.
+        
+        Args:
+            question_embeddings (np.ndarray): Embeddings des questions (n, dim)
+            predicted_categories (list): Catégorie prédite pour chaque question
+            min_similarity (float): Seuil minimum de similarité (0-1)
+            k (int): Nombre de voisins recherchés par question
+            other_categories (bool ou list): Voir find_best_answer, pour tout le lot ou par question
+        
+        Returns:
+            list: Un dictionnaire au format de find_best_answer par question
+        """
+        if isinstance(other_categories, bool):
+            other_categories = [other_categories] * len(predicted_categories)
+        
+        try:
+            global_k = CROSS_CATEGORY_K if any(other_categories) else 0
+            rows, similarities, global_rows, global_similarities = self._search(
+                question_embeddings, predicted_categories, k, global_k
+            )
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche groupée: {str(e)}")
+            return [self._error_answer() for _ in predicted_categories]
+        
+        results = []
+        for position, category in enumerate(predicted_categories):
+            if not self.index.has_category(category):
+                results.append(self._empty_answer())
+                continue
+            
+            use_global = global_rows is not None and other_categories[position]
+            results.append(self._build_answer(
+                category, rows[position], similarities[position], min_similarity,
+                global_rows[position] if use_global else None,
+                global_similarities[position] if use_global else None
+            ))
+        
+        return results
+    
+    def keyword_answer(self, question: str, category: str) -> dict:
+        """
+        Réponse sans encodage pour une question routée par une règle de mot-clé :
+        la réponse fixe de la catégorie (KEYWORD_CANNED_ANSWERS), sinon la
+        FAQ de la catégorie dont la question normalisée est identique.
+        
+        Returns:
+            dict: Même format que find_best_answer, ou None s'il faut encoder la question
+        """
+        if category in KEYWORD_CANNED_ANSWERS:
             return {
-                'answer': "Désolé, une erreur s'est produite lors de la recherche de réponse.",
-                'similarity': 0.0,
+                'answer': KEYWORD_CANNED_ANSWERS[category],
+                'similarity': 1.0,
                 'best_question': "",
-                'is_confident': 0,  # Convertir en int
+                'is_confident': 1,
                 'alternatives': []
             }
+        if not self.index.has_category(category):
+            return None
+        row = self._lexical_rows(category).get(normalize_question(question))
+        if row is None:
+            return None
+        return {
+            'answer': self.index.answer_of(row),
+            'similarity': 1.0,
+            'best_question': self.index.questions[row],
+            'is_confident': 1,
+            'alternatives': []
+        }
+    
+    def _lexical_rows(self, category: str) -> dict:
+        """Questions normalisées d'une catégorie et leur ligne, calculées à la première utilisation."""
+        lexical = self._lexical
+        if lexical is None or lexical[0] is not self.index:
+            lexical = self._lexical = (self.index, {})
+        if category not in lexical[1]:
+            rows = {}
+            category_rows = self.index.category_rows(category)
+            keys = normalize_questions([self.index.questions[row] for row in category_rows])
+            for key, row in zip(keys, category_rows):
+                rows.setdefault(key, int(row))
+            lexical[1][category] = rows
+        return lexical[1][category]
+    
+    def _alternative(self, row: int, similarity: float) -> dict:
+        """Alternative proposée à l'utilisateur pour une ligne de l'index."""
+        return {
+            'question': self.index.questions[row],
+            'answer': self.index.answer_of(row),
+            'similarity': float(similarity),  # Convertir en float
+            'category': self.index.category_of(row)
+        }
+    
+    def _build_answer(self, category: str, rows: np.ndarray, similarities: np.ndarray, min_similarity: float,
+                      global_rows: np.ndarray = None, global_similarities: np.ndarray = None) -> dict:
+        """Construit la réponse à partir des voisins FAISS d'une question."""
+        # Trouver la meilleure correspondance
+        best_row = rows[0]
+        if best_row < 0:
+            return self._empty_answer()
+        best_similarity = float(similarities[0])  # Convertir en float
+        
+        # Vérifier si la similarité est suffisante
+        is_confident = int(best_similarity >= min_similarity)  # Convertir en int
+        
+        # Préparer les alternatives de la catégorie prédite
+        alternatives = []
+        for i in range(1, len(rows)):
+            if rows[i] >= 0 and similarities[i] >= min_similarity:
+                alternatives.append(self._alternative(rows[i], similarities[i]))
+        
+        # Puis celles des catégories voisines, issues de la recherche globale
+        if global_rows is not None:
+            for row, similarity in zip(global_rows, global_similarities):
+                if row >= 0 and similarity >= min_similarity and self.index.category_of(row) != category:
+                    alternatives.append(self._alternative(row, similarity))
+        
+        return {
+            'answer': self.index.answer_of(best_row),
+            'similarity': best_similarity,
+            'best_question': self.index.questions[best_row],
+            'is_confident': is_confident,  # Déjà converti en int
+            'alternatives': alternatives
+        }
+    
+    @staticmethod
+    def _empty_answer() -> dict:
+        """Réponse renvoyée lorsque la catégorie n'a pas de FAQ."""
+        return {
+            'answer': "Désolé, je n'ai pas de réponse dans cette catégorie.",
+            'similarity': 0.0,
+            'best_question': "",
+            'is_confident': 0,  # Convertir en int
+            'alternatives': []
+        }
+    
+    @staticmethod
+    def _error_answer() -> dict:
+        """Réponse renvoyée en cas d'erreur lors de la recherche."""
+        return {
+            'answer': "Désolé, une erreur s'est produite lors de la recherche de réponse.",
+            'similarity': 0.0,
+            'best_question': "",
+            'is_confident': 0,  # Convertir en int
+            'alternatives': []
+        }
     
     def find_answers_in_category(self, question: str, category: str, min_similarity: float = 0.7) -> list:
         """
@@ -257,7 +499,7 @@ class AnswerFinder:
         Returns:
             list: Liste des réponses avec leurs similarités
         """
-        if category not in self.question_embeddings:
+        if not self.index.has_category(category):
             return []
         
         try:
@@ -266,19 +508,19 @@ class AnswerFinder:
             question_embedding = question_embedding.reshape(1, -1).astype('float32')
             
             # Calculer les similarités
-            _, indices, similarities = self._compute_similarities(
+            rows, similarities, _, _ = self._compute_similarities(
                 question_embedding, 
                 category, 
-                k=len(self.question_embeddings[category]['questions'])
+                k=self.index.category_size(category)
             )
             
             # Trouver toutes les réponses au-dessus du seuil
             answers = []
-            for i in range(len(indices[0])):
-                if similarities[0][i] >= min_similarity:
+            for i in range(len(rows[0])):
+                if rows[0][i] >= 0 and similarities[0][i] >= min_similarity:
                     answers.append({
-                        'question': self.question_embeddings[category]['questions'][indices[0][i]],
-                        'answer': self.question_embeddings[category]['answers'][indices[0][i]],
+                        'question': self.index.questions[rows[0][i]],
+                        'answer': self.index.answer_of(rows[0][i]),
                         'similarity': similarities[0][i]
                     })
             
@@ -298,7 +540,7 @@ class AnswerFinder:
         Returns:
             list: Liste des 3 meilleures réponses avec leurs similarités
         """
-        if category not in self.question_embeddings:
+        if not self.index.has_category(category):
             return []
         
         try:
@@ -307,14 +549,16 @@ class AnswerFinder:
             question_embedding = question_embedding.reshape(1, -1).astype('float32')
             
             # Calculer les similarités
-            _, indices, similarities = self._compute_similarities(question_embedding, category, k=3)
+            rows, similarities, _, _ = self._compute_similarities(question_embedding, category, k=3)
             
             # Créer la liste des résultats
             results = []
-            for i in range(len(indices[0])):
+            for i in range(len(rows[0])):
+                if rows[0][i] < 0:
+                    continue
                 results.append({
-                    'question': self.question_embeddings[category]['questions'][indices[0][i]],
-                    'answer': self.question_embeddings[category]['answers'][indices[0][i]],
+                    'question': self.index.questions[rows[0][i]],
+                    'answer': self.index.answer_of(rows[0][i]),
                     'similarity': similarities[0][i]
                 })
             
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import random
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    AUGMENTATION_METHODS, NUM_AUGMENTATIONS, AUGMENTATION_WORKERS, AUGMENTATION_CHUNK_SIZE,
+    AUGMENTATION_CACHE_DIR, RANDOM_STATE
+)
+from .normalization import normalize_questions
+
+logger = logging.getLogger(__name__)
+
+# Variations de formulation (méthode 'formulation')
+FORMULATION_TEMPLATES = [
+    "Comment {text}",
+    "Quelle est la procédure pour {text}",
+    "Je souhaite savoir {text}",
+    "Pouvez-vous m'expliquer {text}",
+    "J'aimerais comprendre {text}",
+    "Pourriez-vous me dire {text}",
+    "Quelle est la méthode pour {text}",
+    "Quels sont les étapes pour {text}"
+]
+
+AUGMENTED_COLUMNS = ['question', 'question_clean', 'Réponse', 'Categorie']
+
+class Augmenter:
+    """
+    Générateur de variations d'une question.
+
+    Les augmenteurs nlpaug ('synonym' : synonymes WordNet, 'keyboard' :
+    fautes de frappe) sont créés une seule fois, à la construction ; nlpaug
+    n'est importé que si l'une de ces méthodes est demandée. Avec une graine,
+    les variations d'un texte ne dépendent que de ce texte et de la graine.
+    """
+
+    def __init__(self, methods: Sequence[str] = AUGMENTATION_METHODS, num_aug: int = NUM_AUGMENTATIONS):
+        unknown = set(methods) - {'synonym', 'keyboard', 'formulation'}
+        if unknown:
+            raise ValueError(f"Méthodes d'augmentation inconnues: {sorted(unknown)}")
+        self.methods = list(methods)
+        self.num_aug = num_aug
+        self._augmenters = []
+        if 'synonym' in self.methods:
+            import nlpaug.augmenter.word as naw
+            self._augmenters.append(naw.SynonymAug(aug_src='wordnet', lang='fra'))
+        if 'keyboard' in self.methods:
+            import nlpaug.augmenter.char as nac
+            self._augmenters.append(nac.KeyboardAug())
+
+    def augment(self, text: str, seed: Optional[int] = None) -> List[str]:
+        """
+        Variations de `text`, sans doublons et dans un ordre stable.
+
+        Avec `seed`, les générateurs globaux de random et numpy (ceux de nlpaug)
+        sont réinitialisés le temps de l'appel puis remis dans leur état
+        précédent : le processus appelant garde sa propre suite aléatoire.
+        """
+        if seed is None:
+            return self._augment(text)
+        random_state, numpy_state = random.getstate(), np.random.get_state()
+        # nlpaug tire ses positions et remplacements avec random et numpy
+        random.seed(seed)
+        np.random.seed(seed)
+        try:
+            return self._augment(text)
+        finally:
+            random.setstate(random_state)
+            np.random.set_state(numpy_state)
+
+    def _augment(self, text: str) -> List[str]:
+        augmented = []
+        for augmenter in self._augmenters:
+            variations = augmenter.augment(text, n=self.num_aug)
+            augmented.extend([variations] if isinstance(variations, str) else variations)
+        if 'formulation' in self.methods:
+            augmented.extend(template.format(text=text) for template in FORMULATION_TEMPLATES)
+
+        return [variation for variation in dict.fromkeys(augmented) if variation]
+
+def text_seed(text: str, seed: int = RANDOM_STATE) -> int:
+    """Graine d'un texte : identique quel que soit le processus ou le lot qui le traite."""
+    return int.from_bytes(hashlib.sha1(f"{seed}:{text}".encode('utf-8')).digest()[:4], 'little')
+
+_augmenters: Dict[Tuple[Tuple[str, ...], int], Augmenter] = {}
+
+def get_augmenter(methods: Sequence[str] = AUGMENTATION_METHODS, num_aug: int = NUM_AUGMENTATIONS) -> Augmenter:
+    """Augmenter partagé du processus courant pour ces méthodes (créé au premier appel)."""
+    key = (tuple(methods), num_aug)
+    if key not in _augmenters:
+        _augmenters[key] = Augmenter(methods, num_aug)
+    return _augmenters[key]
+
+def augment_text(text: str, num_aug: int = NUM_AUGMENTATIONS) -> List[str]:
+    """Génère des variations de la question pour l'augmentation de données."""
+    return get_augmenter(AUGMENTATION_METHODS, num_aug).augment(text, text_seed(text))
+
+# État des processus de la pool : l'augmenter est construit une fois par processus
+_worker_augmenter: Optional[Augmenter] = None
+
+def _init_worker(methods: Sequence[str], num_aug: int):
+    global _worker_augmenter
+    _worker_augmenter = Augmenter(methods, num_aug)
+
+def _augment_chunk(chunk: List[Tuple[int, str, int]]) -> List[Tuple[int, List[str]]]:
+    return [(position, _worker_augmenter.augment(text, row_seed)) for position, text, row_seed in chunk]
+
+def iter_augmented(texts: Sequence[str], methods: Sequence[str] = AUGMENTATION_METHODS,
+                   num_aug: int = NUM_AUGMENTATIONS, seed: int = RANDOM_STATE,
+                   workers: Optional[int] = AUGMENTATION_WORKERS,
+                   chunk_size: int = AUGMENTATION_CHUNK_SIZE) -> Iterator[List[Tuple[int, List[str]]]]:
+    """
+    Augmente des textes par lots répartis sur une pool de processus.
+
+    Chaque lot de `chunk_size` textes est une tâche ; les lots sont rendus
+    dans l'ordre des textes, au fil de leur traitement. Chaque texte a sa
+    propre graine (`text_seed`) : le résultat ne dépend ni du nombre de
+    processus ni de la taille des lots.
+
+    Yields:
+        list: (position du texte, variations) pour chaque texte d'un lot
+    """
+    seeded = [(position, text, text_seed(text, seed)) for position, text in enumerate(texts)]
+    chunks = [seeded[start:start + chunk_size] for start in range(0, len(seeded), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        augmenter = Augmenter(methods, num_aug)
+        for chunk in chunks:
+            yield [(position, augmenter.augment(text, row_seed)) for position, text, row_seed in chunk]
+        return
+
+    logger.info(f"Augmentation de {len(texts)} questions sur {workers} processus")
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(list(methods), num_aug)) as pool:
+        yield from pool.imap(_augment_chunk, chunks)
+
+def augment_texts(texts: Sequence[str], **kwargs) -> List[List[str]]:
+    """Variations de chaque texte (voir `iter_augmented`), dans l'ordre des textes."""
+    results: List[List[str]] = [[] for _ in texts]
+    for chunk in iter_augmented(list(texts), **kwargs):
+        for position, variations in chunk:
+            results[position] = variations
+    return results
+
+def dataset_key(df: pd.DataFrame, methods: Sequence[str], num_aug: int, seed: int) -> str:
+    """Empreinte des lignes à augmenter et des paramètres de l'augmentation."""
+    digest = hashlib.sha1()
+    versions = {}
+    if {'synonym', 'keyboard'} & set(methods):
+        import nlpaug
+        versions['nlpaug'] = nlpaug.__version__
+    digest.update(repr((list(methods), num_aug, seed, FORMULATION_TEMPLATES, versions)).encode('utf-8'))
+    for row in df[['question_clean', 'Réponse', 'Categorie']].itertuples(index=False):
+        digest.update(repr(tuple(row)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def augment_dataframe(df: pd.DataFrame, methods: Sequence[str] = AUGMENTATION_METHODS,
+                      num_aug: int = NUM_AUGMENTATIONS, seed: int = RANDOM_STATE,
+                      workers: Optional[int] = AUGMENTATION_WORKERS,
+                      chunk_size: int = AUGMENTATION_CHUNK_SIZE,
+                      cache_dir: Optional[Path] = AUGMENTATION_CACHE_DIR) -> pd.DataFrame:
+    """
+    Lignes augmentées d'un jeu de FAQ (colonnes question_clean, Réponse, Categorie).
+
+    Les variations sont écrites lot par lot dans `augmented_<empreinte>.csv`
+    (AUGMENTATION_CACHE_DIR) ; un entraînement suivant sur les mêmes lignes
+    et avec les mêmes paramètres relit ce fichier sans rien recalculer.
+    Sans `cache_dir`, rien n'est écrit.
+
+    Returns:
+        pd.DataFrame: Colonnes question, question_clean, Réponse, Categorie ;
+            une ligne par variation, dans l'ordre des lignes d'origine
+    """
+    path = None
+    if cache_dir is not None:
+        path = Path(cache_dir) / f"augmented_{dataset_key(df, methods, num_aug, seed)}.csv"
+        if path.exists():
+            logger.info(f"Données augmentées relues depuis {path}")
+            return pd.read_csv(path, keep_default_na=False)
+
+    start_time = time.time()
+    questions = df['question_clean'].tolist()
+    answers = df['Réponse'].tolist()
+    categories = df['Categorie'].tolist()
+    chunks = iter_augmented(questions, methods, num_aug, seed, workers, chunk_size)
+
+    if path is None:
+        frames = [_chunk_frame(chunk, answers, categories) for chunk in chunks]
+        augmented = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=AUGMENTED_COLUMNS)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            pd.DataFrame(columns=AUGMENTED_COLUMNS).to_csv(f, index=False)
+            for chunk in chunks:
+                _chunk_frame(chunk, answers, categories).to_csv(f, header=False, index=False)
+        os.replace(tmp_path, path)
+        augmented = pd.read_csv(path, keep_default_na=False)
+        logger.info(f"Données augmentées sauvegardées dans {path}")
+
+    logger.info(f"{len(augmented)} variations générées en {time.time() - start_time:.2f} secondes")
+    return augmented
+
+def _chunk_frame(chunk: List[Tuple[int, List[str]]], answers: list, categories: list) -> pd.DataFrame:
+    """Lignes augmentées d'un lot, avec leur question normalisée."""
+    positions = [position for position, variations in chunk for _ in variations]
+    questions = [variation for _, variations in chunk for variation in variations]
+    return pd.DataFrame({
+        'question': questions,
+        'question_clean': normalize_questions(questions),
+        'Réponse': [answers[position] for position in positions],
+        'Categorie': [categories[position] for position in positions]
+    }, columns=AUGMENTED_COLUMNS)
@@ -0,0 +1,178 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_TARGET_LATENCY_MS
+)
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """
+    Regroupe les demandes d'embedding concurrentes en un seul lot.
+
+    Chaque appel à `embed` dépose le texte dans une file. Un thread unique
+    collecte les textes pendant au plus `max_wait_ms` millisecondes ou jusqu'à
+    la taille de lot courante, exécute une seule passe du modèle via
+    `DataPreprocessor.embed_batch` (ou de la fonction `encode` donnée), puis
+    rend chaque vecteur, avec ses probabilités brutes si `encode` en donne,
+    à l'appelant qui l'attend. La taille de lot s'adapte à la latence observée.
+    """
+
+    def __init__(self, preprocessor, max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+                 max_batch_size: int = MICRO_BATCH_MAX_SIZE,
+                 target_latency_ms: float = MICRO_BATCH_TARGET_LATENCY_MS,
+                 encode: Optional[Callable[[List[str]], Tuple[np.ndarray, Optional[np.ndarray]]]] = None):
+        self.preprocessor = preprocessor
+        # Textes -> (embeddings, probabilités brutes ou None) (None : preprocessor.embed_batch)
+        self.encode = encode
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency_ms / 1000.0
+
+        # Taille de lot courante, ajustée selon la latence
+        self.current_batch_size = max_batch_size
+
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        # Après `stop`, plus aucune requête n'est acceptée (le thread ne les servirait pas)
+        self._stopped = False
+        self._stop_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batch_latencies = deque(maxlen=100)
+        self._total_items = 0
+
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Micro-batching activé (attente max {max_wait_ms} ms, lot max {max_batch_size})"
+        )
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Encode un texte en le regroupant avec les requêtes concurrentes.
+
+        Returns:
+            tuple: (embedding, probabilités brutes (catégories,) données par `encode`, ou None)
+        """
+        future: Future = Future()
+        with self._stop_lock:
+            if self._stopped:
+                raise RuntimeError("Micro-batching arrêté : plus aucune requête n'est acceptée")
+            self._queue.put((text, future))
+        return future.result(timeout)
+
+    def stop(self):
+        """Arrête le thread de regroupement après les requêtes en attente."""
+        with self._stop_lock:
+            if not self._stopped:
+                self._stopped = True
+                self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first: Tuple[str, Future]) -> Tuple[List[Tuple[str, Future]], bool]:
+        """Collecte les requêtes suivantes jusqu'au délai ou à la taille de lot."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.current_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        """Boucle principale du thread de regroupement (une erreur ne l'arrête pas)."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                batch, stopping = self._collect(item)
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"Erreur du thread de micro-batching: {str(e)}")
+                if not item[1].done():
+                    item[1].set_exception(e)
+                continue
+            if stopping:
+                break
+
+    def _process(self, batch: List[Tuple[str, Future]]):
+        """
+        Encode un lot en une seule passe et distribue les résultats.
+
+        Toute requête du lot restée sans résultat (erreur de l'encodeur, de la
+        mise en cache, résultat incomplet) reçoit l'exception : aucun appelant
+        n'attend indéfiniment.
+        """
+        texts = [text for text, _ in batch]
+        error: Optional[BaseException] = None
+        try:
+            start_time = time.perf_counter()
+            if self.encode is not None:
+                embeddings, probas = self.encode(texts)
+            else:
+                embeddings, probas = self.preprocessor.embed_batch(texts, batch_size=len(texts)), None
+            latency = time.perf_counter() - start_time
+            if len(embeddings) != len(texts) or (probas is not None and len(probas) != len(texts)):
+                raise RuntimeError(f"{len(embeddings)} embeddings pour un lot de {len(texts)} requêtes")
+
+            for i, ((text, future), embedding) in enumerate(zip(batch, embeddings)):
+                self.preprocessor.cache_embedding(text, embedding)
+                future.set_result((embedding, probas[i] if probas is not None else None))
+
+            self._record(len(batch), latency)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'encodage d'un lot de {len(texts)} requêtes: {str(e)}")
+            error = e
+        finally:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error or RuntimeError("Lot de micro-batching interrompu"))
+
+    def _record(self, batch_size: int, latency: float):
+        """Met à jour les statistiques et adapte la taille de lot."""
+        with self._stats_lock:
+            self._batch_sizes[batch_size] += 1
+            self._batch_latencies.append(latency)
+            self._total_items += batch_size
+
+            # Réduire la taille si le lot dépasse la latence visée,
+            # l'augmenter progressivement si un lot plein reste rapide
+            if latency > self.target_latency and self.current_batch_size > 1:
+                self.current_batch_size = max(1, int(self.current_batch_size * 0.75))
+            elif (batch_size >= self.current_batch_size
+                  and latency < self.target_latency / 2
+                  and self.current_batch_size < self.max_batch_size):
+                self.current_batch_size += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du regroupement, dont la distribution des tailles de lot."""
+        with self._stats_lock:
+            total_batches = sum(self._batch_sizes.values())
+            latencies = list(self._batch_latencies)
+            return {
+                'total_batches': total_batches,
+                'total_items': self._total_items,
+                'mean_batch_size': self._total_items / total_batches if total_batches else 0,
+                'batch_size_distribution': {
+                    str(size): count for size, count in sorted(self._batch_sizes.items())
+                },
+                'current_max_batch_size': self.current_batch_size,
+                'mean_batch_latency': float(np.mean(latencies)) if latencies else 0,
+                'pending': self._queue.qsize()
+            }
@@ -0,0 +1,157 @@
+import argparse
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from src.config import BASE_DIR, RANDOM_STATE, RESCORE_FACTOR
+from src.faq_index import FAQIndex, STORAGE_MODES
+from src.utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def synthetic_base(n: int, dim: int, n_categories: int, rng: np.random.Generator) -> Tuple[np.ndarray, List[str]]:
+    """
+    Base synthétique proche des embeddings de questions : des groupes de
+    vecteurs autour de centres, et des catégories de tailles très inégales
+    (loi de Zipf), comme dans la base FAQ.
+    """
+    weights = 1.0 / np.arange(1, n_categories + 1)
+    row_codes = rng.choice(n_categories, size=n, p=weights / weights.sum())
+
+    n_clusters = max(n_categories, n // 100)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    # Chaque groupe de questions appartient à une catégorie, décalée de son centre
+    cluster_of_row = (row_codes + n_categories * rng.integers(0, max(n_clusters // n_categories, 1), size=n)) % n_clusters
+
+    embeddings = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(start + 100000, n)
+        noise = rng.standard_normal((stop - start, dim)).astype(np.float32)
+        embeddings[start:stop] = centers[cluster_of_row[start:stop]] + 0.5 * noise
+    return embeddings, [f"categorie_{code}" for code in row_codes]
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Part des k plus proches voisins exacts retrouvés par la recherche approchée."""
+    hits = [len(np.intersect1d(f[f >= 0], e[e >= 0])) / max(np.count_nonzero(e >= 0), 1)
+            for f, e in zip(found, expected)]
+    return float(np.mean(hits))
+
+def single_query_latency(index: FAQIndex, queries: np.ndarray, categories: List[str], k: int) -> Dict[str, float]:
+    """Latence p50 / p95 d'une question seule, comme sur /predict (recherche dans la catégorie prédite)."""
+    timings = []
+    for query, category in zip(queries, categories):
+        start = time.perf_counter()
+        index.search(query[None, :], [category], k=k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': float(np.percentile(timings, 50)), 'p95_ms': float(np.percentile(timings, 95))}
+
+def benchmark_size(n: int, dim: int, n_categories: int, index_types: List[str], k: int,
+                   n_queries: int, rng: np.random.Generator, storages: List[str] = None) -> List[Dict]:
+    """Compare chaque type d'index et de stockage à l'index exact sur une base de `n` vecteurs."""
+    logger.info(f"Base synthétique de {n} vecteurs (dimension {dim})...")
+    embeddings, row_categories = synthetic_base(n, dim, n_categories, rng)
+    empty = [""] * n
+
+    # Questions de test : des questions de la base légèrement reformulées
+    sources = rng.choice(n, size=n_queries, replace=False)
+    queries = embeddings[sources] + 0.2 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    query_categories = [row_categories[i] for i in sources]
+
+    configurations = [('flat', 'float32')] + [
+        (index_type, storage) for index_type in index_types for storage in (storages or ['float32'])
+        if (index_type, storage) != ('flat', 'float32')
+    ]
+
+    results = []
+    reference = None
+    for index_type, storage in configurations:
+        logger.info(f"Construction de l'index {index_type} ({storage})...")
+        start = time.perf_counter()
+        index = FAQIndex.build(embeddings, row_categories, empty, empty, index_type=index_type, storage=storage)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, rows, _, global_rows = index.search(queries, query_categories, k=k, global_k=k)
+        batch_qps = n_queries / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = (rows, global_rows)
+        result = {
+            'size': n,
+            'index_type': index_type,
+            'storage': storage,
+            'index_mb': len(faiss.serialize_index(index.index)) / (1024 * 1024),
+            'build_s': build_s,
+            'recall_category': recall_at_k(rows, reference[0]),
+            'recall_global': recall_at_k(global_rows, reference[1]),
+            'batch_qps': batch_qps
+        }
+        result.update(single_query_latency(index, queries[:min(n_queries, 200)], query_categories, k))
+        results.append(result)
+        del index
+    return results
+
+def generate_report(results: List[Dict], dim: int, k: int, n_queries: int) -> str:
+    """Met en forme les résultats du benchmark."""
+    report = [
+        "=== Benchmark des Index FAISS Approchés ===",
+        f"Date: {datetime.now().isoformat()}",
+        f"Dimension: {dim}, k: {k}, questions de test: {n_queries}",
+        "Rappel mesuré par rapport à l'index exact (flat) ; latence d'une question seule",
+        "",
+        "Taille    | Index | Stockage | Mémoire (Mo) | Construction | Rappel@k catégorie | Rappel@k global "
+        "| p50 (ms) | p95 (ms) | Débit (q/s)"
+    ]
+    for result in results:
+        report.append(
+            f"{result['size']:>9} | {result['index_type']:>5} | {result['storage']:>8} | "
+            f"{result['index_mb']:>12.1f} | {result['build_s']:>10.1f} s | "
+            f"{result['recall_category']:>18.2%} | {result['recall_global']:>15.2%} | "
+            f"{result['p50_ms']:>8.2f} | {result['p95_ms']:>8.2f} | {result['batch_qps']:>11.0f}"
+        )
+    report.extend([
+        "",
+        "-> Choisir FAISS_INDEX_TYPE dans src/config.py ('auto' : flat sous ANN_MIN_SIZE,"
+        " hnsw sous ANN_IVF_MIN_SIZE, ivf au-delà)",
+        f"-> Choisir FAISS_STORAGE ; avec un stockage compressé, les {RESCORE_FACTOR} * k meilleurs"
+        " candidats sont recalculés sur les vecteurs exacts (RESCORE_FACTOR)"
+    ])
+    return "\n".join(report)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rappel et latence des index FAISS approchés par rapport à l'index exact")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="Nombres de vecteurs de la base")
+    parser.add_argument('--dim', type=int, default=768, help="Dimension des embeddings")
+    parser.add_argument('--categories', type=int, default=30, help="Nombre de catégories")
+    parser.add_argument('--types', nargs='+', default=['hnsw', 'ivf'], choices=['flat', 'hnsw', 'ivf'],
+                        help="Types d'index à comparer à l'index exact")
+    parser.add_argument('--storage', nargs='+', default=['float32'], choices=list(STORAGE_MODES),
+                        help="Stockages des vecteurs à comparer (float32, fp16, sq8, pq)")
+    parser.add_argument('--k', type=int, default=3, help="Nombre de voisins (3 comme pour /predict)")
+    parser.add_argument('--queries', type=int, default=1000, help="Nombre de questions de test")
+    args = parser.parse_args()
+    setup_logging()
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    results = []
+    for n in args.sizes:
+        results.extend(benchmark_size(n, args.dim, args.categories, args.types, args.k,
+                                      min(args.queries, n), rng, args.storage))
+
+    report = generate_report(results, args.dim, args.k, args.queries)
+    print(report)
+
+    reports_dir = BASE_DIR / "reports"
+    reports_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    with open(reports_dir / f"ann_benchmark_{timestamp}.txt", "w", encoding="utf-8") as f:
+        f.write(report)
+    print(f"\nRapport sauvegardé dans le dossier 'reports/'")
+
+if __name__ == "__main__":
+    main()
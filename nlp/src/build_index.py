@@ -0,0 +1,35 @@
+import argparse
+import logging
+
+from src.config import DATA_DIR, FAISS_INDICES_DIR
+from src.answer_finder import AnswerFinder
+from src.faq_index import FAQIndex
+from src.utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Met à jour l'index FAISS : seules les catégories modifiées dans le CSV sont réencodées"
+    )
+    parser.add_argument('--data', type=str, default=str(DATA_DIR / "faqs_clean.csv"),
+                        help="Chemin vers le fichier CSV des données")
+    parser.add_argument('--full', action='store_true', help="Réencoder toute la base")
+    args = parser.parse_args()
+    setup_logging()
+
+    # AnswerFinder synchronise l'index avec le CSV à sa création
+    finder = AnswerFinder(faq_data_path=args.data, full_rebuild=args.full)
+    summary = finder.last_sync
+
+    print(f"Index: {FAQIndex.path()}")
+    print(f"Action: {summary['action']}")
+    print(f"Questions réencodées: {summary['embedded']} / {len(finder.faq_data)}")
+    if summary['categories']:
+        print("Catégories reconstruites:")
+        for category in summary['categories']:
+            print(f"- {category} ({finder.index.category_size(category)} questions)")
+    print(f"\nIndex sauvegardé dans {FAISS_INDICES_DIR}")
+
+if __name__ == "__main__":
+    main()
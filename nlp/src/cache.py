@@ -0,0 +1,139 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+from .config import CACHE_SIZE, CACHE_TTL, CACHE_MAX_BYTES
+
+_MISSING = object()
+
+def estimate_size(value: Any) -> int:
+    """Estime la taille mémoire (en octets) d'une valeur mise en cache."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112  # Données + en-tête de l'objet ndarray
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """
+    Cache LRU thread-safe, borné en nombre d'entrées et en octets, avec TTL.
+
+    Les entrées expirées ne sont jamais renvoyées ; elles sont retirées à la
+    lecture et par une purge périodique lors des écritures.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE, max_bytes: Optional[int] = CACHE_MAX_BYTES,
+                 ttl: Optional[float] = CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clé -> (valeur, taille, expiration)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._next_purge = time.monotonic() + (ttl or 0)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur associée à la clé, ou `default` si absente ou expirée."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Ajoute ou remplace une entrée, puis évince les moins récemment utilisées."""
+        size = estimate_size(key) + estimate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        now = time.monotonic()
+        expires_at = now + self.ttl if self.ttl else None
+
+        with self._lock:
+            previous = self._data.pop(key, _MISSING)
+            if previous is not _MISSING:
+                self._bytes -= previous[1]
+
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+
+            if self.ttl and now >= self._next_purge:
+                self._purge_expired(now)
+                self._next_purge = now + self.ttl / 10
+
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest_key, (_, oldest_size, _) = next(iter(self._data.items()))
+                self._remove(oldest_key, oldest_size)
+                self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and (entry[2] is None or entry[2] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self):
+        """Vide le cache sans réinitialiser les compteurs."""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable, size: int):
+        del self._data[key]
+        self._bytes -= size
+
+    def _purge_expired(self, now: float):
+        expired = [
+            (key, size) for key, (_, size, expires_at) in self._data.items()
+            if expires_at is not None and expires_at <= now
+        ]
+        for key, size in expired:
+            self._remove(key, size)
+        self.expirations += len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne la taille, les limites et les compteurs du cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
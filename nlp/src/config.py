@@ -11,17 +11,45 @@ FAISS_INDICES_DIR = MODELS_DIR / "faiss_indices"
 
 # Paramètres du modèle
 MODEL_NAME = "camembert-base"  # Modèle de base
-DISTIL_MODEL_NAME = "camembert-base"  # Utiliser le même modèle pour la comparaison
-USE_DISTIL = False  # Désactiver Distil pour l'instant
+DISTIL_MODEL_DIR = MODELS_DIR / "distil_camembert"  # Encodeur étudiant produit par src/distill.py
+DISTIL_MODEL_NAME = str(DISTIL_MODEL_DIR)
+USE_DISTIL = False  # True pour servir l'étudiant (reconstruire classifieur et indices : distill.py --rebuild)
+ENCODER_PRECISION = 'float32'  # 'float32', 'int8' (quantification dynamique) ou 'bfloat16' (CPU)
+ENCODER_NUM_LAYERS = None  # Ne garder que les K premières couches (None = toutes), voir src/layer_sweep.py
 MAX_LENGTH = 128
 RANDOM_STATE = 42
 TEST_SIZE = 0.2
 BATCH_SIZE = 64  # Augmenté pour de meilleures performances
 
+# Paramètres de la distillation (étudiant plus petit que camembert-base)
+DISTIL_NUM_LAYERS = 4  # Couches transformer de l'étudiant (12 pour le professeur)
+DISTIL_HIDDEN_SIZE = 384  # Dimension cachée et des embeddings de l'étudiant (768 pour le professeur)
+DISTIL_NUM_HEADS = 6
+DISTIL_EPOCHS = 30
+DISTIL_LEARNING_RATE = 5e-4
+DISTIL_BATCH_SIZE = 32
+
+# Choix du nombre de couches et sortie anticipée (classification seule)
+LAYER_SWEEP_TOLERANCE = 0.01  # Perte de précision tolérée pour choisir le plus petit K
+EARLY_EXIT_LAYER = None  # Couche de sortie anticipée (None = désactivée)
+EARLY_EXIT_THRESHOLD = 0.95  # Probabilité minimale du classifieur intermédiaire pour s'arrêter
+EARLY_EXIT_DIR = MODELS_DIR / "early_exit"  # Classifieur entraîné sur la couche EARLY_EXIT_LAYER
+
+# Modèle fusionné TorchScript (encodeur + pooling + tête), voir src/fused_model.py
+FUSED_MODEL_ENABLED = True  # Exporté par src/train.py, servi sur CPU s'il correspond à l'encodeur et au classifieur
+FUSED_ONEDNN_GRAPH = False  # Fuseur oneDNN Graph (recompilé à chaque forme d'entrée) au lieu de optimize_for_inference
+
 # Paramètres d'augmentation de données
 AUGMENTATION_ENABLED = True
 NUM_AUGMENTATIONS = 3
 AUGMENTATION_METHODS = ['synonym', 'keyboard', 'formulation']
+AUGMENTATION_WORKERS = None  # Processus d'augmentation (None = nombre de CPU)
+AUGMENTATION_CHUNK_SIZE = 256  # Questions par tâche de la pool (et par écriture sur disque)
+AUGMENTATION_CACHE_DIR = DATA_DIR / "augmented"  # Données augmentées réutilisées d'un entraînement à l'autre
+
+# Cache des étapes de src/train.py (nettoyage, augmentation, embeddings, rééchantillonnage, entraînement)
+STAGE_CACHE_ENABLED = True  # Ne recalculer que les étapes dont les entrées ou la configuration ont changé
+STAGE_CACHE_DIR = MODELS_DIR / "stage_cache"
 
 # Paramètres de prétraitement
 CLEAN_TEXT = True
@@ -36,22 +64,79 @@ EARLY_STOPPING = True
 VALIDATION_FRACTION = 0.2
 N_ITER_NO_CHANGE = 50
 
+# Backend d'entraînement du classifieur (même architecture, même tête de service)
+CLASSIFIER_BACKEND = 'sklearn'  # 'sklearn' (SMOTE + MLPClassifier) ou 'torch' (src/torch_trainer.py, perte pondérée par classe)
+TORCH_BATCH_SIZE = 64  # Taille des mini-lots
+TORCH_LEARNING_RATE = 1e-3  # Adam
+TORCH_MAX_EPOCHS = 500
+TORCH_N_ITER_NO_CHANGE = 20  # Époques sans amélioration de la perte de validation avant l'arrêt
+TORCH_NUM_THREADS = None  # Threads PyTorch pendant l'entraînement (None = tous les cœurs)
+
 # Seuils de confiance
 DEFAULT_THRESHOLD = 0.80
 DISTANCE_THRESHOLD = 0.15
 NEAR_AMBIGUOUS_THRESHOLD = 0.05
+CROSS_CATEGORY_K = 5  # Voisins cherchés dans toute la base quand la catégorie est incertaine
+
+# Règles de mot-clé (FAQClassifier.keyword_rules), appliquées avant l'encodage
+KEYWORD_SHORTCUT = True  # Répondre sans encoder si la catégorie de la règle a une réponse fixe ou lexicale
+KEYWORD_CANNED_ANSWERS = {}  # Catégorie -> réponse fixe, ex. {'Salutation': "Bonjour ! Comment puis-je vous aider ?"}
+
+# Index FAISS (recherche exacte ou approchée)
+FAISS_INDEX_TYPE = 'auto'  # 'flat', 'hnsw', 'ivf' ou 'auto' (selon la taille de la base)
+ANN_MIN_SIZE = 10000  # 'auto' : recherche exacte en dessous de cette taille
+ANN_IVF_MIN_SIZE = 500000  # 'auto' : HNSW en dessous, IVF au-delà
+ANN_EXACT_MAX = 2048  # Catégories plus petites : recherche exacte sur leurs seuls vecteurs
+HNSW_M = 32  # Voisins par nœud du graphe HNSW
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64  # Candidats explorés (augmenté pour les catégories filtrées)
+HNSW_MAX_EF_SEARCH = 2048
+IVF_NLIST = None  # Nombre de listes IVF (None = environ 4·sqrt(n))
+IVF_NPROBE = 16  # Listes explorées (augmenté pour les catégories filtrées)
+FAISS_STORAGE = 'float32'  # Vecteurs dans l'index : 'float32', 'fp16', 'sq8' ou 'pq'
+PQ_M = 96  # Sous-vecteurs par vecteur en stockage 'pq' (diviseur de la dimension)
+RESCORE_FACTOR = 4  # Index compressé : k * RESCORE_FACTOR candidats recalculés exactement (1 = désactivé)
+
+# Administration (POST /admin/faqs) : désactivée si aucun jeton n'est défini
+ADMIN_TOKEN = os.environ.get("FAQ_ADMIN_TOKEN")
 
 # Paramètres de cache
 CACHE_SIZE = 1000  # Nombre d'embeddings en cache
 CACHE_TTL = 3600  # Durée de vie du cache en secondes
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # Mémoire maximale par cache (octets)
+SIMILARITY_CACHE_SIZE = 5000  # Nombre de résultats FAISS en cache
+RESPONSE_CACHE_SIZE = 2000  # Nombre de réponses complètes en cache
+ARTIFACT_CHECK_INTERVAL = 5  # Intervalle (secondes) de vérification des fichiers du modèle et des index
+
+# Cache disque des embeddings partagé entre processus (second niveau, après la mémoire)
+EMBEDDING_STORE_ENABLED = True
+EMBEDDING_STORE_DIR = EMBEDDINGS_DIR / "store"
+EMBEDDING_STORE_DTYPE = 'float32'  # 'float16' pour diviser la taille par deux
+# Nombre maximal de vecteurs par fichier : chaque processus garde en mémoire un index
+# clé -> position (~150 octets par vecteur, soit ~75 Mo pour 500 000) ; au-delà, le
+# fichier est remplacé par un fichier neuf ne gardant que les vecteurs les plus récents
+EMBEDDING_STORE_MAX_ENTRIES = 500_000
+EMBEDDING_STORE_KEEP_RATIO = 0.5  # Part des vecteurs les plus récents gardés à la rotation
 
 # Paramètres de performance
 USE_GPU = True  # Utiliser GPU si disponible
 NUM_THREADS = 4  # Nombre de threads pour le traitement
 
+# Paramètres du micro-batching des requêtes concurrentes
+MICRO_BATCHING_ENABLED = True
+MICRO_BATCH_MAX_WAIT_MS = 5  # Attente maximale pour regrouper les requêtes
+MICRO_BATCH_MAX_SIZE = 32  # Taille maximale d'un lot
+MICRO_BATCH_TARGET_LATENCY_MS = 150  # Latence visée par lot pour adapter la taille
+
+# Paramètres du point de terminaison /predict-batch
+PREDICT_BATCH_CHUNK_SIZE = 64  # Questions traitées (et renvoyées) par tranche
+
 # Création des répertoires nécessaires
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(MODELS_DIR, exist_ok=True)
 os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
 os.makedirs(COMPARISON_RESULTS_DIR, exist_ok=True)
 os.makedirs(FAISS_INDICES_DIR, exist_ok=True)
+os.makedirs(EMBEDDING_STORE_DIR, exist_ok=True)
+os.makedirs(AUGMENTATION_CACHE_DIR, exist_ok=True)
+os.makedirs(STAGE_CACHE_DIR, exist_ok=True)
@@ -1,77 +1,96 @@
 import pandas as pd
 import numpy as np
 from transformers import AutoTokenizer, AutoModel
-from sklearn.preprocessing import LabelEncoder
-import re
 import logging
 import torch
 from src.config import (
     MODEL_NAME, DISTIL_MODEL_NAME, USE_DISTIL, MAX_LENGTH,
-    CACHE_SIZE, CACHE_TTL, USE_GPU, NUM_THREADS
+    CACHE_SIZE, CACHE_TTL, USE_GPU, NUM_THREADS, BATCH_SIZE, EMBEDDING_STORE_ENABLED, AUGMENTATION_CACHE_DIR
 )
-import nlpaug.augmenter.word as naw
-import nlpaug.augmenter.char as nac
-from typing import List, Dict, Any
-from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Optional
 import time
 from contextlib import nullcontext
 from .model_singleton import ModelSingleton
+from .cache import LRUCache
+from .embedding_store import EmbeddingStore
+from .normalization import clean_text, normalize_question, normalize_questions
+from .augmentation import augment_text, augment_dataframe
 
 logger = logging.getLogger(__name__)
 
-def clean_text(text: str) -> str:
-    """Nettoie le texte en supprimant la ponctuation et en mettant en minuscules."""
-    if not isinstance(text, str):
-        logger.warning(f"Texte non valide reçu : {text}")
-        return ""
-    
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+def masked_mean_pooling(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """Moyenne des états cachés en ignorant les tokens de padding (calculée en float32)."""
+    last_hidden_state = last_hidden_state.float()
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return summed / counts
 
-def normalize_question(question: str) -> str:
-    """Normalise les variations de formulation des questions."""
-    # Supprimer les expressions de demande courantes
-    patterns = [
-        r'^(quels sont|quelle est|comment|où|que faire|pourriez-vous|je souhaiterais|à propos de)\s+',
-        r'^(pouvez-vous|pourriez-vous|auriez-vous|serait-il possible)\s+',
-        r'^(je souhaite|je voudrais|j\'aimerais|je désire)\s+',
-        r'^(j\'ai besoin|il me faut|je cherche|je recherche)\s+',
-        r'^(je ne comprends pas|je ne sais pas|je suis perdu)\s+'
-    ]
-    
-    for pattern in patterns:
-        question = re.sub(pattern, '', question.lower())
-    
-    return clean_text(question)
+def iter_length_batches(tokenizer, texts: List[str], batch_size: int):
+    """
+    Découpe des textes en lots de longueurs proches, prêts pour le modèle.
+    
+    Les textes sont tokenisés une seule fois sans padding, triés par nombre de
+    tokens, puis chaque lot est complété uniquement jusqu'à la longueur de son
+    texte le plus long.
+    
+    Yields:
+        tuple: (positions des textes du lot, input_ids, attention_mask)
+    """
+    # Tokenizer sans padding pour connaître la longueur de chaque texte
+    encodings = tokenizer(
+        texts,
+        truncation=True,
+        max_length=MAX_LENGTH
+    )
+    all_input_ids = encodings['input_ids']
+    lengths = np.array([len(ids) for ids in all_input_ids])
+    order = np.argsort(lengths, kind='stable')
+    pad_token_id = tokenizer.pad_token_id
+    
+    for start in range(0, len(texts), batch_size):
+        batch_idx = order[start:start + batch_size]
+        max_len = int(lengths[batch_idx].max())
+        
+        # Padding à la longueur maximale du lot uniquement
+        input_ids = torch.full((len(batch_idx), max_len), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch_idx), max_len), dtype=torch.long)
+        for row, i in enumerate(batch_idx):
+            ids = all_input_ids[i]
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+        
+        yield batch_idx, input_ids, attention_mask
 
-def augment_text(text: str, num_aug: int = 3) -> List[str]:
-    """Génère des variations de la question pour l'augmentation de données."""
-    augmented = []
-    
-    # Augmentation par synonymes
-    aug_synonym = naw.SynonymAug(aug_src='wordnet', lang='fra')
-    augmented.extend(aug_synonym.augment(text, n=num_aug))
-    
-    # Augmentation par caractères
-    aug_char = nac.KeyboardAug()
-    augmented.extend(aug_char.augment(text, n=num_aug))
-    
-    # Variations de formulation
-    variations = [
-        f"Comment {text}",
-        f"Quelle est la procédure pour {text}",
-        f"Je souhaite savoir {text}",
-        f"Pouvez-vous m'expliquer {text}",
-        f"J'aimerais comprendre {text}",
-        f"Pourriez-vous me dire {text}",
-        f"Quelle est la méthode pour {text}",
-        f"Quels sont les étapes pour {text}"
-    ]
-    augmented.extend(variations)
-    
-    return list(set(augmented))  # Supprimer les doublons
+def encode_texts(model, tokenizer, device, texts: List[str], batch_size: int = BATCH_SIZE) -> np.ndarray:
+    """
+    Encode des textes (déjà normalisés) avec un encodeur donné.
+    
+    Returns:
+        np.ndarray: Matrice (len(texts), hidden_size) en float32, dans l'ordre d'origine
+    """
+    hidden_size = model.config.hidden_size
+    if not texts:
+        return np.empty((0, hidden_size), dtype=np.float32)
+    
+    embeddings = np.empty((len(texts), hidden_size), dtype=np.float32)
+    done = 0
+    for batch_idx, input_ids, attention_mask in iter_length_batches(tokenizer, texts, batch_size):
+        input_ids = input_ids.to(device)
+        attention_mask = attention_mask.to(device)
+        
+        with torch.no_grad(), torch.cuda.amp.autocast() if device.type == "cuda" else nullcontext():
+            outputs = model(input_ids=input_ids, attention_mask=attention_mask)
+            pooled = masked_mean_pooling(outputs.last_hidden_state, attention_mask)
+        
+        embeddings[batch_idx] = pooled.cpu().numpy()
+        
+        done += len(batch_idx)
+        if len(texts) > batch_size:
+            logger.info(f"Traitement des questions {done}/{len(texts)}")
+    
+    return embeddings
 
 class DataPreprocessor:
     def __init__(self, model_name=None):
@@ -81,15 +100,39 @@ class DataPreprocessor:
         self.model, self.tokenizer = model_singleton.get_model()
         self.device = model_singleton.get_device()
         
-        # Initialiser le label encoder
-        self.label_encoder = LabelEncoder()
+        # Label encoder (sklearn) créé à la préparation des données d'entraînement
+        self._label_encoder = None
         
-        # Cache pour les embeddings
-        self._embedding_cache = {}
+        # Cache borné (entrées, octets, TTL) des embeddings, indexé par la question normalisée
+        self._embedding_cache = LRUCache(max_entries=CACHE_SIZE, ttl=CACHE_TTL)
+        
+        # Cache disque partagé entre processus, propre à l'empreinte du modèle
+        self.embedding_store = None
+        if EMBEDDING_STORE_ENABLED:
+            self.embedding_store = EmbeddingStore(
+                model_singleton.get_fingerprint(),
+                self.model.config.hidden_size
+            )
         
         logger.info("DataPreprocessor initialisé avec le modèle singleton")
     
-    @lru_cache(maxsize=CACHE_SIZE)
+    @property
+    def label_encoder(self):
+        """Encodeur des catégories, créé au premier accès (sklearn n'est pas importé pour le service)."""
+        if self._label_encoder is None:
+            from sklearn.preprocessing import LabelEncoder
+            self._label_encoder = LabelEncoder()
+        return self._label_encoder
+    
+    @label_encoder.setter
+    def label_encoder(self, label_encoder):
+        self._label_encoder = label_encoder
+    
+    @staticmethod
+    def cache_key(text: str) -> str:
+        """Clé de cache : la question normalisée, telle qu'elle est envoyée au modèle."""
+        return normalize_question(text)
+    
     def preprocess_single_text(self, text: str) -> np.ndarray:
         """
         Prétraite un seul texte pour la prédiction avec mise en cache.
@@ -101,98 +144,107 @@ class DataPreprocessor:
             np.ndarray: L'embedding du texte
         """
         # Vérifier le cache
-        if text in self._embedding_cache:
-            return self._embedding_cache[text]
-        
-        # Nettoyer et normaliser le texte
-        cleaned_text = normalize_question(text)
+        key = self.cache_key(text)
+        embedding = self._embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
         
-        # Tokenizer et embedding avec optimisations
-        inputs = self.tokenizer(
-            cleaned_text,
-            padding=True,
-            truncation=True,
-            max_length=MAX_LENGTH,
-            return_tensors="pt"
-        )
-        
-        # Déplacer les inputs sur le bon device
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        
-        # Calculer l'embedding avec optimisations
-        with torch.no_grad(), torch.cuda.amp.autocast() if self.device.type == "cuda" else nullcontext():
-            outputs = self.model(**inputs)
-            embedding = outputs.last_hidden_state.mean(dim=1).cpu().numpy()[0]
+        embedding = self.embed_batch([key], normalize=False)[0]
         
         # Mettre en cache
-        self._embedding_cache[text] = embedding
+        self._embedding_cache.set(key, embedding)
         
         return embedding
     
-    def prepare_data(self, df: pd.DataFrame, augment: bool = False) -> tuple:
-        """Prépare les données pour l'entraînement."""
-        logger.info("Nettoyage des questions...")
-        df['question_clean'] = df['question'].apply(normalize_question)
+    def embed_batch(self, texts: List[str], batch_size: int = BATCH_SIZE, normalize: bool = True) -> np.ndarray:
+        """
+        Calcule les embeddings d'une liste de textes par lots.
         
-        # Supprimer les doublons après nettoyage
-        df = df.drop_duplicates(subset=['question_clean'])
+        Les textes déjà présents dans le cache disque sont lus directement ;
+        les autres sont triés par longueur en tokens pour que chaque lot soit
+        rempli avec un minimum de padding, la moyenne ignore les tokens de
+        padding grâce au masque d'attention, et les vecteurs sont renvoyés
+        dans l'ordre d'origine.
         
-        if augment:
-            logger.info("Augmentation des données...")
-            augmented_data = []
-            for _, row in df.iterrows():
-                variations = augment_text(row['question_clean'])
-                for var in variations:
-                    augmented_data.append({
-                        'question': var,
-                        'Réponse': row['Réponse'],
-                        'Categorie': row['Categorie']
-                    })
-            df = pd.concat([df, pd.DataFrame(augmented_data)])
+        Args:
+            texts (List[str]): Les textes à encoder
+            batch_size (int): Nombre de textes par passe du modèle
+            normalize (bool): Appliquer normalize_question avant l'encodage
         
+        Returns:
+            np.ndarray: Matrice (len(texts), hidden_size) en float32
+        """
+        texts = list(texts)
+        if normalize:
+            texts = normalize_questions(texts)
+        
+        if self.embedding_store is None or not texts:
+            return self._encode(texts, batch_size)
+        
+        embeddings, found = self.embedding_store.get_many(texts)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            missing_texts = [texts[i] for i in missing]
+            computed = self._encode(missing_texts, batch_size)
+            embeddings[missing] = computed
+            self.embedding_store.put_many(missing_texts, computed)
+        
+        return embeddings
+    
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Passe les textes (déjà normalisés) dans l'encodeur, par lots triés par longueur."""
+        return encode_texts(self.model, self.tokenizer, self.device, texts, batch_size)
+    
+    @staticmethod
+    def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+        """Ajoute la question normalisée (question_clean) et supprime les doublons après nettoyage."""
+        logger.info("Nettoyage des questions...")
+        df['question_clean'] = normalize_questions(df['question'])
+        return df.drop_duplicates(subset=['question_clean'])
+    
+    @staticmethod
+    def augment_data(df: pd.DataFrame, cache_dir: Optional[Path] = AUGMENTATION_CACHE_DIR) -> pd.DataFrame:
+        """Ajoute les variations des questions (voir `augment_dataframe`) aux données nettoyées."""
+        logger.info("Augmentation des données...")
+        augmented = augment_dataframe(df, cache_dir=cache_dir)
+        # Les variations identiques à une question existante après nettoyage sont ignorées
+        return pd.concat([df, augmented], ignore_index=True).drop_duplicates(subset=['question_clean'])
+    
+    def encode_labels(self, df: pd.DataFrame) -> Optional[pd.Series]:
+        """Encode les catégories (colonne category_encoded) ; None sans colonne Categorie."""
         logger.info("Encodage des catégories...")
-        if 'Categorie' in df.columns:
-            df['category_encoded'] = self.label_encoder.fit_transform(df['Categorie'])
-            y = df['category_encoded']
-        else:
-            y = None
+        if 'Categorie' not in df.columns:
+            return None
+        df['category_encoded'] = self.label_encoder.fit_transform(df['Categorie'])
+        return df['category_encoded']
+    
+    def prepare_data(self, df: pd.DataFrame, augment: bool = False) -> tuple:
+        """Prépare les données pour l'entraînement."""
+        df = self.clean_data(df)
+        if augment:
+            df = self.augment_data(df)
+        y = self.encode_labels(df)
         
         logger.info("Création des embeddings...")
-        embeddings = []
-        batch_size = 32
-        
-        for i in range(0, len(df), batch_size):
-            batch_texts = df['question_clean'].iloc[i:i+batch_size].tolist()
-            inputs = self.tokenizer(
-                batch_texts,
-                padding=True,
-                truncation=True,
-                max_length=MAX_LENGTH,
-                return_tensors="pt"
-            )
-            
-            # Déplacer les inputs sur GPU si disponible
-            if USE_GPU and torch.cuda.is_available():
-                inputs = {k: v.cuda() for k, v in inputs.items()}
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                batch_embeddings = outputs.last_hidden_state.mean(dim=1).cpu().numpy()
-                embeddings.extend(batch_embeddings)
-            
-            logger.info(f"Traitement des questions {i+1} à {min(i+batch_size, len(df))}")
-        
-        return np.array(embeddings), y
+        embeddings = self.embed_batch(df['question_clean'].tolist(), normalize=False)
+        
+        return embeddings, y
+    
+    def get_cached_embedding(self, text: str):
+        """Retourne l'embedding en cache pour ce texte, ou None."""
+        return self._embedding_cache.get(self.cache_key(text))
+    
+    def cache_embedding(self, text: str, embedding: np.ndarray):
+        """Ajoute un embedding calculé hors de preprocess_single_text au cache."""
+        self._embedding_cache.set(self.cache_key(text), embedding)
     
     def clear_cache(self):
         """Vide le cache des embeddings."""
         self._embedding_cache.clear()
-        self.preprocess_single_text.cache_clear()
     
     def get_cache_stats(self) -> dict:
-        """Retourne les statistiques du cache."""
-        return {
-            'size': len(self._embedding_cache),
-            'max_size': CACHE_SIZE,
-            'ttl': CACHE_TTL
-        } 
\ No newline at end of file
+        """Retourne les statistiques du cache (taille, limites, hits, misses, évictions)."""
+        stats = self._embedding_cache.get_stats()
+        if self.embedding_store is not None:
+            stats['disk'] = self.embedding_store.get_stats()
+        return stats 
\ No newline at end of file
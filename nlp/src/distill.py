@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from transformers import CamembertConfig, CamembertModel
+
+from src.config import (
+    BASE_DIR, DATA_DIR, MODEL_NAME, DISTIL_MODEL_DIR, DISTIL_MODEL_NAME, USE_DISTIL,
+    DISTIL_NUM_LAYERS, DISTIL_HIDDEN_SIZE, DISTIL_NUM_HEADS, DISTIL_EPOCHS,
+    DISTIL_LEARNING_RATE, DISTIL_BATCH_SIZE, AUGMENTATION_ENABLED, NUM_AUGMENTATIONS,
+    NUM_THREADS, RANDOM_STATE, TEST_SIZE, CLASSIFIER_BACKEND
+)
+from src.augmentation import augment_texts
+from src.data_preprocessing import encode_texts, iter_length_batches, masked_mean_pooling
+from src.normalization import normalize_questions
+from src.model import FAQClassifier
+from src.model_singleton import load_encoder
+from src.precision_report import model_size_mb, top1_answers, measure_latency
+from src.utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def build_corpus(augment: bool) -> List[str]:
+    """
+    Questions normalisées sur lesquelles l'étudiant imite le professeur :
+    la base FAQ et ses augmentations.
+
+    Les questions de test en sont exclues (même quand elles figurent aussi
+    dans la base) : `compare_encoders` mesure l'accord professeur/étudiant
+    sur des questions que l'étudiant n'a pas vues.
+    """
+    faq = pd.read_csv(DATA_DIR / "faqs_clean.csv")
+    questions = normalize_questions(faq['question'].dropna()).tolist()
+
+    if augment:
+        logger.info("Augmentation du corpus de distillation...")
+        augmented = []
+        try:
+            for variations in augment_texts(questions, num_aug=NUM_AUGMENTATIONS):
+                augmented.extend(normalize_questions(variations))
+        except Exception as e:
+            logger.warning(f"Augmentation impossible ({str(e)}), distillation sur les questions d'origine")
+            augmented = []
+        questions.extend(augmented)
+
+    held_out = set()
+    test_path = DATA_DIR / "test_questions.csv"
+    if test_path.exists():
+        held_out.update(normalize_questions(pd.read_csv(test_path)['question'].dropna()))
+
+    # Ordre stable, sans doublons, textes vides ni questions de test
+    return [q for q in dict.fromkeys(questions) if q and q not in held_out]
+
+def build_student(teacher: nn.Module) -> CamembertModel:
+    """
+    Crée l'étudiant : moins de couches, dimension cachée réduite.
+
+    Les embeddings de tokens et de positions sont initialisés par projection
+    de ceux du professeur sur leurs DISTIL_HIDDEN_SIZE premières composantes
+    principales ; les couches transformer partent d'une initialisation aléatoire.
+    """
+    teacher_config = teacher.config
+    config = CamembertConfig(
+        vocab_size=teacher_config.vocab_size,
+        hidden_size=DISTIL_HIDDEN_SIZE,
+        num_hidden_layers=DISTIL_NUM_LAYERS,
+        num_attention_heads=DISTIL_NUM_HEADS,
+        intermediate_size=DISTIL_HIDDEN_SIZE * 4,
+        max_position_embeddings=teacher_config.max_position_embeddings,
+        type_vocab_size=teacher_config.type_vocab_size,
+        pad_token_id=teacher_config.pad_token_id,
+        bos_token_id=teacher_config.bos_token_id,
+        eos_token_id=teacher_config.eos_token_id,
+        layer_norm_eps=teacher_config.layer_norm_eps
+    )
+    torch.manual_seed(RANDOM_STATE)
+    student = CamembertModel(config, add_pooling_layer=False)
+
+    with torch.no_grad():
+        word_embeddings = teacher.embeddings.word_embeddings.weight.float()
+        mean = word_embeddings.mean(dim=0, keepdim=True)
+        _, _, components = torch.linalg.svd(word_embeddings - mean, full_matrices=False)
+        basis = components[:DISTIL_HIDDEN_SIZE].T
+        student.embeddings.word_embeddings.weight.copy_((word_embeddings - mean) @ basis)
+        student.embeddings.position_embeddings.weight.copy_(
+            teacher.embeddings.position_embeddings.weight.float() @ basis
+        )
+
+    return student
+
+def distill(corpus: List[str], teacher_embeddings: np.ndarray, student: CamembertModel, tokenizer,
+            epochs: int, learning_rate: float, batch_size: int) -> Dict[str, float]:
+    """
+    Entraîne l'étudiant à reproduire les embeddings moyennés du professeur.
+
+    Une projection linéaire (utilisée seulement pendant l'entraînement)
+    ramène l'embedding de l'étudiant à la dimension du professeur ; la perte
+    combine l'erreur quadratique et la distance cosinus. Le meilleur état sur
+    10% du corpus mis de côté est conservé.
+    """
+    rng = np.random.default_rng(RANDOM_STATE)
+    order = rng.permutation(len(corpus))
+    n_val = max(1, len(corpus) // 10)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    targets = torch.from_numpy(teacher_embeddings)
+    projection = nn.Linear(student.config.hidden_size, targets.shape[1])
+    parameters = list(student.parameters()) + list(projection.parameters())
+    optimizer = torch.optim.AdamW(parameters, lr=learning_rate, weight_decay=0.01)
+    total_steps = epochs * int(np.ceil(len(train_idx) / batch_size))
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, max_lr=learning_rate, total_steps=total_steps)
+    mse = nn.MSELoss()
+    cosine = nn.CosineEmbeddingLoss()
+
+    def batch_loss(indices: np.ndarray) -> torch.Tensor:
+        texts = [corpus[i] for i in indices]
+        batch_order, input_ids, attention_mask = next(iter_length_batches(tokenizer, texts, len(texts)))
+        target = targets[indices[batch_order]]
+        outputs = student(input_ids=input_ids, attention_mask=attention_mask)
+        predicted = projection(masked_mean_pooling(outputs.last_hidden_state, attention_mask))
+        ones = torch.ones(len(texts))
+        return mse(predicted, target) + cosine(predicted, target, ones)
+
+    best_loss, best_state = float('inf'), None
+    for epoch in range(epochs):
+        student.train()
+        projection.train()
+        rng.shuffle(train_idx)
+        train_loss = 0.0
+        for start in range(0, len(train_idx), batch_size):
+            indices = train_idx[start:start + batch_size]
+            loss = batch_loss(indices)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(parameters, 1.0)
+            optimizer.step()
+            scheduler.step()
+            train_loss += loss.item() * len(indices)
+
+        student.eval()
+        projection.eval()
+        with torch.no_grad():
+            val_loss = sum(
+                batch_loss(val_idx[start:start + batch_size]).item() * len(val_idx[start:start + batch_size])
+                for start in range(0, len(val_idx), batch_size)
+            ) / len(val_idx)
+
+        logger.info(f"Époque {epoch + 1}/{epochs} - perte entraînement: {train_loss / len(train_idx):.4f}, "
+                    f"perte validation: {val_loss:.4f}")
+        if val_loss < best_loss:
+            best_loss = val_loss
+            best_state = {name: tensor.clone() for name, tensor in student.state_dict().items()}
+
+    student.load_state_dict(best_state)
+    student.eval()
+    return {'best_val_loss': best_loss, 'train_size': int(len(train_idx)), 'val_size': int(n_val)}
+
+def compare_encoders(teacher_name: str, student_name: str, repeats: int = 50) -> str:
+    """
+    Compare professeur et étudiant : taille, latence, précision d'un
+    classifieur entraîné sur les embeddings de chacun et accord de la
+    meilleure réponse sur les questions de test (absentes du corpus de
+    distillation, voir `build_corpus`).
+    """
+    faq = pd.read_csv(DATA_DIR / "faqs_clean.csv").dropna(subset=['question', 'Categorie'])
+    faq['question_clean'] = normalize_questions(faq['question'])
+    faq = faq.drop_duplicates(subset=['question_clean']).reset_index(drop=True)
+    test_questions = normalize_questions(pd.read_csv(DATA_DIR / "test_questions.csv")['question'].dropna()).tolist()
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(faq['Categorie'])
+    train_idx, test_idx = train_test_split(
+        np.arange(len(faq)), test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
+    )
+    categories = faq['Categorie'].to_numpy()
+
+    results = {}
+    for label, name in (('professeur', teacher_name), ('étudiant', student_name)):
+        logger.info(f"Évaluation de l'encodeur {label} ({name})...")
+        model, tokenizer, device, _ = load_encoder(name, 'float32', device=torch.device("cpu"))
+        faq_embeddings = encode_texts(model, tokenizer, device, faq['question_clean'].tolist())
+        test_embeddings = encode_texts(model, tokenizer, device, test_questions)
+
+        classifier = FAQClassifier()
+        classifier.train(faq_embeddings[train_idx], y[train_idx], label_encoder)
+        accuracy = float(np.mean(classifier.predict(faq_embeddings[test_idx]) == y[test_idx]))
+        test_categories = label_encoder.inverse_transform(classifier.predict(test_embeddings))
+
+        results[label] = {
+            'dim': faq_embeddings.shape[1],
+            'layers': model.config.num_hidden_layers,
+            'size_mb': model_size_mb(model),
+            'accuracy': accuracy,
+            'test_categories': test_categories,
+            'test_answers': top1_answers(faq_embeddings, categories, test_embeddings, test_categories)
+        }
+        results[label].update(measure_latency(model, tokenizer, device, test_questions, repeats))
+        del model
+
+    teacher, student = results['professeur'], results['étudiant']
+    report = [
+        "=== Rapport de Distillation ===",
+        f"Date: {datetime.now().isoformat()}",
+        f"Professeur: {teacher_name}",
+        f"Étudiant: {student_name}",
+        ""
+    ]
+    for label, result in results.items():
+        report.extend([
+            f"Encodeur {label}:",
+            f"- Couches: {result['layers']}, dimension: {result['dim']}",
+            f"- Taille: {result['size_mb']:.1f} Mo",
+            f"- Latence (1 question): {result['single_ms']:.1f} ms",
+            f"- Débit par lots: {result['batch_qps']:.1f} questions/s",
+            f"- Précision du classifieur (jeu de test FAQ): {result['accuracy']:.2%}",
+            ""
+        ])
+    report.extend([
+        "Comparaison:",
+        f"- Accélération (1 question): x{teacher['single_ms'] / student['single_ms']:.2f}",
+        f"- Accélération (lots): x{student['batch_qps'] / teacher['batch_qps']:.2f}",
+        f"- Écart de précision: {student['accuracy'] - teacher['accuracy']:+.2%}",
+        f"- Accord des catégories (questions de test, hors corpus de distillation): "
+        f"{np.mean(student['test_categories'] == teacher['test_categories']):.2%}",
+        f"- Accord de la meilleure réponse (questions de test): "
+        f"{np.mean(student['test_answers'] == teacher['test_answers']):.2%}"
+    ])
+    return "\n".join(report)
+
+def rebuild_artifacts(data_path: str):
+    """Réentraîne le classifieur et reconstruit les indices FAISS avec l'encodeur configuré."""
+    from src.train import train_model
+    from src.answer_finder import AnswerFinder
+
+    train_model(argparse.Namespace(
+        data=data_path, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+        save_embeddings=False, cv_folds=5, augment=False, backend=CLASSIFIER_BACKEND, no_cache=False
+    ))
+    AnswerFinder(data_path).rebuild_indices()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distillation de CamemBERT vers un encodeur étudiant plus petit")
+    parser.add_argument('--teacher', type=str, default=MODEL_NAME,
+                        help="Modèle professeur")
+    parser.add_argument('--output', type=str, default=str(DISTIL_MODEL_DIR),
+                        help="Dossier de sortie de l'étudiant")
+    parser.add_argument('--epochs', type=int, default=DISTIL_EPOCHS)
+    parser.add_argument('--learning-rate', type=float, default=DISTIL_LEARNING_RATE)
+    parser.add_argument('--batch-size', type=int, default=DISTIL_BATCH_SIZE)
+    parser.add_argument('--no-augment', action='store_true',
+                        help="Ne pas ajouter les augmentations au corpus")
+    parser.add_argument('--skip-training', action='store_true',
+                        help="Réutiliser l'étudiant déjà présent dans --output")
+    parser.add_argument('--compare', action='store_true',
+                        help="Comparer latence et précision du professeur et de l'étudiant")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Réentraîner le classifieur et reconstruire les indices FAISS "
+                             "(nécessite USE_DISTIL = True dans config.py)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    setup_logging()
+    torch.set_num_threads(NUM_THREADS)
+    output = Path(args.output)
+
+    if not args.skip_training:
+        start_time = time.time()
+        teacher, tokenizer, device, _ = load_encoder(args.teacher, 'float32', device=torch.device("cpu"))
+
+        corpus = build_corpus(augment=AUGMENTATION_ENABLED and not args.no_augment)
+        logger.info(f"Corpus de distillation: {len(corpus)} questions")
+        logger.info("Calcul des embeddings du professeur...")
+        teacher_embeddings = encode_texts(teacher, tokenizer, device, corpus)
+
+        student = build_student(teacher)
+        del teacher
+        stats = distill(corpus, teacher_embeddings, student, tokenizer,
+                        args.epochs, args.learning_rate, args.batch_size)
+
+        output.mkdir(parents=True, exist_ok=True)
+        student.save_pretrained(output)
+        tokenizer.save_pretrained(output)
+        stats.update({
+            'teacher': args.teacher,
+            'num_layers': DISTIL_NUM_LAYERS,
+            'hidden_size': DISTIL_HIDDEN_SIZE,
+            'epochs': args.epochs,
+            'corpus_size': len(corpus),
+            'training_time': time.time() - start_time
+        })
+        with open(output / "distillation.json", 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False)
+        logger.info(f"Étudiant sauvegardé dans {output}")
+
+    if args.compare:
+        report = compare_encoders(args.teacher, str(output))
+        print(report)
+
+        reports_dir = BASE_DIR / "reports"
+        reports_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        with open(reports_dir / f"distillation_report_{timestamp}.txt", "w", encoding="utf-8") as f:
+            f.write(report)
+        print(f"\nRapport sauvegardé dans le dossier 'reports/'")
+
+    if args.rebuild:
+        if not USE_DISTIL or Path(DISTIL_MODEL_NAME).resolve() != output.resolve():
+            logger.error("Activez USE_DISTIL (et DISTIL_MODEL_NAME vers l'étudiant) dans config.py "
+                         "avant de reconstruire le classifieur et les indices")
+            return
+        rebuild_artifacts(str(DATA_DIR / "faqs_clean.csv"))
+        logger.info("Classifieur et indices FAISS reconstruits sur les embeddings de l'étudiant")
+
+if __name__ == "__main__":
+    main()
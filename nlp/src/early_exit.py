@@ -0,0 +1,134 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .config import BATCH_SIZE, EARLY_EXIT_THRESHOLD
+from .data_preprocessing import iter_length_batches, masked_mean_pooling
+from .model import ConfidencePredictions, FAQClassifier
+from .normalization import normalize_questions
+
+logger = logging.getLogger(__name__)
+
+def forward_layers(model, hidden_states: torch.Tensor, attention_mask: torch.Tensor,
+                   start: int, stop: int) -> torch.Tensor:
+    """
+    Fait passer des états cachés dans les couches [start, stop) de l'encodeur.
+
+    Si `start` vaut 0, `hidden_states` contient les input_ids et la couche
+    d'embeddings est appliquée d'abord. Les couches sont celles du modèle
+    chargé : aucun poids n'est dupliqué.
+    """
+    if start == 0:
+        hidden_states = model.embeddings(input_ids=hidden_states)
+
+    # Masque additif (batch, 1, 1, longueur) : 0 sur les tokens, -inf sur le padding
+    dtype = hidden_states.dtype
+    extended_mask = (1.0 - attention_mask[:, None, None, :].to(dtype)) * torch.finfo(dtype).min
+    for layer in model.encoder.layer[start:stop]:
+        outputs = layer(hidden_states, attention_mask=extended_mask)
+        hidden_states = outputs[0] if isinstance(outputs, tuple) else outputs
+    return hidden_states
+
+class EarlyExitClassifier:
+    """
+    Classification avec sortie anticipée.
+
+    Les questions passent d'abord dans les `exit_layer` premières couches ; un
+    classifieur entraîné sur cette représentation (src/layer_sweep.py
+    --train-exit) décide seul quand sa probabilité maximale atteint le seuil.
+    Les autres questions reprennent le calcul à partir de cet état caché
+    jusqu'à la dernière couche et sont classées par le classifieur principal.
+
+    Réservé à la classification seule : la recherche de réponses a besoin de
+    l'embedding de la dernière couche, celui des index FAISS.
+    """
+
+    def __init__(self, preprocessor, classifier: FAQClassifier, exit_classifier: FAQClassifier,
+                 exit_layer: int, threshold: float = EARLY_EXIT_THRESHOLD):
+        num_layers = len(preprocessor.model.encoder.layer)
+        if not 0 < exit_layer < num_layers:
+            raise ValueError(f"Couche de sortie {exit_layer} invalide pour un encodeur de {num_layers} couches")
+
+        self.preprocessor = preprocessor
+        self.classifier = classifier
+        self.exit_classifier = exit_classifier
+        self.exit_layer = exit_layer
+        self.num_layers = num_layers
+        self.threshold = threshold
+
+        self.total = 0
+        self.exited = 0
+
+    def classify(self, questions: List[str], threshold: Optional[float] = None,
+                 batch_size: int = BATCH_SIZE) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Classe un lot de questions.
+
+        Returns:
+            tuple: (probabilités brutes du classifieur ayant décidé, prédictions
+                au format de FAQClassifier.predict_with_confidence)
+        """
+        model = self.preprocessor.model
+        device = self.preprocessor.device
+        texts = normalize_questions(questions)
+        n_classes = len(self.classifier.class_names)
+        probas = np.zeros((len(questions), n_classes))
+        predictions: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+
+        for batch_idx, input_ids, attention_mask in iter_length_batches(
+                self.preprocessor.tokenizer, texts, batch_size):
+            input_ids = input_ids.to(device)
+            attention_mask = attention_mask.to(device)
+
+            with torch.no_grad():
+                hidden = forward_layers(model, input_ids, attention_mask, 0, self.exit_layer)
+                exit_embeddings = masked_mean_pooling(hidden, attention_mask).cpu().numpy()
+            exit_probas = self.exit_classifier.predict_proba(exit_embeddings)
+            confident = exit_probas.max(axis=1) >= self.threshold
+
+            self._collect(probas, predictions, questions, batch_idx[confident], self.exit_classifier,
+                          exit_probas[confident], threshold)
+
+            rest = ~confident
+            if rest.any():
+                rest_rows = torch.from_numpy(rest).to(device)
+                rest_mask = attention_mask[rest_rows]
+                with torch.no_grad():
+                    final_hidden = forward_layers(model, hidden[rest_rows], rest_mask,
+                                                  self.exit_layer, self.num_layers)
+                    final_embeddings = masked_mean_pooling(final_hidden, rest_mask).cpu().numpy()
+                self._collect(probas, predictions, questions, batch_idx[rest], self.classifier,
+                              self.classifier.predict_proba(final_embeddings), threshold)
+
+            self.total += len(batch_idx)
+            self.exited += int(confident.sum())
+
+        logger.info(f"Sortie anticipée à la couche {self.exit_layer}: {self.exited}/{self.total} questions")
+        return probas, predictions
+
+    @staticmethod
+    def _collect(probas: np.ndarray, predictions: list, questions: List[str], positions: np.ndarray,
+                 classifier: FAQClassifier, group_probas: np.ndarray, threshold: Optional[float]):
+        """Range aux positions d'origine les prédictions d'un des deux classifieurs."""
+        if not len(positions):
+            return
+        # Probabilités déjà calculées : pas de seconde passe dans le classifieur
+        group_predictions = ConfidencePredictions(classifier, classifier.confidence_columns(
+            group_probas, threshold, questions=[questions[i] for i in positions]
+        ))
+        for position, proba, prediction in zip(positions, group_probas, group_predictions):
+            probas[position] = proba
+            predictions[position] = prediction
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne la couche de sortie, le seuil et la part des questions sorties tôt."""
+        return {
+            'exit_layer': self.exit_layer,
+            'num_layers': self.num_layers,
+            'threshold': self.threshold,
+            'total': self.total,
+            'exited': self.exited,
+            'exit_rate': self.exited / self.total if self.total else 0
+        }
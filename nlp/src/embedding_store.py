@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from .config import (
+    EMBEDDING_STORE_DIR, EMBEDDING_STORE_DTYPE, EMBEDDING_STORE_MAX_ENTRIES, EMBEDDING_STORE_KEEP_RATIO
+)
+from .utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+# En-tête : signature, dimension, taille en octets d'une composante
+_MAGIC = b"FAQEMB01"
+_HEADER = struct.Struct("<8sII")
+_KEY_SIZE = 16
+_DTYPES = {'float32': np.dtype('<f4'), 'float16': np.dtype('<f2')}
+
+class EmbeddingStore:
+    """
+    Cache disque des embeddings, partagé par tous les processus d'une machine.
+
+    Un fichier par empreinte de modèle contient des enregistrements de taille
+    fixe (clé de 16 octets + vecteur). Les écritures se font uniquement en fin
+    de fichier sous verrou exclusif ; les lectures passent par un mmap en
+    lecture seule, remappé quand le fichier a grandi. La clé est un hachage du
+    texte normalisé et de l'empreinte du modèle.
+
+    Chaque processus indexe les clés du fichier en mémoire : le fichier est
+    donc borné à `max_entries` vecteurs. Un ajout qui dépasserait la borne
+    remplace le fichier (rotation) par un fichier neuf ne gardant que les
+    vecteurs les plus récents (EMBEDDING_STORE_KEEP_RATIO) ; les autres
+    processus voient le changement de fichier et reconstruisent leur index.
+    Une clé absente ne relit le fichier (ouverture et verrou) que s'il a
+    grandi ou changé depuis la dernière lecture.
+    """
+
+    def __init__(self, fingerprint: str, dim: int, dtype: str = EMBEDDING_STORE_DTYPE,
+                 store_dir: Path = EMBEDDING_STORE_DIR, max_entries: int = EMBEDDING_STORE_MAX_ENTRIES):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Type de stockage non supporté: {dtype} (attendu: {', '.join(_DTYPES)})")
+        if max_entries < 1:
+            raise ValueError(f"max_entries doit être au moins 1 (reçu: {max_entries})")
+
+        self.fingerprint = fingerprint
+        self.dim = dim
+        self.dtype = _DTYPES[dtype]
+        self.max_entries = max_entries
+        self._record_dtype = np.dtype([('key', f'V{_KEY_SIZE}'), ('vector', self.dtype, (dim,))])
+
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        self.path = store_dir / f"{fingerprint}_{dtype}.emb"
+
+        self._lock = threading.Lock()
+        self._index = {}  # clé -> numéro d'enregistrement (au plus max_entries clés)
+        self._records = None
+        self._count = 0
+        self._inode = None  # Fichier indexé : un autre numéro signale une rotation
+
+        self._ensure_header()
+        self._refresh()
+        logger.info(f"Cache disque des embeddings: {self.path} ({self._count} vecteurs)")
+
+    def _key(self, text: str) -> bytes:
+        """Clé d'un texte normalisé pour l'empreinte du modèle courant."""
+        digest = hashlib.blake2b(digest_size=_KEY_SIZE)
+        digest.update(self.fingerprint.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+
+    def _ensure_header(self):
+        """Crée le fichier avec son en-tête, ou vérifie l'en-tête existant."""
+        with open(self.path, 'ab') as f:
+            with file_lock(f, exclusive=True):
+                if os.fstat(f.fileno()).st_size == 0:
+                    f.write(_HEADER.pack(_MAGIC, self.dim, self.dtype.itemsize))
+                    f.flush()
+
+        with open(self.path, 'rb') as f:
+            magic, dim, itemsize = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or dim != self.dim or itemsize != self.dtype.itemsize:
+            raise ValueError(f"Fichier de cache d'embeddings incompatible: {self.path}")
+
+    def _complete_size(self, size: int) -> int:
+        """Taille du fichier limitée à l'en-tête et aux enregistrements complets."""
+        itemsize = self._record_dtype.itemsize
+        return _HEADER.size + max(size - _HEADER.size, 0) // itemsize * itemsize
+
+    def _changed(self) -> bool:
+        """Le fichier a grandi ou a été remplacé depuis le dernier `_refresh` (un stat, sans ouverture ni verrou)."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        count = (self._complete_size(stat.st_size) - _HEADER.size) // self._record_dtype.itemsize
+        return stat.st_ino != self._inode or count > self._count
+
+    def _refresh(self):
+        """Indexe les enregistrements ajoutés depuis le dernier passage (par ce processus ou un autre)."""
+        with open(self.path, 'rb') as f:
+            with file_lock(f, exclusive=False):
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._inode:
+                    # Nouveau fichier (rotation) : l'index est reconstruit
+                    self._index = {}
+                    self._records = None
+                    self._count = 0
+                    self._inode = stat.st_ino
+                # Les octets d'un enregistrement incomplet en fin de fichier sont ignorés
+                count = (self._complete_size(stat.st_size) - _HEADER.size) // self._record_dtype.itemsize
+                if count <= self._count:
+                    return
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        records = np.frombuffer(mapped, dtype=self._record_dtype, count=count, offset=_HEADER.size)
+        for position, key in enumerate(records['key'][self._count:].tolist(), start=self._count):
+            self._index[key] = position
+        self._records = records
+        self._count = count
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cherche les embeddings de textes normalisés.
+
+        Returns:
+            tuple: (embeddings float32 (n, dim), masque booléen des textes trouvés)
+        """
+        keys = [self._key(text) for text in texts]
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        found = np.zeros(len(texts), dtype=bool)
+
+        with self._lock:
+            if any(key not in self._index for key in keys) and self._changed():
+                self._refresh()
+            for i, key in enumerate(keys):
+                position = self._index.get(key)
+                if position is not None:
+                    embeddings[i] = self._records['vector'][position]
+                    found[i] = True
+
+        return embeddings, found
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray):
+        """Ajoute en fin de fichier les embeddings des textes qui n'y sont pas encore."""
+        with self._lock:
+            self._refresh()
+            new_records = {}
+            for text, embedding in zip(texts, embeddings):
+                key = self._key(text)
+                if key not in self._index and key not in new_records:
+                    new_records[key] = embedding
+            if not new_records:
+                return
+
+            records = np.empty(len(new_records), dtype=self._record_dtype)
+            records['key'] = [np.void(key) for key in new_records]
+            records['vector'] = np.asarray(list(new_records.values()), dtype=self.dtype)
+
+            while True:
+                with open(self.path, 'ab') as f:
+                    with file_lock(f, exclusive=True):
+                        if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                            continue  # Fichier remplacé par une rotation pendant l'attente du verrou
+                        size = os.fstat(f.fileno()).st_size
+                        complete = self._complete_size(size)
+                        count = (complete - _HEADER.size) // self._record_dtype.itemsize
+                        if count + len(records) > self.max_entries:
+                            self._rotate(complete, records)
+                            break
+                        # Un enregistrement incomplet en fin de fichier (écriture interrompue) est
+                        # coupé : sinon tous les ajouts suivants seraient décalés
+                        if complete != size:
+                            logger.warning(f"Cache d'embeddings {self.path}: {size - complete} octets "
+                                           f"d'un enregistrement incomplet supprimés")
+                            f.truncate(complete)
+                        f.write(records.tobytes())
+                        f.flush()
+                        break
+
+            self._refresh()
+
+    def _rotate(self, complete: int, records: np.ndarray):
+        """
+        Remplace le fichier plein par un fichier neuf : les vecteurs les plus
+        récents puis `records` (appelé sous le verrou exclusif de l'ancien fichier).
+        """
+        itemsize = self._record_dtype.itemsize
+        records = records[-self.max_entries:]
+        count = (complete - _HEADER.size) // itemsize
+        keep = min(count, int(self.max_entries * EMBEDDING_STORE_KEEP_RATIO), self.max_entries - len(records))
+        with open(self.path, 'rb') as f:
+            f.seek(complete - keep * itemsize)
+            kept = f.read(keep * itemsize)
+
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, self.dim, self.dtype.itemsize))
+                f.write(kept)
+                f.write(records.tobytes())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Fichier encore ouvert ailleurs (hors POSIX) : les vecteurs seront recalculés
+            logger.warning(f"Rotation du cache d'embeddings {self.path} impossible: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        logger.info(f"Cache d'embeddings {self.path} plein ({count} vecteurs) : "
+                    f"remplacé par {keep + len(records)} vecteurs récents")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_stats(self) -> dict:
+        """Retourne le chemin, le nombre de vecteurs, la borne et la taille du fichier."""
+        return {
+            'path': str(self.path),
+            'size': self._count,
+            'max_entries': self.max_entries,
+            'dtype': self.dtype.name,
+            'bytes': self.path.stat().st_size
+        }
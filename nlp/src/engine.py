@@ -0,0 +1,461 @@
+import copy
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .data_preprocessing import DataPreprocessor
+from .model import FAQClassifier, ConfidencePredictions
+from .normalization import normalize_questions
+from .answer_finder import AnswerFinder
+from .batcher import EmbeddingBatcher
+from .cache import LRUCache
+from .early_exit import EarlyExitClassifier
+from .fused_model import FusedModel
+from .config import (
+    RESPONSE_CACHE_SIZE, CACHE_TTL, ARTIFACT_CHECK_INTERVAL,
+    EARLY_EXIT_LAYER, EARLY_EXIT_THRESHOLD, EARLY_EXIT_DIR, KEYWORD_SHORTCUT, FUSED_MODEL_ENABLED
+)
+from .model_singleton import ModelSingleton
+from .utils import artifact_version
+
+logger = logging.getLogger(__name__)
+
+class FAQEngine:
+    """
+    Pipeline complet question -> catégorie -> réponse.
+
+    Le moteur possède un seul encodeur (et donc un seul cache d'embeddings),
+    le classifieur et le chercheur de réponses. Chaque question est encodée
+    une seule fois et son embedding est réutilisé pour la classification et
+    pour la recherche FAISS.
+
+    Les réponses complètes de `predict` et `predict_batch` sont mises en
+    cache par question normalisée et par version de l'encodeur, du
+    classifieur et des index FAISS. Quand ces fichiers changent sur disque,
+    les composants sont rechargés et les anciennes entrées ne sont plus
+    jamais servies.
+
+    Sur CPU, un modèle fusionné (src/fused_model.py) correspondant à
+    l'encodeur et au classifieur remplace l'encodeur : une seule exécution
+    donne l'embedding et les probabilités des questions à encoder.
+    """
+
+    def __init__(self, faq_data_path=None, micro_batching: bool = False, with_answers: bool = True):
+        """
+        Initialise le moteur.
+
+        Args:
+            faq_data_path (str, optional): Chemin vers le fichier CSV des FAQ
+            micro_batching (bool): Regrouper les encodages des appels concurrents à `predict`
+            with_answers (bool): Charger l'AnswerFinder (inutile pour la classification seule) ;
+                sans réponses, la sortie anticipée est utilisée si EARLY_EXIT_LAYER est défini
+        """
+        start_time = time.time()
+        self.faq_data_path = faq_data_path
+        self.preprocessor = DataPreprocessor()
+        self.encoder_fingerprint = ModelSingleton().get_fingerprint()
+
+        self.classifier_version = artifact_version(self._classifier_paths())
+        self.classifier = FAQClassifier.load()
+        self._check_classifier_encoder()
+        self.fused = self._load_fused()
+        self.answer_finder = None
+        self.index_version = None
+        if with_answers:
+            self.answer_finder = AnswerFinder(faq_data_path, preprocessor=self.preprocessor)
+            self.index_version = artifact_version(self.answer_finder.artifact_paths())
+
+        self.early_exit = None
+        if not with_answers and EARLY_EXIT_LAYER is not None:
+            self.early_exit = EarlyExitClassifier(
+                self.preprocessor, self.classifier, FAQClassifier.load(EARLY_EXIT_DIR),
+                EARLY_EXIT_LAYER, EARLY_EXIT_THRESHOLD
+            )
+
+        self.batcher = EmbeddingBatcher(self.preprocessor, encode=self._encode) if micro_batching else None
+        self.response_cache = LRUCache(max_entries=RESPONSE_CACHE_SIZE, ttl=CACHE_TTL)
+        self._reload_lock = threading.Lock()
+        self._next_check = time.monotonic() + ARTIFACT_CHECK_INTERVAL
+        logger.info(f"Moteur FAQ initialisé en {time.time() - start_time:.2f} secondes")
+
+    def check_artifacts(self, force: bool = False) -> bool:
+        """
+        Recharge le classifieur ou les index si leurs fichiers ont changé.
+
+        La vérification (quelques appels à stat) a lieu au plus une fois
+        toutes les ARTIFACT_CHECK_INTERVAL secondes.
+
+        Returns:
+            bool: True si un composant a été rechargé
+        """
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        reloaded = False
+        try:
+            self._next_check = now + ARTIFACT_CHECK_INTERVAL
+
+            classifier_version = artifact_version(self._classifier_paths())
+            if classifier_version != self.classifier_version:
+                logger.info("Nouveau classifieur détecté, rechargement...")
+                try:
+                    self.classifier = FAQClassifier.load()
+                    self.classifier_version = classifier_version
+                    self._check_classifier_encoder()
+                    self.fused = self._load_fused()
+                    if self.early_exit is not None:
+                        self.early_exit.classifier = self.classifier
+                    reloaded = True
+                except Exception as e:
+                    logger.error(f"Erreur lors du rechargement du classifieur: {str(e)}")
+
+            if self.answer_finder is not None:
+                index_version = artifact_version(self.answer_finder.artifact_paths())
+                if index_version != self.index_version:
+                    logger.info("Nouveaux index FAISS détectés, rechargement...")
+                    try:
+                        self.answer_finder = AnswerFinder(self.faq_data_path, preprocessor=self.preprocessor)
+                        self.index_version = artifact_version(self.answer_finder.artifact_paths())
+                        reloaded = True
+                    except Exception as e:
+                        logger.error(f"Erreur lors du rechargement des index FAISS: {str(e)}")
+
+            if reloaded:
+                self.response_cache.clear()
+        finally:
+            self._reload_lock.release()
+
+        return reloaded
+
+    def update_faqs(self, upserts: List[Dict[str, Any]] = (), delete_ids: List[int] = ()) -> Dict[str, List[int]]:
+        """
+        Ajoute, modifie ou supprime des FAQs sans redémarrage.
+
+        Le nouveau chercheur de réponses est préparé à côté de l'actuel, qui
+        continue de servir les requêtes, puis les remplace en une affectation.
+
+        Returns:
+            dict: Identifiants des FAQs ajoutées ou modifiées et supprimées
+        """
+        if self.answer_finder is None:
+            raise RuntimeError("Moteur chargé sans recherche de réponses")
+        with self._reload_lock:
+            answer_finder, summary = self.answer_finder.with_changes(upserts, delete_ids)
+            self.answer_finder = answer_finder
+            self.index_version = artifact_version(answer_finder.artifact_paths())
+            self.response_cache.clear()
+        return summary
+
+    @staticmethod
+    def _classifier_paths() -> List:
+        """Fichiers du classifieur et du modèle fusionné, rechargés ensemble."""
+        return FAQClassifier.artifact_paths() + FusedModel.artifact_paths()
+
+    def _load_fused(self) -> Optional[FusedModel]:
+        """Modèle fusionné de l'encodeur et du classifieur chargés, s'il existe (CPU seulement)."""
+        if not FUSED_MODEL_ENABLED or self.preprocessor.device.type != 'cpu':
+            return None
+        return FusedModel.load(self.preprocessor.tokenizer, self.encoder_fingerprint, self.classifier.head)
+
+    def _check_classifier_encoder(self):
+        """Signale un classifieur entraîné sur les embeddings d'un autre encodeur."""
+        trained_with = self.classifier.encoder_fingerprint
+        if trained_with is not None and trained_with != self.encoder_fingerprint:
+            logger.warning(
+                f"Le classifieur a été entraîné avec un autre encodeur ({trained_with}, "
+                f"actuel: {self.encoder_fingerprint}) ; réentraînez-le avec src/train.py"
+            )
+
+    def _response_key(self, question: str, min_similarity: float, threshold: Optional[float]) -> tuple:
+        """
+        Clé du cache de réponses : question normalisée, règle de mot-clé
+        reconnue dans le texte brut et versions des artefacts.
+
+        Les règles de mot-clé s'appliquent à la question telle quelle : « Pouvez-vous
+        bloquer ma carte ? » et « bloquer ma carte » ont la même forme normalisée
+        mais pas la même catégorie.
+        """
+        return (
+            self.preprocessor.cache_key(question),
+            self.classifier.keyword_matcher.match(question),
+            min_similarity,
+            threshold,
+            self.encoder_fingerprint,
+            self.classifier_version,
+            self.index_version
+        )
+
+    def _encode(self, questions: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Encode des questions absentes du cache mémoire.
+
+        Avec le modèle fusionné, les questions absentes du cache disque passent
+        par une seule exécution du graphe, qui donne aussi leurs probabilités
+        brutes (NaN pour les embeddings lus sur disque) ; sans lui, par
+        l'encodeur seul.
+
+        Returns:
+            tuple: (embeddings, probabilités brutes ou None)
+        """
+        fused = self.fused
+        if fused is None:
+            return self.preprocessor.embed_batch(questions), None
+
+        texts = normalize_questions(questions)
+        store = self.preprocessor.embedding_store
+        if store is None:
+            return fused.encode(texts)
+        embeddings, found = store.get_many(texts)
+        probas = np.full((len(texts), len(fused.classes)), np.nan, dtype=np.float32)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            missing_texts = [texts[i] for i in missing]
+            computed, computed_probas = fused.encode(missing_texts)
+            embeddings[missing] = computed
+            probas[missing] = computed_probas
+            store.put_many(missing_texts, computed)
+        return embeddings, probas
+
+    def _embed(self, question: str) -> Tuple[np.ndarray, bool, Optional[np.ndarray]]:
+        """`embed`, avec les probabilités brutes (1, catégories) du modèle fusionné s'il a servi."""
+        embedding = self.preprocessor.get_cached_embedding(question)
+        if embedding is not None:
+            return embedding, True, None
+        if self.batcher is not None:
+            embedding, probas = self.batcher.embed(question)
+            return embedding, False, probas[np.newaxis] if probas is not None else None
+        embeddings, probas = self._encode([question])
+        self.preprocessor.cache_embedding(question, embeddings[0])
+        return embeddings[0], False, probas
+
+    def embed(self, question: str) -> Tuple[np.ndarray, bool]:
+        """Retourne l'embedding d'une question et indique s'il provient du cache."""
+        embedding, cache_hit, _ = self._embed(question)
+        return embedding, cache_hit
+
+    def _embed_batch(self, questions: List[str]) -> Tuple[np.ndarray, List[bool], Optional[np.ndarray]]:
+        """`embed_batch`, avec les probabilités brutes du modèle fusionné (NaN hors des questions encodées)."""
+        cached = [self.preprocessor.get_cached_embedding(question) for question in questions]
+        cache_hits = [embedding is not None for embedding in cached]
+        missing = [i for i, hit in enumerate(cache_hits) if not hit]
+
+        embeddings = np.empty((len(questions), self.preprocessor.model.config.hidden_size), dtype=np.float32)
+        for i, embedding in enumerate(cached):
+            if embedding is not None:
+                embeddings[i] = embedding
+
+        probas = None
+        if missing:
+            computed, computed_probas = self._encode([questions[i] for i in missing])
+            if computed_probas is not None:
+                probas = np.full((len(questions), computed_probas.shape[1]), np.nan, dtype=np.float32)
+                probas[missing] = computed_probas
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+                self.preprocessor.cache_embedding(questions[i], embedding)
+
+        return embeddings, cache_hits, probas
+
+    def embed_batch(self, questions: List[str]) -> Tuple[np.ndarray, List[bool]]:
+        """Encode un lot de questions en n'envoyant au modèle que celles absentes du cache."""
+        embeddings, cache_hits, _ = self._embed_batch(questions)
+        return embeddings, cache_hits
+
+    def _predict_with_confidence(self, embeddings: np.ndarray, probas: Optional[np.ndarray],
+                                 threshold: Optional[float], questions: List[str]) -> ConfidencePredictions:
+        """`predict_with_confidence`, en reprenant les probabilités déjà calculées par le modèle fusionné."""
+        if probas is None:
+            return self.classifier.predict_with_confidence(embeddings, threshold, questions=questions)
+        missing = np.isnan(probas[:, 0])
+        if missing.any():
+            probas[missing] = self.classifier.predict_proba(embeddings[missing])
+        return ConfidencePredictions(self.classifier, self.classifier.confidence_columns(probas, threshold, questions))
+
+    def predict(self, question: str, min_similarity: float = 0.7,
+                threshold: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Classe une question et cherche sa meilleure réponse.
+
+        Quand la classification est incertaine, les alternatives de la réponse
+        peuvent venir des catégories voisines (même recherche FAISS). Une
+        question reconnue par une règle de mot-clé dont la catégorie a une
+        réponse fixe ou lexicale est traitée sans l'encodeur.
+
+        Returns:
+            dict: {
+                'question': str,
+                'prediction': dict,  # Format de FAQClassifier.predict_with_confidence
+                'answer': dict,  # Format de AnswerFinder.find_best_answer
+                'cache_hit': bool,  # Embedding ou réponse trouvé en cache
+                'response_cache_hit': bool  # Réponse complète servie depuis le cache
+            }
+        """
+        self.check_artifacts()
+        shortcut = self._keyword_shortcut(question)
+        if shortcut is not None:
+            return self._shortcut_result(question, shortcut)
+
+        key = self._response_key(question, min_similarity, threshold)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return self._cached_result(question, cached)
+
+        embedding, cache_hit, probas = self._embed(question)
+        prediction = self._predict_with_confidence(embedding.reshape(1, -1), probas, threshold, [question])[0]
+        # Catégorie incertaine : alternatives cherchées aussi dans les autres catégories
+        answer = self.answer_finder.find_best_answer_from_embedding(
+            embedding, prediction['category'], min_similarity,
+            other_categories=not prediction['is_confiant']
+        )
+        self._cache_response(key, prediction, answer)
+        return {
+            'question': question,
+            'prediction': prediction,
+            'answer': answer,
+            'cache_hit': cache_hit,
+            'response_cache_hit': False
+        }
+
+    def classify_batch(self, questions: Iterable[str],
+                       threshold: Optional[float] = None) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Encode et classe un lot de questions ; retourne (embeddings, prédictions)."""
+        questions = list(questions)
+        embeddings, _, probas = self._embed_batch(questions)
+        return embeddings, self._predict_with_confidence(embeddings, probas, threshold, questions)
+
+    def classify(self, questions: Iterable[str],
+                 threshold: Optional[float] = None) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Classe un lot de questions, avec sortie anticipée si elle est activée.
+
+        Returns:
+            tuple: (probabilités brutes par catégorie, prédictions)
+        """
+        questions = list(questions)
+        if self.early_exit is not None:
+            return self.early_exit.classify(questions, threshold)
+        _, predictions = self.classify_batch(questions, threshold)
+        return predictions.columns['raw_probabilities'], predictions
+
+    def predict_batch(self, questions: Iterable[str], min_similarity: float = 0.7,
+                      threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Version par lot de `predict` : un seul encodage et une recherche FAISS
+        par catégorie pour les questions absentes du cache de réponses.
+        """
+        questions = list(questions)
+        if not questions:
+            return []
+
+        self.check_artifacts()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        keys: Dict[int, tuple] = {}
+        for position, question in enumerate(questions):
+            shortcut = self._keyword_shortcut(question)
+            if shortcut is not None:
+                results[position] = self._shortcut_result(question, shortcut)
+                continue
+            key = self._response_key(question, min_similarity, threshold)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                results[position] = self._cached_result(question, cached)
+            else:
+                keys[position] = key
+
+        # Encoder seulement les questions sans réponse par mot-clé ni en cache
+        positions = list(keys)
+        if positions:
+            rest = [questions[position] for position in positions]
+            embeddings, cache_hits, probas = self._embed_batch(rest)
+            predictions = self._predict_with_confidence(embeddings, probas, threshold, rest)
+            answers = self.answer_finder.find_best_answers_batch(
+                embeddings,
+                [prediction['category'] for prediction in predictions],
+                min_similarity=min_similarity,
+                other_categories=[not prediction['is_confiant'] for prediction in predictions]
+            )
+            for position, question, prediction, answer, cache_hit in zip(
+                    positions, rest, predictions, answers, cache_hits):
+                self._cache_response(keys[position], prediction, answer)
+                results[position] = {
+                    'question': question,
+                    'prediction': prediction,
+                    'answer': answer,
+                    'cache_hit': cache_hit,
+                    'response_cache_hit': False
+                }
+        return results
+
+    def _keyword_shortcut(self, question: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Route une question par les règles de mot-clé, avant tout encodage.
+
+        Returns:
+            tuple: (prédiction, réponse) si une règle s'applique et que sa
+                catégorie a une réponse fixe ou lexicale ; None sinon
+        """
+        if not KEYWORD_SHORTCUT or self.answer_finder is None:
+            return None
+        category = self.classifier.keyword_matcher.match(question)
+        if category is None:
+            return None
+        answer = self.answer_finder.keyword_answer(question, category)
+        if answer is None:
+            return None
+        return self.classifier.keyword_prediction(category), answer
+
+    def _cache_response(self, key: tuple, prediction: Dict[str, Any], answer: Dict[str, Any]):
+        """Met en cache une copie de la réponse : l'appelant peut modifier le résultat retourné."""
+        self.response_cache.set(key, copy.deepcopy({'prediction': prediction, 'answer': answer}))
+
+    @staticmethod
+    def _cached_result(question: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """Résultat de `predict` pour une réponse servie depuis le cache de réponses (copie de l'entrée)."""
+        cached = copy.deepcopy(cached)
+        return {
+            'question': question,
+            'prediction': cached['prediction'],
+            'answer': cached['answer'],
+            'cache_hit': True,
+            'response_cache_hit': True
+        }
+
+    @staticmethod
+    def _shortcut_result(question: str, shortcut: Tuple[Dict[str, Any], Dict[str, Any]]) -> Dict[str, Any]:
+        """Résultat de `predict` pour une question traitée sans l'encodeur."""
+        prediction, answer = shortcut
+        return {
+            'question': question,
+            'prediction': prediction,
+            'answer': answer,
+            'cache_hit': False,
+            'response_cache_hit': False
+        }
+
+    def clear_cache(self):
+        """Vide les caches de réponses, de l'encodeur et des similarités."""
+        self.response_cache.clear()
+        self.preprocessor.clear_cache()
+        if self.answer_finder is not None:
+            self.answer_finder.clear_cache()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques des caches d'embeddings et de similarités."""
+        stats = {
+            'responses': self.response_cache.get_stats(),
+            'embeddings': self.preprocessor.get_cache_stats(),
+            'versions': {
+                'encoder': self.encoder_fingerprint,
+                'classifier': self.classifier_version,
+                'indices': self.index_version
+            }
+        }
+        if self.answer_finder is not None:
+            stats['similarities'] = self.answer_finder.similarity_cache.get_stats()
+        return stats
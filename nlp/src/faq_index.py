@@ -0,0 +1,688 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+
+from .config import (
+    FAISS_INDICES_DIR, FAISS_INDEX_TYPE, ANN_MIN_SIZE, ANN_IVF_MIN_SIZE, ANN_EXACT_MAX,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, HNSW_MAX_EF_SEARCH, IVF_NLIST, IVF_NPROBE,
+    FAISS_STORAGE, PQ_M, RESCORE_FACTOR
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf', 'auto')
+STORAGE_MODES = ('float32', 'fp16', 'sq8', 'pq')
+
+def resolve_index_type(index_type: str, n: int) -> str:
+    """Type d'index effectif : 'auto' choisit selon le nombre de vecteurs."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index inconnu: {index_type} (attendu: {', '.join(INDEX_TYPES)})")
+    if index_type != 'auto':
+        return index_type
+    if n < ANN_MIN_SIZE:
+        return 'flat'
+    return 'hnsw' if n < ANN_IVF_MIN_SIZE else 'ivf'
+
+def ivf_nlist(n: int) -> int:
+    """Nombre de listes IVF : IVF_NLIST, ou environ 4·sqrt(n) borné par n / 39 (apprentissage)."""
+    if IVF_NLIST:
+        return IVF_NLIST
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+def storage_code(storage: str, n: int, dim: int) -> str:
+    """
+    Codage des vecteurs dans l'index, au format de faiss.index_factory.
+
+    'fp16' et 'sq8' divisent la mémoire par 2 et 4 ; 'pq' découpe chaque
+    vecteur en PQ_M sous-vecteurs codés sur au plus 8 bits (moins sur une
+    petite base, pour garder assez de vecteurs d'apprentissage par centroïde).
+    """
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Stockage inconnu: {storage} (attendu: {', '.join(STORAGE_MODES)})")
+    if storage == 'float32':
+        return "Flat"
+    if storage == 'fp16':
+        return "SQfp16"
+    if storage == 'sq8':
+        return "SQ8"
+    m = max(d for d in range(1, min(PQ_M, dim) + 1) if dim % d == 0)
+    nbits = int(min(8, max(4, math.log2(max(n, 1) / 39))))
+    return f"PQ{m}x{nbits}"
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str, storage: str = 'float32',
+                      ids: Optional[np.ndarray] = None) -> faiss.Index:
+    """
+    Construit un index FAISS du type demandé ('flat', 'hnsw' ou 'ivf') avec le
+    stockage demandé ('float32', 'fp16', 'sq8' ou 'pq').
+
+    Les vecteurs sont ajoutés avec leurs identifiants de ligne `ids` (0..n-1
+    par défaut) : un index IVF les gère lui-même, les autres sont enveloppés
+    dans un IndexIDMap2 pour pouvoir retirer ou remplacer une ligne.
+    """
+    n, dim = embeddings.shape
+    ids = np.arange(n, dtype='int64') if ids is None else np.asarray(ids, dtype='int64')
+    code = storage_code(storage, n, dim)
+    if index_type == 'flat':
+        # IndexPQ n'accepte pas de sélecteur : une seule liste IVF fait une recherche exhaustive
+        description = f"IVF1,{code}" if storage == 'pq' else code
+    elif index_type == 'hnsw':
+        description = f"HNSW{HNSW_M}_{code}" if storage == 'pq' else f"HNSW{HNSW_M},{code}"
+    elif index_type == 'ivf':
+        description = f"IVF{ivf_nlist(n)},{code}"
+    else:
+        raise ValueError(f"Type d'index inconnu: {index_type}")
+
+    if not description.startswith("IVF"):
+        description = f"IDMap2,{description}"
+
+    index = faiss.index_factory(dim, description)
+    if isinstance(base_index(index), faiss.IndexHNSW):
+        base_index(index).hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        # 256 vecteurs par centroïde suffisent à l'apprentissage
+        sample = embeddings
+        if n > 100000:
+            sample = embeddings[np.random.default_rng(0).choice(n, 100000, replace=False)]
+        index.train(sample)
+
+    index.add_with_ids(embeddings, ids)
+    if isinstance(index, faiss.IndexIVF):
+        # Table de hachage : relit les vecteurs des petites catégories et permet remove_ids
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """Index FAISS sous l'éventuel IndexIDMap2."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_type_of(index: faiss.Index) -> str:
+    """Type ('flat', 'hnsw' ou 'ivf') d'un index FAISS chargé sans métadonnées."""
+    index = base_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVF) and index.nlist > 1:
+        return 'ivf'
+    return 'flat'
+
+def index_params(index_type: str, storage: str) -> Dict[str, object]:
+    """Paramètres de construction d'un index FAISS, comparés à la configuration au chargement."""
+    params = {'index_type': index_type, 'storage': storage}
+    if index_type == 'hnsw':
+        params.update(M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+    elif index_type == 'ivf':
+        params.update(nlist=IVF_NLIST)
+    if storage == 'pq':
+        params.update(pq_m=PQ_M)
+    return params
+
+def category_hashes(ids: Iterable[int], row_categories: Iterable[str], questions: Iterable[str],
+                    answers: Iterable[str]) -> Dict[str, str]:
+    """
+    Empreinte du contenu de chaque catégorie : identifiant, question et
+    réponse de ses lignes, dans l'ordre des identifiants.
+    """
+    rows = {}
+    for row, category, question, answer in zip(ids, row_categories, questions, answers):
+        rows.setdefault(category, []).append((int(row), str(question), str(answer)))
+    hashes = {}
+    for category, category_rows in rows.items():
+        digest = hashlib.sha1()
+        for row, question, answer in sorted(category_rows):
+            digest.update(f"{row}\x1f{question}\x1f{answer}\x1e".encode('utf-8'))
+        hashes[category] = digest.hexdigest()[:16]
+    return hashes
+
+def compact_codes(codes: np.ndarray, table: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Retire d'une table les entrées qu'aucune ligne ne référence et renumérote les codes (-1 conservé)."""
+    used = np.unique(codes[codes >= 0])
+    remap = np.full(len(table), -1, dtype=np.int32)
+    remap[used] = np.arange(len(used), dtype=np.int32)
+    return np.where(codes >= 0, remap[np.maximum(codes, 0)], -1).astype(np.int32), [table[code] for code in used]
+
+def save_array(path: Path, array: np.ndarray):
+    """
+    Écrit un tableau .npy via un fichier temporaire renommé : les processus
+    qui projettent encore l'ancien fichier en mémoire gardent un contenu valide.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+class StringTable:
+    """
+    Table de chaînes stockée sans pickle : les textes UTF-8 sont concaténés
+    dans un tableau d'octets et `offsets[i]:offsets[i + 1]` délimite la
+    chaîne i. Ouverte depuis le disque, la table est projetée en mémoire et
+    chaque chaîne n'est décodée que lorsqu'elle est lue.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Sequence[str]) -> 'StringTable':
+        """Construit une table en mémoire à partir d'une liste de chaînes."""
+        encoded = [str(string).encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    @staticmethod
+    def paths(directory: Path, name: str) -> Tuple[Path, Path]:
+        return Path(directory) / f"{name}.npy", Path(directory) / f"{name}_offsets.npy"
+
+    def save(self, directory: Path, name: str):
+        blob_path, offsets_path = self.paths(directory, name)
+        save_array(blob_path, self.blob)
+        save_array(offsets_path, self.offsets)
+
+    @classmethod
+    def open(cls, directory: Path, name: str) -> 'StringTable':
+        """Ouvre une table sauvegardée, en projection mémoire (lecture seule)."""
+        blob_path, offsets_path = cls.paths(directory, name)
+        return cls(np.load(blob_path, mmap_mode='r'), np.load(offsets_path, mmap_mode='r'))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+class FAQIndex:
+    """
+    Index FAISS unique sur toutes les questions de la base FAQ.
+
+    Chaque ligne de l'index porte un identifiant de catégorie (tableau
+    compact `category_ids`). Une même recherche peut être restreinte à la
+    catégorie prédite de chaque question (sélecteur d'identifiants FAISS) et
+    globale, pour proposer des alternatives venant d'autres catégories.
+
+    L'index peut être exact (flat) ou approché (HNSW, IVF). Avec un index
+    approché, les paramètres de recherche dépendent de la taille de la
+    catégorie : efSearch / nprobe sont augmentés en proportion de la part de
+    la base qu'elle représente, et les catégories de moins de ANN_EXACT_MAX
+    questions sont cherchées exactement sur leurs seuls vecteurs.
+
+    Les vecteurs peuvent être compressés dans l'index (float16, SQ8 ou PQ).
+    Les vecteurs float32 sont alors écrits à part (`faq_vectors.npy`) et
+    projetés en mémoire, jamais chargés : ils servent à recalculer les
+    distances exactes des RESCORE_FACTOR * k meilleurs candidats.
+
+    Sur disque, chaque élément est un fichier projetable en mémoire (index
+    FAISS, tableaux .npy, tables de chaînes) : le chargement ne copie rien et
+    les workers d'une même machine partagent les pages du cache système. Le
+    fichier de métadonnées `faq_index.json` est écrit en dernier.
+
+    Une même réponse sert souvent à des dizaines de reformulations : les
+    réponses sont stockées une seule fois et chaque ligne porte l'identifiant
+    entier de la sienne (`answer_ids`).
+
+    Les métadonnées servent de manifeste : empreinte de l'encodeur,
+    paramètres de construction et empreinte du contenu de chaque catégorie
+    (`category_hashes`). Au chargement, seules les catégories dont le contenu
+    a changé sont réencodées (`stale_categories`).
+    """
+
+    FORMAT_VERSION = 4  # Incrémenté à chaque changement de disposition des fichiers
+    FILENAME = "faq_index.json"
+    INDEX_FILENAME = "faq_index.faiss"
+    CATEGORY_IDS_FILENAME = "faq_category_ids.npy"
+    ANSWER_IDS_FILENAME = "faq_answer_ids.npy"
+    VECTORS_FILENAME = "faq_vectors.npy"
+
+    def __init__(self, index: faiss.Index, category_ids: np.ndarray, categories: Sequence[str],
+                 questions: Union[Sequence[str], StringTable], answer_ids: np.ndarray,
+                 answers: Union[Sequence[str], StringTable], encoder_fingerprint: Optional[str] = None,
+                 index_type: Optional[str] = None, storage: str = 'float32', vectors: Optional[np.ndarray] = None,
+                 params: Optional[Dict[str, object]] = None, hashes: Optional[Dict[str, str]] = None):
+        self.index = index
+        self.category_ids = np.asarray(category_ids, dtype=np.int32)
+        self.categories = list(categories)
+        self.questions = questions if isinstance(questions, StringTable) else StringTable.from_strings(questions)
+        self.answer_ids = np.asarray(answer_ids, dtype=np.int32)
+        self.answers = answers if isinstance(answers, StringTable) else StringTable.from_strings(answers)
+        self.encoder_fingerprint = encoder_fingerprint
+
+        self.index_type = index_type or index_type_of(index)
+        self.storage = storage
+        self.vectors = vectors  # Vecteurs exacts (projetés en mémoire) si l'index est compressé
+        self.directory = None  # Dossier de sauvegarde si l'index a été chargé depuis le disque
+        self.params = params if params is not None else index_params(self.index_type, storage)
+        self.category_hashes = dict(hashes or {})  # catégorie -> empreinte de ses lignes
+
+        self._codes = {category: code for code, category in enumerate(self.categories)}
+        self._selectors = {}  # code -> (sélecteur FAISS, identifiants gardés en vie)
+        self._params = {}  # (code, k) -> paramètres de recherche FAISS
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, row_categories: Sequence[str], questions: Sequence[str],
+              answers: Sequence[str], encoder_fingerprint: Optional[str] = None,
+              index_type: str = None, storage: str = None, ids: Optional[Sequence[int]] = None) -> 'FAQIndex':
+        """
+        Construit l'index à partir des embeddings et de la catégorie de chaque ligne.
+
+        Args:
+            index_type (str, optional): 'flat', 'hnsw', 'ivf' ou 'auto' (FAISS_INDEX_TYPE par défaut)
+            storage (str, optional): 'float32', 'fp16', 'sq8' ou 'pq' (FAISS_STORAGE par défaut)
+            ids (list, optional): Identifiant stable de chaque ligne (position par défaut) ;
+                les identifiants absents sont des lignes supprimées
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        ids = np.arange(len(embeddings), dtype='int64') if ids is None else np.asarray(ids, dtype='int64')
+        n_rows = int(ids.max()) + 1 if len(ids) else 0
+        positional = np.array_equal(ids, np.arange(n_rows))
+
+        categories = list(dict.fromkeys(row_categories))
+        codes = {category: code for code, category in enumerate(categories)}
+        category_ids = np.full(n_rows, -1, dtype=np.int32)
+        category_ids[ids] = [codes[category] for category in row_categories]
+        unique_answers = {}
+        answer_ids = np.full(n_rows, -1, dtype=np.int32)
+        answer_ids[ids] = [unique_answers.setdefault(answer, len(unique_answers)) for answer in answers]
+        row_questions = questions
+        if not positional:
+            row_questions = [""] * n_rows
+            for row, question in zip(ids, questions):
+                row_questions[row] = question
+
+        index_type = resolve_index_type(index_type or FAISS_INDEX_TYPE, len(embeddings))
+        storage = storage or FAISS_STORAGE
+        index = build_faiss_index(embeddings, index_type, storage, ids)
+
+        logger.info(f"Index FAISS {index_type} ({storage}) construit: {index.ntotal} questions, "
+                    f"{len(unique_answers)} réponses distinctes, {len(categories)} catégories")
+        # Jusqu'à la sauvegarde, les vecteurs exacts sont ceux reçus (aucune copie si les
+        # identifiants sont les positions)
+        vectors = None
+        if storage != 'float32':
+            vectors = embeddings
+            if not positional:
+                vectors = np.zeros((n_rows, embeddings.shape[1]), dtype='float32')
+                vectors[ids] = embeddings
+        return cls(index, category_ids, categories, row_questions, answer_ids, list(unique_answers),
+                   encoder_fingerprint, index_type, storage, vectors,
+                   hashes=category_hashes(ids, row_categories, questions, answers))
+
+    @staticmethod
+    def path(directory: Optional[Path] = None) -> Path:
+        """Fichier de l'index dans `directory` (FAISS_INDICES_DIR par défaut)."""
+        return Path(directory if directory is not None else FAISS_INDICES_DIR) / FAQIndex.FILENAME
+
+    def save(self, directory: Optional[Path] = None):
+        """
+        Sauvegarde l'index, ses tableaux et ses tables de chaînes, puis les
+        métadonnées. Chaque fichier est remplacé par renommage.
+        """
+        path = self.path(directory)
+        directory = path.parent
+        directory.mkdir(parents=True, exist_ok=True)
+
+        index_path = directory / self.INDEX_FILENAME
+        faiss.write_index(self.index, str(index_path) + ".tmp")
+        os.replace(str(index_path) + ".tmp", index_path)
+        save_array(directory / self.CATEGORY_IDS_FILENAME, self.category_ids)
+        save_array(directory / self.ANSWER_IDS_FILENAME, self.answer_ids)
+        self.questions.save(directory, "faq_questions")
+        self.answers.save(directory, "faq_answers")
+
+        vectors_path = directory / self.VECTORS_FILENAME
+        if self.vectors is not None:
+            if not (isinstance(self.vectors, np.memmap) and Path(self.vectors.filename) == vectors_path.resolve()):
+                save_array(vectors_path, np.asarray(self.vectors, dtype='float32'))
+        elif vectors_path.exists():
+            vectors_path.unlink()
+
+        metadata = {
+            'format': self.FORMAT_VERSION,
+            'categories': self.categories,
+            'encoder': self.encoder_fingerprint,
+            'index_type': self.index_type,
+            'storage': self.storage,
+            'params': self.params,
+            'size': len(self),
+            'category_hashes': self.category_hashes
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        logger.info(f"Index FAISS sauvegardé dans {directory}")
+
+    @classmethod
+    def exists(cls, directory: Optional[Path] = None) -> bool:
+        """Vrai si un index au format courant est sauvegardé dans `directory`."""
+        path = cls.path(directory)
+        if not path.exists():
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('format') == cls.FORMAT_VERSION
+
+    @classmethod
+    def load(cls, directory: Optional[Path] = None) -> 'FAQIndex':
+        """
+        Charge un index sauvegardé par `save`, sans copie : l'index FAISS, les
+        tableaux et les tables de chaînes sont projetés en mémoire.
+        """
+        path = cls.path(directory)
+        directory = path.parent
+        with open(path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        # Listes inversées (IVF) : IO_FLAG_MMAP ; codes à plat (flat, HNSW) : IO_FLAG_MMAP_IFC.
+        # FAISS refuse les deux drapeaux ensemble sur un index IVF.
+        is_ivf = metadata['index_type'] == 'ivf' or (metadata['index_type'] == 'flat' and metadata['storage'] == 'pq')
+        index = faiss.read_index(
+            str(directory / cls.INDEX_FILENAME),
+            (faiss.IO_FLAG_MMAP if is_ivf else faiss.IO_FLAG_MMAP_IFC) | faiss.IO_FLAG_READ_ONLY
+        )
+        vectors = None
+        vectors_path = directory / cls.VECTORS_FILENAME
+        if metadata['storage'] != 'float32' and vectors_path.exists():
+            vectors = np.load(vectors_path, mmap_mode='r')
+        faq_index = cls(
+            index,
+            np.load(directory / cls.CATEGORY_IDS_FILENAME, mmap_mode='r'),
+            metadata['categories'],
+            StringTable.open(directory, "faq_questions"),
+            np.load(directory / cls.ANSWER_IDS_FILENAME, mmap_mode='r'),
+            StringTable.open(directory, "faq_answers"),
+            metadata['encoder'],
+            metadata['index_type'],
+            metadata['storage'],
+            vectors,
+            metadata['params'],
+            metadata['category_hashes']
+        )
+        faq_index.directory = directory
+        return faq_index
+
+    @property
+    def dim(self) -> int:
+        return self.index.d
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def has_category(self, category: str) -> bool:
+        return category in self._codes
+
+    def category_of(self, row: int) -> str:
+        return self.categories[self.category_ids[row]]
+
+    def answer_of(self, row: int) -> str:
+        """Réponse d'une ligne, lue dans la table des réponses distinctes."""
+        return self.answers[self.answer_ids[row]]
+
+    def category_rows(self, category: str) -> np.ndarray:
+        """Identifiants des lignes d'une catégorie."""
+        code = self._codes.get(category)
+        return np.empty(0, dtype='int64') if code is None else self._selector(code)[1]
+
+    def category_size(self, category: str) -> int:
+        code = self._codes.get(category)
+        return 0 if code is None else int(np.count_nonzero(self.category_ids == code))
+
+    def is_live(self, row: int) -> bool:
+        """Vrai si la ligne existe et n'a pas été supprimée."""
+        return 0 <= row < len(self.category_ids) and self.category_ids[row] >= 0
+
+    def updated(self, ids: Sequence[int], embeddings: np.ndarray, categories: Sequence[str],
+                questions: Sequence[str], answers: Sequence[str],
+                delete_ids: Sequence[int] = ()) -> 'FAQIndex':
+        """
+        Retourne un nouvel index avec des lignes ajoutées, remplacées ou
+        supprimées ; cet index n'est pas modifié (copie sur écriture).
+
+        Les identifiants de ligne sont stables : une ligne remplacée garde le
+        sien, une ligne supprimée laisse un trou (catégorie -1) et une nouvelle
+        ligne prend un identifiant au-delà de la dernière. Seuls les vecteurs
+        modifiés sont ajoutés ou retirés de l'index FAISS, sauf pour HNSW qui
+        ne permet pas de retirer un vecteur : il est reconstruit à partir des
+        vecteurs conservés, sans réencoder les questions.
+
+        Args:
+            ids (list): Identifiants des lignes ajoutées ou remplacées
+            embeddings (np.ndarray): Embeddings de leurs questions
+            categories, questions, answers (list): Contenu de ces lignes
+            delete_ids (list): Identifiants des lignes à supprimer
+        """
+        ids = np.asarray(ids, dtype='int64').reshape(-1)
+        delete_ids = np.asarray(delete_ids, dtype='int64').reshape(-1)
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32').reshape(len(ids), self.dim)
+        old_rows = len(self.category_ids)
+        n_rows = max(old_rows, int(ids.max()) + 1 if len(ids) else 0)
+
+        # Métadonnées : les lignes supprimées gardent leur place avec la catégorie -1
+        category_ids = np.full(n_rows, -1, dtype=np.int32)
+        category_ids[:old_rows] = self.category_ids
+        answer_ids = np.full(n_rows, -1, dtype=np.int32)
+        answer_ids[:old_rows] = self.answer_ids
+        row_questions = list(self.questions) + [""] * (n_rows - old_rows)
+        answer_table = list(self.answers)
+        answer_codes = {answer: code for code, answer in enumerate(answer_table)}
+        codes = dict(self._codes)
+        categories_list = list(self.categories)
+
+        changed = np.concatenate([delete_ids, ids])
+        removed = np.unique(changed[(changed < old_rows) & (self.category_ids[np.minimum(changed, old_rows - 1)] >= 0)])
+        touched = {self.categories[code] for code in self.category_ids[removed]} | set(categories)
+
+        category_ids[delete_ids] = -1
+        answer_ids[delete_ids] = -1
+        for row in delete_ids:
+            row_questions[row] = ""
+        for row, category, question, answer in zip(ids, categories, questions, answers):
+            if category not in codes:
+                codes[category] = len(categories_list)
+                categories_list.append(category)
+            if answer not in answer_codes:
+                answer_codes[answer] = len(answer_table)
+                answer_table.append(answer)
+            category_ids[row] = codes[category]
+            answer_ids[row] = answer_codes[answer]
+            row_questions[row] = question
+
+        # Tables des réponses et des catégories : ne garder que les entrées encore référencées
+        answer_ids, answer_table = compact_codes(answer_ids, answer_table)
+        category_ids, categories_list = compact_codes(category_ids, categories_list)
+
+        # Empreintes : recalculées pour les seules catégories modifiées
+        hashes = {category: digest for category, digest in self.category_hashes.items()
+                  if category not in touched and category in categories_list}
+        for code, category in enumerate(categories_list):
+            if category in touched:
+                rows = np.flatnonzero(category_ids == code)
+                hashes.update(category_hashes(rows, [category] * len(rows), [row_questions[row] for row in rows],
+                                              [answer_table[answer_ids[row]] for row in rows]))
+
+        # Vecteurs : retirer les lignes supprimées ou remplacées, ajouter les nouvelles
+        if isinstance(base_index(self.index), faiss.IndexHNSW):
+            kept = np.setdiff1d(np.flatnonzero(self.category_ids >= 0), removed)
+            index = build_faiss_index(
+                np.concatenate([self._exact_vectors(kept), embeddings]),
+                'hnsw', self.storage, ids=np.concatenate([kept, ids])
+            )
+        else:
+            # L'index chargé est projeté en lecture seule : en relire une copie modifiable
+            if self.directory is not None:
+                index = faiss.read_index(str(Path(self.directory) / self.INDEX_FILENAME))
+            else:
+                index = faiss.clone_index(self.index)
+            if len(removed):
+                index.remove_ids(removed)
+            if len(ids):
+                index.add_with_ids(embeddings, ids)
+
+        vectors = None
+        if self.vectors is not None:
+            vectors = np.zeros((n_rows, self.dim), dtype='float32')
+            vectors[:old_rows] = self.vectors
+            vectors[ids] = embeddings
+
+        logger.info(f"Index FAISS mis à jour: {len(ids)} lignes ajoutées ou remplacées, "
+                    f"{len(delete_ids)} supprimées, {index.ntotal} questions")
+        return FAQIndex(index, category_ids, categories_list, row_questions, answer_ids, answer_table,
+                        self.encoder_fingerprint, self.index_type, self.storage, vectors, self.params, hashes)
+
+    def live_rows(self) -> np.ndarray:
+        """Identifiants des lignes non supprimées."""
+        return np.flatnonzero(self.category_ids >= 0)
+
+    def stale_categories(self, ids: Sequence[int], row_categories: Sequence[str], questions: Sequence[str],
+                         answers: Sequence[str]) -> List[str]:
+        """
+        Catégories dont le contenu diffère de celui de l'index : lignes
+        ajoutées, modifiées ou supprimées, catégories nouvelles ou disparues.
+        """
+        hashes = category_hashes(ids, row_categories, questions, answers)
+        stale = [category for category, digest in hashes.items() if self.category_hashes.get(category) != digest]
+        return stale + [category for category in self.category_hashes if category not in hashes]
+
+    def rebuilt(self, index_type: str, storage: str) -> 'FAQIndex':
+        """
+        Reconstruit l'index FAISS avec d'autres paramètres à partir des
+        vecteurs déjà calculés, sans réencoder les questions.
+        """
+        rows = self.live_rows()
+        return FAQIndex.build(
+            self._exact_vectors(rows),
+            [self.category_of(row) for row in rows],
+            [self.questions[row] for row in rows],
+            [self.answer_of(row) for row in rows],
+            self.encoder_fingerprint, index_type, storage, ids=rows
+        )
+
+    def _selector(self, code: int) -> Tuple[faiss.IDSelector, np.ndarray]:
+        """Sélecteur et lignes d'une catégorie, construits à la première utilisation."""
+        if code not in self._selectors:
+            ids = np.flatnonzero(self.category_ids == code).astype('int64')
+            self._selectors[code] = (faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), ids)
+        return self._selectors[code]
+
+    def _search_params(self, code: Optional[int], k: int) -> faiss.SearchParameters:
+        """
+        Paramètres de recherche pour une catégorie (ou toute la base si `code` est None).
+
+        Avec un filtre, seule une fraction des candidats explorés appartient à
+        la catégorie : efSearch (HNSW) et nprobe (IVF) sont divisés par cette
+        fraction, dans la limite de HNSW_MAX_EF_SEARCH et du nombre de listes.
+        """
+        key = (code, k)
+        if key not in self._params:
+            fraction = 1.0
+            if code is not None:
+                selector, ids = self._selector(code)
+                fraction = max(len(ids) / max(len(self), 1), 1e-9)
+
+            index = base_index(self.index)
+            if isinstance(index, faiss.IndexHNSW):
+                params = faiss.SearchParametersHNSW()
+                params.efSearch = int(min(max(HNSW_EF_SEARCH, k) / fraction, max(HNSW_MAX_EF_SEARCH, k)))
+            elif isinstance(index, faiss.IndexIVF):
+                params = faiss.SearchParametersIVF()
+                params.nprobe = int(min(math.ceil(IVF_NPROBE / fraction), index.nlist))
+            else:
+                params = faiss.SearchParameters()
+            if code is not None:
+                params.sel = selector
+            self._params[key] = params
+        return self._params[key]
+
+    @property
+    def exact(self) -> bool:
+        """Vrai si l'index renvoie des distances exactes (flat, float32)."""
+        return self.index_type == 'flat' and self.storage == 'float32'
+
+    def _exact_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Vecteurs exacts des lignes demandées (décodés depuis l'index à défaut)."""
+        if self.vectors is not None:
+            return np.ascontiguousarray(self.vectors[rows], dtype='float32')
+        return self.index.reconstruct_batch(rows)
+
+    def _rescore(self, queries: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Recalcule les distances exactes des candidats et garde les k meilleurs."""
+        valid = rows >= 0
+        vectors = self._exact_vectors(np.where(valid, rows, 0).ravel()).reshape(*rows.shape, -1)
+        distances = np.sum((vectors - queries[:, None, :]) ** 2, axis=2, dtype='float32')
+        distances[~valid] = np.inf
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def _ann_search(self, queries: np.ndarray, code: Optional[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Recherche dans l'index, suivie du recalcul exact si les vecteurs sont compressés."""
+        candidates = k
+        if self.vectors is not None and RESCORE_FACTOR > 1:
+            candidates = k * RESCORE_FACTOR
+        distances, rows = self.index.search(queries, candidates, params=self._search_params(code, candidates))
+        if candidates > k:
+            distances, rows = self._rescore(queries, rows, k)
+        return distances, rows
+
+    def _search_category(self, code: int, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Recherche restreinte à une catégorie, exacte si l'index est exact ou la catégorie petite."""
+        if not self.exact:
+            _, ids = self._selector(code)
+            if len(ids) <= ANN_EXACT_MAX:
+                distances, positions = faiss.knn(queries, self._exact_vectors(ids), min(k, len(ids)))
+                rows = np.where(positions >= 0, ids[np.maximum(positions, 0)], -1)
+                if rows.shape[1] < k:
+                    pad = k - rows.shape[1]
+                    distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+                    rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+                return distances, rows
+        return self._ann_search(queries, code, k)
+
+    def search(self, queries: np.ndarray, categories: Optional[Sequence[str]] = None, k: int = 3,
+               global_k: int = 0) -> Tuple[Optional[np.ndarray], Optional[np.ndarray],
+                                           Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Recherche restreinte par catégorie et/ou globale.
+
+        Args:
+            queries (np.ndarray): Embeddings des questions (n, dim)
+            categories (list, optional): Catégorie où chercher pour chaque question
+            k (int): Nombre de voisins dans la catégorie
+            global_k (int): Nombre de voisins toutes catégories confondues (0 = pas de recherche globale)
+
+        Returns:
+            tuple: (distances, lignes) dans la catégorie puis (distances, lignes)
+                globales ; None si la recherche n'est pas demandée. Les lignes
+                manquantes (catégorie inconnue ou trop petite) valent -1.
+        """
+        queries = np.ascontiguousarray(queries, dtype='float32').reshape(-1, self.dim)
+        distances = rows = global_distances = global_rows = None
+
+        if categories is not None:
+            distances = np.full((len(queries), k), np.inf, dtype='float32')
+            rows = np.full((len(queries), k), -1, dtype='int64')
+            groups = {}
+            for position, category in enumerate(categories):
+                groups.setdefault(category, []).append(position)
+
+            for category, positions in groups.items():
+                code = self._codes.get(category)
+                if code is None:
+                    continue
+                group_distances, group_rows = self._search_category(code, queries[positions], k)
+                distances[positions] = group_distances
+                rows[positions] = group_rows
+
+        if global_k:
+            global_k = min(global_k, len(self))
+            global_distances, global_rows = self._ann_search(queries, None, global_k)
+
+        return distances, rows, global_distances, global_rows
@@ -0,0 +1,284 @@
+import argparse
+import json
+import logging
+import os
+import time
+import warnings
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from src.config import MODELS_DIR, BATCH_SIZE, MAX_LENGTH, FUSED_ONEDNN_GRAPH
+from src.data_preprocessing import masked_mean_pooling, iter_length_batches
+from src.inference_head import InferenceHead
+from src.normalization import normalize_questions
+
+logger = logging.getLogger(__name__)
+
+FUSED_FILENAME = "fused_model.pt"
+_METADATA_NAME = "fused_model.json"  # Métadonnées, dans l'archive TorchScript
+
+_TORCH_ACTIVATIONS = {
+    'identity': lambda x: x,
+    'logistic': torch.sigmoid,
+    'tanh': torch.tanh,
+    'relu': torch.relu
+}
+
+@contextmanager
+def _torchscript():
+    """Appels TorchScript sans gradient et sans les avertissements de dépréciation de torch.jit."""
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        warnings.simplefilter('ignore', torch.jit.TracerWarning)
+        yield
+
+class FusedFAQModule(torch.nn.Module):
+    """
+    Encodeur, pooling moyen masqué et tête de classification en un seul module.
+
+    `forward(input_ids, attention_mask)` retourne (embeddings, probabilités
+    brutes par catégorie) : les mêmes valeurs que l'encodeur suivi de
+    `InferenceHead.predict_proba`, la température restant appliquée par
+    `FAQClassifier.confidence_columns`.
+    """
+
+    def __init__(self, encoder: torch.nn.Module, head: InferenceHead):
+        super().__init__()
+        self.encoder = encoder
+        self.layers = torch.nn.ModuleList()
+        for coef, intercept in zip(head.coefs, head.intercepts):
+            layer = torch.nn.Linear(*coef.shape)
+            layer.weight = torch.nn.Parameter(torch.from_numpy(np.ascontiguousarray(coef.T, dtype=np.float32)))
+            layer.bias = torch.nn.Parameter(torch.from_numpy(np.ascontiguousarray(intercept, dtype=np.float32)))
+            self.layers.append(layer)
+        self.activation = head.activation
+        self.out_activation = head.out_activation
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+        embeddings = masked_mean_pooling(hidden, attention_mask)
+
+        activation = embeddings
+        last = len(self.layers) - 1
+        for i, layer in enumerate(self.layers):
+            activation = layer(activation)
+            if i != last:
+                activation = _TORCH_ACTIVATIONS[self.activation](activation)
+        if self.out_activation == 'softmax':
+            return embeddings, torch.softmax(activation, dim=1)
+        activation = _TORCH_ACTIVATIONS[self.out_activation](activation)
+        if activation.shape[1] == 1:
+            # Deux classes : sortie logistique d'une seule colonne
+            activation = torch.cat([1 - activation, activation], dim=1)
+        return embeddings, activation
+
+class FusedModel:
+    """
+    Modèle fusionné TorchScript pour le service sur CPU.
+
+    Le module (`FusedFAQModule`) est tracé puis gelé (`torch.jit.freeze`) :
+    une seule exécution du graphe donne l'embedding d'une question et ses
+    probabilités, sans repasser par NumPy entre l'encodeur, le pooling et la
+    tête. Le graphe gelé passe ensuite par `torch.jit.optimize_for_inference`
+    (fusions oneDNN à l'export). Avec FUSED_ONEDNN_GRAPH, c'est le fuseur
+    oneDNN Graph de TorchScript qui est activé au chargement à la place (les
+    deux ne se combinent pas) ; il compile le graphe pour chaque forme
+    d'entrée et n'est intéressant qu'à taille de lot et longueur fixes.
+
+    L'archive garde l'empreinte de l'encodeur et celle de la tête exportés :
+    un modèle fusionné qui ne correspond plus à l'encodeur ou au classifieur
+    chargés n'est pas utilisé.
+    """
+
+    def __init__(self, module: torch.jit.ScriptModule, tokenizer, metadata: dict):
+        self.module = module
+        self.tokenizer = tokenizer
+        self.metadata = metadata
+        self.classes = metadata['classes']
+        self.hidden_size = metadata['hidden_size']
+
+    @staticmethod
+    def path(directory: Optional[Path] = None) -> Path:
+        return (Path(directory) if directory is not None else MODELS_DIR) / FUSED_FILENAME
+
+    @classmethod
+    def artifact_paths(cls, directory: Optional[Path] = None) -> List[Path]:
+        """Fichiers lus par `load`, utilisés pour détecter un nouvel export."""
+        return [cls.path(directory)]
+
+    @classmethod
+    def export(cls, encoder: torch.nn.Module, tokenizer, head: InferenceHead, encoder_fingerprint: str,
+               precision: str, directory: Optional[Path] = None) -> Path:
+        """
+        Trace, gèle et sauvegarde le modèle fusionné (sur CPU).
+
+        Args:
+            encoder: L'encodeur chargé par ModelSingleton, tel qu'il produit les embeddings
+            tokenizer: Son tokenizer (pour l'exemple de traçage)
+            head (InferenceHead): Tête du classifieur entraîné sur cet encodeur
+            encoder_fingerprint (str): Empreinte de l'encodeur (ModelSingleton.get_fingerprint)
+            precision (str): Précision de l'encodeur, enregistrée pour information
+
+        Returns:
+            Path: Chemin du fichier TorchScript
+        """
+        directory = Path(directory) if directory is not None else MODELS_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        hidden_size = encoder.config.hidden_size
+        if head.n_features != hidden_size:
+            raise ValueError(f"Tête de {head.n_features} dimensions pour un encodeur de {hidden_size}")
+
+        start_time = time.time()
+        module = FusedFAQModule(encoder, head).eval()
+        # Exemple avec padding : le masque d'attention reste une entrée du graphe
+        _, input_ids, attention_mask = next(iter_length_batches(
+            tokenizer, ["question", "question d'exemple pour le traçage du modèle"], 2
+        ))
+        metadata = {
+            'encoder': encoder_fingerprint,
+            'head': head.digest(),
+            'classes': head.classes.tolist(),
+            'hidden_size': hidden_size,
+            'precision': precision,
+            'max_length': MAX_LENGTH,
+            'onednn_graph': FUSED_ONEDNN_GRAPH,
+            'torch': torch.__version__
+        }
+        path = cls.path(directory)
+        tmp_path = directory / (FUSED_FILENAME + ".tmp")
+        with _torchscript():
+            traced = torch.jit.trace(module, (input_ids, attention_mask), check_trace=False)
+            frozen = torch.jit.freeze(traced.eval())
+            if not FUSED_ONEDNN_GRAPH:
+                frozen = torch.jit.optimize_for_inference(frozen)
+            torch.jit.save(frozen, str(tmp_path), _extra_files={_METADATA_NAME: json.dumps(metadata)})
+        os.replace(tmp_path, path)
+        logger.info(f"Modèle fusionné exporté dans {path} en {time.time() - start_time:.2f} secondes")
+        return path
+
+    @classmethod
+    def load(cls, tokenizer, encoder_fingerprint: str, head: Optional[InferenceHead],
+             directory: Optional[Path] = None) -> Optional['FusedModel']:
+        """
+        Charge le modèle fusionné s'il correspond à l'encodeur et à la tête donnés.
+
+        Returns:
+            FusedModel ou None (absent, périmé ou illisible : le moteur garde alors
+            l'encodeur et la tête séparés)
+        """
+        path = cls.path(directory)
+        if not path.exists():
+            return None
+        try:
+            extra_files = {_METADATA_NAME: ''}
+            with _torchscript():
+                module = torch.jit.load(str(path), map_location='cpu', _extra_files=extra_files)
+            metadata = json.loads(extra_files[_METADATA_NAME])
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du modèle fusionné: {str(e)}")
+            return None
+        if head is None or metadata.get('encoder') != encoder_fingerprint or metadata.get('head') != head.digest():
+            logger.warning(f"{path.name} ne correspond plus à l'encodeur ou au classifieur chargés, "
+                           f"modèle fusionné ignoré (réexporter avec python -m src.fused_model)")
+            return None
+        if metadata.get('onednn_graph'):
+            torch.jit.enable_onednn_fusion(True)
+        fused = cls(module, tokenizer, metadata)
+        # Les premières exécutions servent au profilage et à l'optimisation du graphe
+        for _ in range(3):
+            fused.encode(["question", "question d'exemple"])
+        logger.info(f"Modèle fusionné chargé depuis {path}")
+        return fused
+
+    def encode(self, texts: List[str], batch_size: int = BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode et classe des textes (déjà normalisés) par lots triés par longueur.
+
+        Returns:
+            tuple: (embeddings (n, hidden_size), probabilités brutes (n, catégories)),
+                en float32 et dans l'ordre d'origine
+        """
+        embeddings = np.empty((len(texts), self.hidden_size), dtype=np.float32)
+        probas = np.empty((len(texts), len(self.classes)), dtype=np.float32)
+        if not texts:
+            return embeddings, probas
+        with _torchscript():
+            for batch_idx, input_ids, attention_mask in iter_length_batches(self.tokenizer, texts, batch_size):
+                batch_embeddings, batch_probas = self.module(input_ids, attention_mask)
+                embeddings[batch_idx] = batch_embeddings.numpy()
+                probas[batch_idx] = batch_probas.numpy()
+        return embeddings, probas
+
+def export_fused(classifier, directory: Optional[Path] = None) -> Optional[Path]:
+    """
+    Exporte le modèle fusionné de l'encodeur courant et d'un classifieur entraîné.
+
+    Returns:
+        Path ou None si l'export n'est pas possible (encodeur sur GPU, classifieur sans tête)
+    """
+    from src.model_singleton import ModelSingleton
+
+    model_singleton = ModelSingleton()
+    if model_singleton.get_device().type != 'cpu':
+        logger.info("Encodeur sur GPU : le modèle fusionné (CPU) n'est pas exporté")
+        return None
+    if classifier.head is None:
+        logger.warning("Classifieur sans tête exportée : le modèle fusionné n'est pas exporté")
+        return None
+    model, tokenizer = model_singleton.get_model()
+    return FusedModel.export(
+        model, tokenizer, classifier.head, model_singleton.get_fingerprint(),
+        model_singleton.precision, directory
+    )
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporte le modèle fusionné (encodeur + pooling + tête) du classifieur sauvegardé"
+    )
+    parser.add_argument('--dir', type=str, default=str(MODELS_DIR), help="Dossier du classifieur")
+    parser.add_argument('--check', type=str, default=None,
+                        help="CSV de questions (colonne 'question') pour comparer au modèle non fusionné")
+    args = parser.parse_args()
+
+    from src.model import FAQClassifier
+    from src.model_singleton import ModelSingleton
+    from src.data_preprocessing import encode_texts
+    from src.utils import setup_logging
+    setup_logging()
+
+    directory = Path(args.dir)
+    classifier = FAQClassifier.load(directory)
+    path = export_fused(classifier, directory)
+    if path is None:
+        return
+    print(f"Modèle fusionné exporté dans {path}")
+
+    if args.check:
+        import pandas as pd
+        model_singleton = ModelSingleton()
+        model, tokenizer = model_singleton.get_model()
+        fused = FusedModel.load(tokenizer, model_singleton.get_fingerprint(), classifier.head, directory)
+        texts = normalize_questions(pd.read_csv(args.check)['question']).tolist()
+
+        start_time = time.perf_counter()
+        embeddings = encode_texts(model, tokenizer, model_singleton.get_device(), texts)
+        probas = classifier.predict_proba(embeddings)
+        separate_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        fused_embeddings, fused_probas = fused.encode(texts)
+        fused_time = time.perf_counter() - start_time
+
+        agreement = np.mean(probas.argmax(axis=1) == fused_probas.argmax(axis=1))
+        print(f"Questions: {len(texts)}")
+        print(f"Écart maximal embeddings: {np.abs(embeddings - fused_embeddings).max():.2e}")
+        print(f"Écart maximal probabilités: {np.abs(probas - fused_probas).max():.2e}")
+        print(f"Catégories identiques: {agreement:.2%}")
+        print(f"Temps séparé: {separate_time:.2f}s, fusionné: {fused_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
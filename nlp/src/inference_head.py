@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from src.config import MODELS_DIR
+
+logger = logging.getLogger(__name__)
+
+HEAD_FILENAME = "classifier_head.npz"
+
+def _logistic(X: np.ndarray):
+    # Même fonction que sklearn (scipy.special.expit), importée seulement pour ces activations
+    from scipy.special import expit
+    expit(X, out=X)
+
+def _relu(X: np.ndarray):
+    np.maximum(X, 0, out=X)
+
+def _tanh(X: np.ndarray):
+    np.tanh(X, out=X)
+
+def _identity(X: np.ndarray):
+    pass
+
+def _softmax(X: np.ndarray):
+    tmp = X - X.max(axis=1)[:, np.newaxis]
+    np.exp(tmp, out=X)
+    X /= X.sum(axis=1)[:, np.newaxis]
+
+ACTIVATIONS = {'identity': _identity, 'logistic': _logistic, 'tanh': _tanh, 'relu': _relu, 'softmax': _softmax}
+
+class InferenceHead:
+    """
+    Tête de classification pour le service : les poids du MLPClassifier
+    entraîné, appliqués en NumPy (produit matriciel, activation, softmax),
+    suivis de la température.
+
+    Les opérations sont celles de `MLPClassifier.predict_proba`, dans le même
+    ordre et sur les mêmes types : les probabilités sont identiques au bit
+    près. Le fichier (`classifier_head.npz`) contient aussi les noms des
+    catégories ; le charger n'importe ni sklearn ni imblearn.
+    """
+
+    def __init__(self, coefs: Sequence[np.ndarray], intercepts: Sequence[np.ndarray], activation: str,
+                 out_activation: str, labels: np.ndarray, classes: Sequence[str], temperature: float = 1.0):
+        if activation not in ACTIVATIONS or out_activation not in ACTIVATIONS:
+            raise ValueError(f"Activation non prise en charge: {activation} / {out_activation}")
+        self.coefs = list(coefs)
+        self.intercepts = list(intercepts)
+        self.activation = activation
+        self.out_activation = out_activation
+        self.labels = np.asarray(labels)  # Étiquettes encodées, dans l'ordre des colonnes
+        self.classes = np.array(list(classes), dtype=object)  # Noms des catégories
+        self.temperature = float(temperature)
+
+    @classmethod
+    def from_mlp(cls, mlp, classes: Sequence[str], temperature: float = 1.0) -> 'InferenceHead':
+        """Exporte un MLPClassifier entraîné (les poids sont copiés, sklearn n'est pas importé)."""
+        return cls(
+            [np.array(coef) for coef in mlp.coefs_],
+            [np.array(intercept) for intercept in mlp.intercepts_],
+            mlp.activation,
+            mlp.out_activation_,
+            np.asarray(mlp.classes_),
+            classes,
+            temperature
+        )
+
+    @property
+    def n_features(self) -> int:
+        return self.coefs[0].shape[0]
+
+    def digest(self) -> str:
+        """Empreinte courte des poids, des activations et des catégories (hors température)."""
+        digest = hashlib.sha1()
+        digest.update(f"{self.activation}:{self.out_activation}:{self.classes.tolist()}".encode('utf-8'))
+        for array in (*self.coefs, *self.intercepts, self.labels):
+            digest.update(f"{array.dtype}{array.shape}".encode('utf-8'))
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:16]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilités par catégorie, identiques à celles du MLPClassifier."""
+        activation = np.asarray(X)
+        if activation.dtype not in (np.float32, np.float64):
+            activation = activation.astype(np.float64)
+        if activation.ndim != 2 or activation.shape[1] != self.n_features:
+            raise ValueError(f"Entrée de forme {activation.shape}, {self.n_features} dimensions attendues")
+
+        hidden_activation = ACTIVATIONS[self.activation]
+        last = len(self.coefs) - 1
+        for i, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+            activation = activation @ coef
+            activation += intercept
+            if i != last:
+                hidden_activation(activation)
+        ACTIVATIONS[self.out_activation](activation)
+
+        if activation.shape[1] == 1:
+            # Deux classes : sortie logistique d'une seule colonne
+            activation = activation.ravel()
+            return np.vstack([1 - activation, activation]).T
+        return activation
+
+    def scale(self, probas: np.ndarray) -> np.ndarray:
+        """Température appliquée aux probabilités (comme FAQClassifier._apply_temperature_scaling)."""
+        scaled_probas = probas / self.temperature
+        return np.exp(scaled_probas) / np.sum(np.exp(scaled_probas), axis=1, keepdims=True)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Étiquettes encodées prédites."""
+        return self.labels[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, directory: Optional[Path] = None) -> Path:
+        """Écrit `classifier_head.npz` dans `directory` (MODELS_DIR par défaut), par renommage."""
+        directory = Path(directory) if directory is not None else MODELS_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = {f"coef_{i}": coef for i, coef in enumerate(self.coefs)}
+        arrays.update({f"intercept_{i}": intercept for i, intercept in enumerate(self.intercepts)})
+        path = directory / HEAD_FILENAME
+        tmp_path = directory / (HEAD_FILENAME + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            activation=np.array(self.activation),
+            out_activation=np.array(self.out_activation),
+            labels=self.labels,
+            classes=np.array(self.classes.tolist(), dtype=str),
+            temperature=np.array(self.temperature),
+            **arrays
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def path(directory: Optional[Path] = None) -> Path:
+        return (Path(directory) if directory is not None else MODELS_DIR) / HEAD_FILENAME
+
+    @classmethod
+    def exists(cls, directory: Optional[Path] = None) -> bool:
+        return cls.path(directory).exists()
+
+    @classmethod
+    def load(cls, directory: Optional[Path] = None) -> 'InferenceHead':
+        """Charge une tête sauvegardée par `save` (sans pickle)."""
+        with np.load(cls.path(directory), allow_pickle=False) as data:
+            n_layers = sum(1 for name in data.files if name.startswith("coef_"))
+            return cls(
+                [data[f"coef_{i}"] for i in range(n_layers)],
+                [data[f"intercept_{i}"] for i in range(n_layers)],
+                str(data['activation']),
+                str(data['out_activation']),
+                data['labels'],
+                data['classes'].tolist(),
+                float(data['temperature'])
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte la tête de classification d'un modèle déjà entraîné")
+    parser.add_argument('--dir', type=str, default=str(MODELS_DIR),
+                        help="Dossier contenant classifier.joblib et label_encoder.joblib")
+    args = parser.parse_args()
+
+    import joblib
+    from src.model import FAQClassifier
+
+    directory = Path(args.dir)
+    pipeline = joblib.load(directory / "classifier.joblib")
+    label_encoder = joblib.load(directory / "label_encoder.joblib")
+    mlp = pipeline.steps[-1][1]
+    head = InferenceHead.from_mlp(mlp, label_encoder.classes_.tolist(), FAQClassifier().temperature)
+    print(f"Tête exportée dans {head.save(directory)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+class KeywordMatcher:
+    """
+    Règles de mot-clé compilées en une seule expression régulière.
+
+    Chaque catégorie est un groupe de l'alternative, dans l'ordre des règles ;
+    l'expression est essayée à chaque début de mot (lookahead), si bien que
+    toutes les occurrences sont vues en un seul parcours du texte. La
+    catégorie retenue est la première des règles dont un mot-clé apparaît,
+    comme avec un parcours des règles dans l'ordre.
+
+    Un mot-clé ne correspond qu'à des mots entiers : 'vol' reconnaît
+    « vol de carte » mais pas « volontiers ».
+    """
+
+    def __init__(self, rules: Dict[str, Sequence[str]]):
+        self.categories: List[str] = []
+        groups = []
+        for category, keywords in rules.items():
+            keywords = sorted({self.normalize(keyword) for keyword in keywords if keyword}, key=len, reverse=True)
+            if keywords:
+                self.categories.append(category)
+                groups.append("(" + "|".join(re.escape(keyword) for keyword in keywords) + ")")
+        self.pattern = re.compile(r"(?<!\w)(?=(?:" + "|".join(groups) + r")(?!\w))") if groups else None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Minuscules et apostrophe typographique remplacée par l'apostrophe simple."""
+        return text.lower().replace('’', "'")
+
+    def match(self, text: str) -> Optional[str]:
+        """Catégorie de la première règle dont un mot-clé apparaît dans `text`, ou None."""
+        if self.pattern is None:
+            return None
+        best = None
+        for match in self.pattern.finditer(self.normalize(text)):
+            group = match.lastindex - 1
+            if best is None or group < best:
+                best = group
+                if best == 0:
+                    break
+        return None if best is None else self.categories[best]
+
+    def match_batch(self, texts: Sequence[str]) -> List[Optional[str]]:
+        """`match` pour chaque texte d'un lot."""
+        return [self.match(text) for text in texts]
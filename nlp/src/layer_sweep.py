@@ -0,0 +1,188 @@
+import argparse
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+import faiss
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from src.config import (
+    BASE_DIR, DATA_DIR, MODELS_DIR, MODEL_NAME, DISTIL_MODEL_NAME, USE_DISTIL, BATCH_SIZE,
+    RANDOM_STATE, TEST_SIZE, LAYER_SWEEP_TOLERANCE, EARLY_EXIT_THRESHOLD, EARLY_EXIT_DIR
+)
+from src.data_preprocessing import iter_length_batches, masked_mean_pooling
+from src.model import FAQClassifier
+from src.normalization import normalize_questions
+from src.model_singleton import load_encoder
+from src.utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def layer_embeddings(model, tokenizer, device, texts: List[str], batch_size: int = BATCH_SIZE) -> np.ndarray:
+    """
+    Embeddings moyennés de chaque couche, en une seule passe du modèle complet.
+
+    Returns:
+        np.ndarray: Tableau (nombre de couches, len(texts), hidden_size) ;
+            l'indice k-1 correspond à la sortie de la couche k
+    """
+    num_layers = model.config.num_hidden_layers
+    embeddings = np.empty((num_layers, len(texts), model.config.hidden_size), dtype=np.float32)
+    for batch_idx, input_ids, attention_mask in iter_length_batches(tokenizer, texts, batch_size):
+        input_ids = input_ids.to(device)
+        attention_mask = attention_mask.to(device)
+        with torch.no_grad():
+            outputs = model(input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True)
+        # hidden_states[0] est la sortie des embeddings, hidden_states[k] celle de la couche k
+        for layer in range(1, num_layers + 1):
+            pooled = masked_mean_pooling(outputs.hidden_states[layer], attention_mask)
+            embeddings[layer - 1, batch_idx] = pooled.cpu().numpy()
+    return embeddings
+
+def nearest_neighbour_accuracy(train_embeddings: np.ndarray, train_labels: np.ndarray,
+                               test_embeddings: np.ndarray, test_labels: np.ndarray) -> float:
+    """Part des questions de test dont la question FAQ la plus proche a la même catégorie."""
+    index = faiss.IndexFlatL2(train_embeddings.shape[1])
+    index.add(np.ascontiguousarray(train_embeddings))
+    _, indices = index.search(np.ascontiguousarray(test_embeddings), 1)
+    return float(np.mean(train_labels[indices[:, 0]] == test_labels))
+
+def sweep(embeddings: np.ndarray, y: np.ndarray, train_idx: np.ndarray, test_idx: np.ndarray,
+          label_encoder: LabelEncoder, layers: List[int]) -> List[Dict[str, float]]:
+    """Entraîne un classifieur par couche et mesure sa précision sur le jeu de test."""
+    results = []
+    for layer in layers:
+        logger.info(f"Couche {layer}...")
+        X = embeddings[layer - 1]
+        classifier = FAQClassifier()
+        classifier.train(X[train_idx], y[train_idx], label_encoder)
+        results.append({
+            'layer': layer,
+            'accuracy': float(np.mean(classifier.predict(X[test_idx]) == y[test_idx])),
+            'nn_accuracy': nearest_neighbour_accuracy(X[train_idx], y[train_idx], X[test_idx], y[test_idx]),
+            'relative_cost': layer / embeddings.shape[0]
+        })
+    return results
+
+def choose_num_layers(results: List[Dict[str, float]], tolerance: float) -> int:
+    """Plus petit nombre de couches dont la précision est à `tolerance` près de la meilleure."""
+    best = max(result['accuracy'] for result in results)
+    return min(result['layer'] for result in results if result['accuracy'] >= best - tolerance)
+
+def train_exit_head(embeddings: np.ndarray, y: np.ndarray, train_idx: np.ndarray, test_idx: np.ndarray,
+                    label_encoder: LabelEncoder, exit_layer: int, threshold: float) -> Dict[str, float]:
+    """
+    Entraîne et sauvegarde le classifieur de sortie anticipée sur la couche `exit_layer`.
+
+    Returns:
+        dict: Part des questions de test qui sortiraient tôt et précision sur celles-ci
+    """
+    X = embeddings[exit_layer - 1]
+    classifier = FAQClassifier()
+    classifier.train(X[train_idx], y[train_idx], label_encoder)
+    classifier.save(EARLY_EXIT_DIR)
+
+    probas = classifier.predict_proba(X[test_idx])
+    exits = probas.max(axis=1) >= threshold
+    correct = classifier.model.classes_[probas.argmax(axis=1)] == y[test_idx]
+    return {
+        'exit_layer': exit_layer,
+        'threshold': threshold,
+        'exit_rate': float(exits.mean()),
+        'exit_accuracy': float(correct[exits].mean()) if exits.any() else 0.0
+    }
+
+def generate_report(model_name: str, results: List[Dict[str, float]], chosen: int,
+                    tolerance: float, exit_stats: Dict[str, float] = None) -> str:
+    """Met en forme les résultats du balayage."""
+    report = [
+        "=== Balayage du Nombre de Couches de l'Encodeur ===",
+        f"Date: {datetime.now().isoformat()}",
+        f"Modèle: {model_name}",
+        "",
+        "Couche | Précision classifieur | Précision plus proche voisin | Coût relatif"
+    ]
+    for result in results:
+        report.append(
+            f"{result['layer']:>6} | {result['accuracy']:>21.2%} | "
+            f"{result['nn_accuracy']:>28.2%} | {result['relative_cost']:>11.0%}"
+        )
+    report.extend([
+        "",
+        f"Nombre de couches retenu (tolérance {tolerance:.1%}): {chosen}",
+        f"-> ENCODER_NUM_LAYERS = {chosen} dans src/config.py, puis réentraîner le classifieur (src/train.py) ;"
+        f" les indices FAISS sont reconstruits automatiquement au prochain chargement"
+    ])
+    if exit_stats is not None:
+        report.extend([
+            "",
+            f"Sortie anticipée à la couche {exit_stats['exit_layer']} (seuil {exit_stats['threshold']:.2f}):",
+            f"- Questions de test sorties tôt: {exit_stats['exit_rate']:.2%}",
+            f"- Précision sur ces questions: {exit_stats['exit_accuracy']:.2%}",
+            f"-> Classifieur sauvegardé dans {EARLY_EXIT_DIR} ; activer avec EARLY_EXIT_LAYER = {exit_stats['exit_layer']}"
+        ])
+    return "\n".join(report)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Choix du nombre de couches de l'encodeur sur les données étiquetées")
+    parser.add_argument('--data', type=str, default=str(DATA_DIR / "faqs_clean.csv"),
+                        help="Chemin vers le fichier CSV des données")
+    parser.add_argument('--layers', type=int, nargs='+', default=None,
+                        help="Couches à évaluer (toutes par défaut)")
+    parser.add_argument('--tolerance', type=float, default=LAYER_SWEEP_TOLERANCE,
+                        help="Perte de précision tolérée par rapport à la meilleure couche")
+    parser.add_argument('--train-exit', type=int, default=None, metavar='LAYER',
+                        help="Entraîner le classifieur de sortie anticipée sur cette couche")
+    parser.add_argument('--exit-threshold', type=float, default=EARLY_EXIT_THRESHOLD)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    setup_logging()
+
+    model_name = DISTIL_MODEL_NAME if USE_DISTIL else MODEL_NAME
+    model, tokenizer, device, _ = load_encoder(model_name, 'float32', device=torch.device("cpu"))
+
+    df = pd.read_csv(args.data).dropna(subset=['question', 'Categorie'])
+    df['question_clean'] = normalize_questions(df['question'])
+    df = df.drop_duplicates(subset=['question_clean']).reset_index(drop=True)
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(df['Categorie'])
+    train_idx, test_idx = train_test_split(
+        np.arange(len(df)), test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
+    )
+
+    logger.info("Calcul des embeddings de chaque couche...")
+    embeddings = layer_embeddings(model, tokenizer, device, df['question_clean'].tolist())
+    layers = args.layers or list(range(1, embeddings.shape[0] + 1))
+
+    results = sweep(embeddings, y, train_idx, test_idx, label_encoder, layers)
+    chosen = choose_num_layers(results, args.tolerance)
+
+    exit_stats = None
+    if args.train_exit is not None:
+        exit_stats = train_exit_head(embeddings, y, train_idx, test_idx, label_encoder,
+                                     args.train_exit, args.exit_threshold)
+
+    report = generate_report(model_name, results, chosen, args.tolerance, exit_stats)
+    print(report)
+
+    with open(MODELS_DIR / "layer_sweep.json", 'w', encoding='utf-8') as f:
+        json.dump({'model': model_name, 'results': results, 'chosen': chosen,
+                   'tolerance': args.tolerance, 'early_exit': exit_stats}, f, indent=2)
+
+    reports_dir = BASE_DIR / "reports"
+    reports_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    with open(reports_dir / f"layer_sweep_{timestamp}.txt", "w", encoding="utf-8") as f:
+        f.write(report)
+    print(f"\nRapport sauvegardé dans le dossier 'reports/'")
+
+if __name__ == "__main__":
+    main()
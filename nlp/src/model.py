@@ -1,18 +1,19 @@
 import logging
 import joblib
 import numpy as np
-from sklearn.neural_network import MLPClassifier
-from sklearn.metrics import classification_report, confusion_matrix
-from imblearn.over_sampling import SMOTE
-from imblearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from collections import Counter
+from pathlib import Path
 from src.config import *
-from typing import Dict, List, Any, Optional, Tuple
+from src.inference_head import InferenceHead
+from src.keyword_matcher import KeywordMatcher
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Sequence, Tuple
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset
+
+if TYPE_CHECKING:
+    from sklearn.preprocessing import LabelEncoder
 
 logger = logging.getLogger(__name__)
 
@@ -28,37 +29,45 @@ class FAQDataset(Dataset):
     def __getitem__(self, idx: int) -> Tuple[torch.Tensor, torch.Tensor]:
         return self.X[idx], self.y[idx]
 
+class ConfidencePredictions(Sequence):
+    """
+    Prédictions au format de FAQClassifier.predict_with_confidence, construites
+    à la demande à partir des colonnes calculées sur tout le lot ; chaque
+    dictionnaire est gardé après sa première lecture.
+    """
+    def __init__(self, classifier: 'FAQClassifier', columns: Dict[str, np.ndarray]):
+        self.classifier = classifier
+        self.columns = columns
+        self._records: List[Optional[Dict[str, Any]]] = [None] * len(columns['category'])
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if self._records[i] is None:
+            self._records[i] = self.classifier.prediction_record(self.columns, i)
+        return self._records[i]
+
 class FAQClassifier:
     def __init__(self):
-        """Initialise le classifieur avec un pipeline plus sophistiqué."""
-        # Configuration de SMOTE avec une stratégie personnalisée
-        smote = SMOTE(
-            sampling_strategy={
-                0: 100,  # Augmenter à 100 exemples
-                1: 100,  # Augmenter à 100 exemples
-                2: 200,  # Augmenter à 200 exemples
-                3: 385,  # Garder le même nombre
-                4: 50,   # Augmenter à 50 exemples
-                5: 150,  # Augmenter à 150 exemples
-                6: 230   # Garder le même nombre
-            },
-            random_state=RANDOM_STATE
-        )
-        
-        # Création du pipeline avec SMOTE et MLPClassifier
-        self.model = Pipeline([
-            ('smote', smote),
-            ('classifier', MLPClassifier(
-                hidden_layer_sizes=HIDDEN_LAYERS,
-                learning_rate=LEARNING_RATE,
-                max_iter=MAX_ITER,
-                early_stopping=EARLY_STOPPING,
-                validation_fraction=VALIDATION_FRACTION,
-                n_iter_no_change=N_ITER_NO_CHANGE,
-                random_state=RANDOM_STATE
-            ))
-        ])
-        self.label_encoder = None
+        """
+        Initialise le classifieur. Le pipeline sklearn (SMOTE + MLP) n'est créé
+        qu'au premier accès à `model` : le service n'utilise que la tête
+        exportée (`head`) et n'importe ni sklearn ni imblearn.
+        """
+        self._model = None
+        self._model_path = None  # classifier.joblib, lu au premier accès à `model`
+        self._label_encoder = None
+        self._label_encoder_path = None  # label_encoder.joblib, lu au premier accès à `label_encoder`
+        self.head = None  # Tête NumPy exportée du MLP (InferenceHead)
+        self._class_names = None  # (encodeur d'étiquettes, noms des catégories)
+        self._keyword_matcher = None  # (règles, règles compilées)
+        self.encoder_fingerprint = None  # Empreinte de l'encodeur ayant produit les embeddings d'entraînement
+        self.backend = CLASSIFIER_BACKEND  # Pipeline créé pour l'entraînement : 'sklearn' ou 'torch'
         
         # Seuils de confiance par catégorie (ajustés)
         self.category_thresholds = {
@@ -159,31 +168,118 @@ class FAQClassifier:
             'Autre': []  # Catégorie par défaut
         }
     
+    @staticmethod
+    def _build_pipeline(backend: str = CLASSIFIER_BACKEND):
+        """
+        Pipeline d'entraînement : SMOTE avec une stratégie personnalisée, puis
+        MLPClassifier ; avec le backend 'torch', le MLP PyTorch seul (perte
+        pondérée par classe au lieu de SMOTE).
+        """
+        from imblearn.pipeline import Pipeline
+        
+        if backend == 'torch':
+            from src.torch_trainer import TorchMLPClassifier
+            return Pipeline([('classifier', TorchMLPClassifier())])
+        if backend != 'sklearn':
+            raise ValueError(f"Backend de classifieur inconnu: {backend} (attendu: 'sklearn' ou 'torch')")
+        
+        from imblearn.over_sampling import SMOTE
+        from sklearn.neural_network import MLPClassifier
+        
+        smote = SMOTE(
+            sampling_strategy={
+                0: 100,  # Augmenter à 100 exemples
+                1: 100,  # Augmenter à 100 exemples
+                2: 200,  # Augmenter à 200 exemples
+                3: 385,  # Garder le même nombre
+                4: 50,   # Augmenter à 50 exemples
+                5: 150,  # Augmenter à 150 exemples
+                6: 230   # Garder le même nombre
+            },
+            random_state=RANDOM_STATE
+        )
+        return Pipeline([
+            ('smote', smote),
+            ('classifier', MLPClassifier(
+                hidden_layer_sizes=HIDDEN_LAYERS,
+                learning_rate=LEARNING_RATE,
+                max_iter=MAX_ITER,
+                early_stopping=EARLY_STOPPING,
+                validation_fraction=VALIDATION_FRACTION,
+                n_iter_no_change=N_ITER_NO_CHANGE,
+                random_state=RANDOM_STATE
+            ))
+        ])
+    
+    @property
+    def model(self):
+        """Pipeline sklearn : relu depuis classifier.joblib, ou créé pour l'entraînement."""
+        if self._model is None:
+            self._model = (joblib.load(self._model_path) if self._model_path is not None
+                           else self._build_pipeline(self.backend))
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self.head = None  # La tête exportée ne correspond plus au pipeline
+    
+    @property
+    def label_encoder(self) -> Optional['LabelEncoder']:
+        if self._label_encoder is None and self._label_encoder_path is not None:
+            self._label_encoder = joblib.load(self._label_encoder_path)
+        return self._label_encoder
+    
+    @label_encoder.setter
+    def label_encoder(self, label_encoder: Optional['LabelEncoder']):
+        self._label_encoder = label_encoder
+    
+    @property
+    def keyword_matcher(self) -> KeywordMatcher:
+        """Règles de mot-clé compilées (une fois, tant que `keyword_rules` n'est pas remplacé)."""
+        if self._keyword_matcher is None or self._keyword_matcher[0] is not self.keyword_rules:
+            self._keyword_matcher = (self.keyword_rules, KeywordMatcher(self.keyword_rules))
+        return self._keyword_matcher[1]
+    
     def _check_keyword_rules(self, question: str) -> Optional[str]:
         """Vérifie si la question correspond à une règle de mot-clé."""
-        question_lower = question.lower()
-        for category, keywords in self.keyword_rules.items():
-            if any(keyword in question_lower for keyword in keywords):
-                return category
-        return None
+        return self.keyword_matcher.match(question)
     
-    def train(self, X: np.ndarray, y: np.ndarray, label_encoder: LabelEncoder) -> None:
-        """Entraîne le modèle avec gestion avancée du déséquilibre des classes."""
-        self.label_encoder = label_encoder
-        
-        # Vérifier la distribution des classes
-        class_counts = Counter(y)
-        logger.info(f"Distribution des classes avant SMOTE: {class_counts}")
-        
-        # Calculer les poids des classes pour l'entraînement
-        total = len(y)
-        class_weights = {
-            label: total / (len(class_counts) * count)
-            for label, count in class_counts.items()
+    def keyword_prediction(self, category: str) -> Dict[str, Any]:
+        """
+        Prédiction d'une question routée par une règle de mot-clé avant tout
+        encodage : même format que `predict_with_confidence`, sans les
+        probabilités du classifieur (toute la masse sur la catégorie).
+        """
+        names = self.class_names.tolist() if self.head is not None or self.label_encoder is not None else []
+        return {
+            'category': category,
+            'confidence': 1.0,
+            'is_confiant': 1,
+            'is_near_ambiguous': 0,
+            'distance': 1.0,
+            'entropy': 0.0,
+            'probabilities': {name: float(name == category) for name in names},
+            'top2': {
+                'category': None,
+                'confidence': 0.0
+            }
         }
-        logger.info(f"Poids des classes: {class_weights}")
-        
-        # Ajuster les paramètres SMOTE en fonction de la distribution
+    
+    def train(self, X: np.ndarray, y: np.ndarray, label_encoder: 'LabelEncoder') -> None:
+        """
+        Entraîne le modèle avec gestion avancée du déséquilibre des classes
+        (`resample` puis `fit`), puis exporte la tête NumPy utilisée pour les
+        prédictions.
+        """
+        X_resampled, y_resampled = self.resample(X, y)
+        self.fit(X_resampled, y_resampled, label_encoder)
+    
+    def configure_smote(self, y: np.ndarray) -> None:
+        """Ajuste les paramètres de l'étape SMOTE du pipeline à la distribution des classes de `y`."""
+        if 'smote' not in self.model.named_steps:
+            return
+        class_counts = Counter(y)
         min_samples = min(class_counts.values())
         if min_samples <= 2:
             logger.warning(f"Classe avec très peu d'échantillons ({min_samples}). Désactivation de SMOTE pour ces classes.")
@@ -204,27 +300,69 @@ class FAQClassifier:
                 k_neighbors=min(2, min_samples - 1),
                 sampling_strategy=sampling_strategy
             )
+    
+    def resample(self, X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rééquilibre les classes avec l'étape SMOTE du pipeline, ses paramètres
+        étant ajustés à la distribution de `y` (`configure_smote`). Sans étape
+        SMOTE (backend 'torch'), les données sont renvoyées telles quelles.
         
-        # Créer le dataset PyTorch
-        dataset = FAQDataset(X, y)
-        dataloader = DataLoader(dataset, batch_size=64, shuffle=True)
+        Returns:
+            tuple: (X rééchantillonné, y rééchantillonné), à passer à `fit`
+        """
+        # Vérifier la distribution des classes
+        class_counts = Counter(y)
+        logger.info(f"Distribution des classes avant SMOTE: {class_counts}")
         
-        logger.info("Entraînement du modèle avec SMOTE et MLPClassifier...")
-        self.model.fit(X, y)
+        # Calculer les poids des classes pour l'entraînement
+        total = len(y)
+        class_weights = {
+            label: total / (len(class_counts) * count)
+            for label, count in class_counts.items()
+        }
+        logger.info(f"Poids des classes: {class_weights}")
         
-        # Vérifier la nouvelle distribution après SMOTE
-        y_resampled = self.model.named_steps['smote'].fit_resample(X, y)[1]
-        new_counts = Counter(y_resampled)
-        logger.info(f"Distribution des classes après SMOTE: {new_counts}")
+        if 'smote' not in self.model.named_steps:
+            logger.info("Pas d'étape SMOTE : déséquilibre compensé par la perte pondérée par classe")
+            return X, y
         
+        # Ajuster les paramètres SMOTE en fonction de la distribution
+        self.configure_smote(y)
+        
+        logger.info("Rééchantillonnage avec SMOTE...")
+        X_resampled, y_resampled = self.model.named_steps['smote'].fit_resample(X, y)
+        logger.info(f"Distribution des classes après SMOTE: {Counter(y_resampled)}")
+        return X_resampled, y_resampled
+    
+    def fit(self, X: np.ndarray, y: np.ndarray, label_encoder: 'LabelEncoder') -> None:
+        """
+        Entraîne le MLP du pipeline (MLPClassifier ou TorchMLPClassifier) sur
+        des données déjà rééchantillonnées (`resample`), puis exporte la tête
+        NumPy. Le pipeline obtenu est le même qu'avec `model.fit` sur les
+        données d'origine.
+        """
+        self.label_encoder = label_encoder
+        self.head = None
+        
+        mlp = self.model.named_steps['classifier']
+        logger.info(f"Entraînement du {type(mlp).__name__}...")
+        mlp.fit(X, y)
+        
+        self.head = InferenceHead.from_mlp(
+            self.model.named_steps['classifier'], label_encoder.classes_.tolist(), self.temperature
+        )
         logger.info("Entraînement terminé!")
     
     def predict(self, X: np.ndarray) -> np.ndarray:
         """Prédit les classes pour de nouvelles données."""
+        if self.head is not None:
+            return self.head.predict(X)
         return self.model.predict(X)
     
     def predict_proba(self, X: np.ndarray) -> np.ndarray:
-        """Retourne les probabilités de prédiction."""
+        """Retourne les probabilités de prédiction (tête exportée si disponible, identique au pipeline)."""
+        if self.head is not None:
+            return self.head.predict_proba(X)
         return self.model.predict_proba(X)
     
     def _apply_temperature_scaling(self, probas: np.ndarray) -> np.ndarray:
@@ -232,98 +370,131 @@ class FAQClassifier:
         scaled_probas = probas / self.temperature
         return np.exp(scaled_probas) / np.sum(np.exp(scaled_probas), axis=1, keepdims=True)
 
-    def predict_with_confidence(self, X: np.ndarray, threshold: Optional[float] = None, questions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-        """Prédit les classes avec gestion avancée de la confiance et des cas ambigus."""
-        probas = self.predict_proba(X)
-        # Appliquer la température scaling
-        probas = self._apply_temperature_scaling(probas)
-        predictions = []
-        
-        for i, proba in enumerate(probas):
-            # Vérifier d'abord les règles de mot-clé si une question est fournie
-            if questions is not None:
-                keyword_category = self._check_keyword_rules(questions[i])
-                if keyword_category is not None:
-                    predictions.append({
-                        'category': keyword_category,
-                        'confidence': 1.0,
-                        'is_confiant': 1,  # Convertir en int pour JSON
-                        'is_near_ambiguous': 0,  # Convertir en int pour JSON
-                        'distance': 1.0,
-                        'entropy': 0.0,
-                        'probabilities': {self.label_encoder.inverse_transform([j])[0]: float(p) for j, p in enumerate(proba)},
-                        'top2': {
-                            'category': self.label_encoder.inverse_transform([np.argmax(proba)])[0],
-                            'confidence': float(np.max(proba))
-                        }
-                    })
-                    continue
-            
-            # Trouver les indices des deux meilleures prédictions
-            top2_idx = np.argsort(proba)[-2:][::-1]
-            max_proba = proba[top2_idx[0]]
-            second_proba = proba[top2_idx[1]]
-            
-            # Éviter les égalités exactes
-            if abs(max_proba - second_proba) < 1e-6:
-                second_proba = max_proba - 1e-6
-            
-            # Convertir les indices en catégories
-            predicted_class = self.label_encoder.inverse_transform([top2_idx[0]])[0]
-            second_class = self.label_encoder.inverse_transform([top2_idx[1]])[0]
-            
-            # Calculer la distance de classification
-            distance = max_proba - second_proba
-            
-            # Calculer l'entropie pour mesurer l'incertitude
-            entropy = -np.sum(proba * np.log(proba + 1e-10))
-            
-            # Vérifier si le cas est presque ambigu
-            is_near_ambiguous = int(distance < self.near_ambiguous_threshold)  # Convertir en int
-            
-            # Utiliser le seuil spécifique à la catégorie ou le seuil par défaut
-            category_threshold = self.category_thresholds.get(predicted_class, self.default_threshold)
-            if threshold is not None:
-                category_threshold = threshold
-            
-            # Un cas est ambigu si la confiance est faible OU la distance est faible OU l'entropie est élevée
-            is_ambiguous = int(
-                int(max_proba < category_threshold) or 
-                int(distance < self.distance_threshold) or
-                int(entropy > 0.5)
-            )  # Convertir en int
-            
-            # Obtenir les catégories alternatives si :
-            # 1. Le cas est ambigu OU
-            # 2. La deuxième meilleure prédiction est suffisamment confiante
-            alternatives = []
-            if is_ambiguous or int(second_proba > self.alternative_threshold):  # Convertir en int
-                alternatives = self.get_alternative_categories(proba)
-            
-            # Convertir tous les booléens en entiers dans les alternatives
-            for alt in alternatives:
-                if 'is_confident' in alt:
-                    alt['is_confident'] = int(alt['is_confident'])
-            
-            predictions.append({
-                'category': predicted_class,
-                'confidence': float(max_proba),
-                'is_confiant': int(not is_ambiguous),  # Convertir en int pour JSON
-                'is_near_ambiguous': is_near_ambiguous,  # Déjà converti en int
-                'distance': float(distance),
-                'entropy': float(entropy),
-                'probabilities': {self.label_encoder.inverse_transform([j])[0]: float(p) for j, p in enumerate(proba)},
-                'top2': {
-                    'category': second_class,
-                    'confidence': float(second_proba)
-                },
-                'alternatives': alternatives
-            })
-        
-        return predictions
+    @property
+    def class_names(self) -> np.ndarray:
+        """Noms des catégories dans l'ordre des colonnes de probabilités (calculés une fois par encodeur d'étiquettes)."""
+        if self.head is not None:
+            return self.head.classes
+        if self._class_names is None or self._class_names[0] is not self.label_encoder:
+            self._class_names = (self.label_encoder, np.array(self.label_encoder.classes_.tolist(), dtype=object))
+        return self._class_names[1]
+
+    def confidence_columns(self, probas: np.ndarray, threshold: Optional[float] = None,
+                           questions: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Calcule en une fois, pour toute la matrice de probabilités brutes,
+        les valeurs de `predict_with_confidence` : une colonne par champ.
+
+        Returns:
+            dict: 'raw_probabilities' et 'probabilities' (après température),
+                'category', 'confidence', 'second_category', 'second_confidence',
+                'distance', 'entropy', 'is_confiant', 'is_near_ambiguous',
+                'keyword' (décidé par une règle de mot-clé) et 'has_alternatives'
+        """
+        raw_probas = np.asarray(probas)
+        probas = self._apply_temperature_scaling(raw_probas)
+        n = len(probas)
+        rows = np.arange(n)
+        names = self.class_names
+
+        # Deux meilleures prédictions ; à égalité, la première catégorie (comme np.argmax)
+        order = np.argsort(-probas, axis=1, kind='stable')
+        top1, top2 = order[:, 0], order[:, 1]
+        max_proba = probas[rows, top1]
+        second_proba = probas[rows, top2]
+        # Éviter les égalités exactes
+        second_proba = np.where(np.abs(max_proba - second_proba) < 1e-6, max_proba - 1e-6, second_proba)
+
+        distance = max_proba - second_proba
+        entropy = -np.sum(probas * np.log(probas + 1e-10), axis=1)
+        is_near_ambiguous = distance < self.near_ambiguous_threshold
+
+        # Seuil spécifique à la catégorie prédite, ou seuil imposé
+        if threshold is not None:
+            category_threshold = np.full(n, threshold)
+        else:
+            thresholds = np.array([self.category_thresholds.get(name, self.default_threshold) for name in names])
+            category_threshold = thresholds[top1]
+
+        # Un cas est ambigu si la confiance est faible OU la distance est faible OU l'entropie est élevée
+        is_ambiguous = (max_proba < category_threshold) | (distance < self.distance_threshold) | (entropy > 0.5)
+        # Alternatives si le cas est ambigu ou si la deuxième prédiction est suffisamment confiante
+        has_alternatives = is_ambiguous | (second_proba > self.alternative_threshold)
+
+        columns = {
+            'raw_probabilities': raw_probas,
+            'probabilities': probas,
+            'category': names[top1],
+            'confidence': max_proba,
+            'second_category': names[top2],
+            'second_confidence': second_proba,
+            'distance': distance,
+            'entropy': entropy,
+            'is_confiant': (~is_ambiguous).astype(np.int8),
+            'is_near_ambiguous': is_near_ambiguous.astype(np.int8),
+            'keyword': np.zeros(n, dtype=bool),
+            'has_alternatives': has_alternatives
+        }
+
+        # Règles de mot-clé : elles l'emportent sur le classifieur
+        if questions is not None:
+            keyword_categories = self.keyword_matcher.match_batch(questions)
+            keyword = np.array([category is not None for category in keyword_categories], dtype=bool)
+            if keyword.any():
+                best = np.argmax(probas, axis=1)
+                columns['category'] = np.where(keyword, np.array(keyword_categories, dtype=object), columns['category'])
+                columns['confidence'] = np.where(keyword, 1.0, max_proba)
+                columns['second_category'] = np.where(keyword, names[best], columns['second_category'])
+                columns['second_confidence'] = np.where(keyword, probas[rows, best], second_proba)
+                columns['distance'] = np.where(keyword, 1.0, distance)
+                columns['entropy'] = np.where(keyword, 0.0, entropy)
+                columns['is_confiant'] = np.where(keyword, 1, columns['is_confiant']).astype(np.int8)
+                columns['is_near_ambiguous'] = np.where(keyword, 0, columns['is_near_ambiguous']).astype(np.int8)
+                columns['keyword'] = keyword
+                columns['has_alternatives'] = has_alternatives & ~keyword
+        return columns
+
+    def predict_confidence_columns(self, X: np.ndarray, threshold: Optional[float] = None,
+                                   questions: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Version en colonnes de `predict_with_confidence` (voir `confidence_columns`)."""
+        return self.confidence_columns(self.predict_proba(X), threshold, questions)
+
+    def predict_with_confidence(self, X: np.ndarray, threshold: Optional[float] = None,
+                                questions: Optional[List[str]] = None) -> 'ConfidencePredictions':
+        """
+        Prédit les classes avec gestion avancée de la confiance et des cas ambigus.
+
+        Les calculs sont faits sur toute la matrice (`confidence_columns`) ; le
+        dictionnaire de chaque question n'est construit qu'à sa lecture.
+        """
+        return ConfidencePredictions(self, self.predict_confidence_columns(X, threshold, questions))
+
+    def prediction_record(self, columns: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+        """Prédiction de la ligne `i` des colonnes, au format de `predict_with_confidence`."""
+        proba = columns['probabilities'][i]
+        prediction = {
+            'category': columns['category'][i],
+            'confidence': float(columns['confidence'][i]),
+            'is_confiant': int(columns['is_confiant'][i]),  # Convertir en int pour JSON
+            'is_near_ambiguous': int(columns['is_near_ambiguous'][i]),  # Convertir en int pour JSON
+            'distance': float(columns['distance'][i]),
+            'entropy': float(columns['entropy'][i]),
+            'probabilities': dict(zip(self.class_names.tolist(), proba.tolist())),
+            'top2': {
+                'category': columns['second_category'][i],
+                'confidence': float(columns['second_confidence'][i])
+            }
+        }
+        # Une prédiction par mot-clé n'a pas de liste d'alternatives
+        if not columns['keyword'][i]:
+            prediction['alternatives'] = (self.get_alternative_categories(proba)
+                                          if columns['has_alternatives'][i] else [])
+        return prediction
     
     def evaluate(self, X: np.ndarray, y: np.ndarray) -> str:
         """Évalue le modèle et retourne un rapport détaillé."""
+        from sklearn.metrics import classification_report, confusion_matrix
+        
         y_pred = self.predict(X)
         
         # Matrice de confusion
@@ -338,18 +509,49 @@ class FAQClassifier:
         
         return report
     
-    def save(self) -> None:
-        """Sauvegarde le modèle entraîné."""
-        joblib.dump(self.model, MODELS_DIR / "classifier.joblib")
-        joblib.dump(self.label_encoder, MODELS_DIR / "label_encoder.joblib")
+    def save(self, directory: Optional[Path] = None) -> None:
+        """
+        Sauvegarde le modèle entraîné, sa tête exportée pour le service
+        (classifier_head.npz) et l'empreinte de l'encodeur des embeddings.
+        """
+        directory = Path(directory) if directory is not None else MODELS_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self.model, directory / "classifier.joblib")
+        joblib.dump(self.label_encoder, directory / "label_encoder.joblib")
+        if self.head is not None:
+            self.head.save(directory)
+        if self.encoder_fingerprint is not None:
+            (directory / "classifier_encoder.txt").write_text(self.encoder_fingerprint)
         logger.info("Modèles sauvegardés")
     
+    @staticmethod
+    def artifact_paths(directory: Optional[Path] = None) -> List[Path]:
+        """Fichiers lus par `load`, utilisés pour détecter un nouveau modèle."""
+        directory = Path(directory) if directory is not None else MODELS_DIR
+        return [directory / "classifier.joblib", directory / "label_encoder.joblib", InferenceHead.path(directory)]
+    
     @classmethod
-    def load(cls) -> 'FAQClassifier':
-        """Charge un modèle sauvegardé."""
+    def load(cls, directory: Optional[Path] = None) -> 'FAQClassifier':
+        """
+        Charge un modèle sauvegardé. Avec une tête exportée, seule celle-ci est
+        lue : le pipeline et l'encodeur d'étiquettes (sklearn) ne sont relus
+        qu'au premier accès à `model` ou `label_encoder`.
+        """
+        directory = Path(directory) if directory is not None else MODELS_DIR
         classifier = cls()
-        classifier.model = joblib.load(MODELS_DIR / "classifier.joblib")
-        classifier.label_encoder = joblib.load(MODELS_DIR / "label_encoder.joblib")
+        if InferenceHead.exists(directory):
+            classifier.head = InferenceHead.load(directory)
+            classifier.temperature = classifier.head.temperature
+            classifier._model_path = directory / "classifier.joblib"
+            classifier._label_encoder_path = directory / "label_encoder.joblib"
+        else:
+            logger.warning(f"Pas de {InferenceHead.path(directory).name} dans {directory}, prédictions "
+                           f"par le pipeline sklearn (exporter avec python -m src.inference_head)")
+            classifier.model = joblib.load(directory / "classifier.joblib")
+            classifier.label_encoder = joblib.load(directory / "label_encoder.joblib")
+        fingerprint_path = directory / "classifier_encoder.txt"
+        if fingerprint_path.exists():
+            classifier.encoder_fingerprint = fingerprint_path.read_text().strip()
         return classifier
 
     def analyze_errors(self, X: np.ndarray, y: np.ndarray, questions: List[str]) -> Dict[str, Any]:
@@ -361,7 +563,7 @@ class FAQClassifier:
             if true_label != pred['category']:
                 errors.append({
                     'question': questions[i],
-                    'true_category': self.label_encoder.inverse_transform([true_label])[0],
+                    'true_category': self.class_names[true_label],
                     'predicted_category': pred['category'],
                     'confidence': float(pred['confidence']),  # Convertir en float
                     'distance': float(pred['distance']),  # Convertir en float
@@ -424,14 +626,12 @@ class FAQClassifier:
     def get_alternative_categories(self, proba: np.ndarray, threshold: float = 0.1) -> List[Dict[str, Any]]:
         """Retourne les catégories alternatives dont la probabilité est proche de la meilleure prédiction."""
         best_idx = np.argmax(proba)
-        best_proba = proba[best_idx]
-        
-        alternatives = []
-        for idx, p in enumerate(proba):
-            if idx != best_idx and int((best_proba - p) < threshold):  # Convertir en int
-                alternatives.append({
-                    'category': self.label_encoder.inverse_transform([idx])[0],
-                    'confidence': float(p)  # Convertir en float pour JSON
-                })
-        
-        return sorted(alternatives, key=lambda x: x['confidence'], reverse=True)
+        close = proba[best_idx] - proba < threshold
+        close[best_idx] = False
+        indices = np.flatnonzero(close)
+        indices = indices[np.argsort(-proba[indices], kind='stable')]
+        names = self.class_names
+        return [
+            {'category': names[idx], 'confidence': float(proba[idx])}  # Convertir en float pour JSON
+            for idx in indices
+        ]
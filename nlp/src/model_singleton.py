@@ -1,11 +1,124 @@
 import torch
 from transformers import AutoTokenizer, AutoModel
+import hashlib
+import json
 import logging
 import time
-from .config import MODEL_NAME, DISTIL_MODEL_NAME, USE_DISTIL, USE_GPU, NUM_THREADS
+from typing import Optional, Tuple
+from .config import (
+    MODEL_NAME, DISTIL_MODEL_NAME, USE_DISTIL, USE_GPU, NUM_THREADS, MAX_LENGTH, ENCODER_PRECISION,
+    ENCODER_NUM_LAYERS
+)
 
 logger = logging.getLogger(__name__)
 
+PRECISION_MODES = ('float32', 'int8', 'bfloat16')
+
+def cpu_supports_bf16() -> bool:
+    """Indique si le CPU dispose d'instructions bfloat16 natives (AVX512-BF16 ou AMX)."""
+    checks = ('_is_avx512_bf16_supported', '_is_amx_tile_supported')
+    return torch.backends.mkldnn.is_available() and any(
+        getattr(torch.cpu, check, lambda: False)() for check in checks
+    )
+
+def truncate_layers(model: torch.nn.Module, num_layers: Optional[int]) -> torch.nn.Module:
+    """
+    Ne garde que les `num_layers` premières couches transformer de l'encodeur.
+    
+    La sortie du modèle tronqué est exactement l'état caché de la couche
+    `num_layers` du modèle complet ; None (ou une valeur supérieure au nombre
+    de couches) laisse le modèle intact.
+    """
+    total = len(model.encoder.layer)
+    if num_layers is None or num_layers >= total:
+        return model
+    if num_layers < 1:
+        raise ValueError(f"Nombre de couches invalide: {num_layers}")
+    
+    model.encoder.layer = model.encoder.layer[:num_layers]
+    model.config.num_hidden_layers = num_layers
+    logger.info(f"Encodeur tronqué à {num_layers}/{total} couches")
+    return model
+
+def apply_cpu_precision(model: torch.nn.Module, precision: str) -> Tuple[torch.nn.Module, str]:
+    """
+    Applique le mode de précision demandé à un encodeur chargé sur CPU.
+    
+    Args:
+        model: L'encodeur en float32
+        precision (str): 'float32', 'int8' (couches linéaires quantifiées
+            dynamiquement) ou 'bfloat16'
+    
+    Returns:
+        tuple: (modèle, précision effectivement appliquée)
+    """
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"Précision inconnue: {precision} (attendu: {', '.join(PRECISION_MODES)})")
+    
+    if precision == 'int8':
+        if 'fbgemm' not in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = 'qnnpack'
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info("Couches linéaires quantifiées dynamiquement en INT8")
+    elif precision == 'bfloat16':
+        if not cpu_supports_bf16():
+            logger.warning("Le CPU ne supporte pas bfloat16 nativement, utilisation de float32")
+            return model, 'float32'
+        model = model.to(torch.bfloat16)
+        logger.info("Poids convertis en bfloat16")
+    
+    return model, precision
+
+def load_encoder(model_name: str, precision: str = ENCODER_PRECISION, device: Optional[torch.device] = None,
+                 num_layers: Optional[int] = None):
+    """
+    Charge un tokenizer et un encodeur en mode évaluation.
+    
+    Args:
+        model_name (str): Nom ou dossier du modèle
+        precision (str): Mode de précision sur CPU (voir apply_cpu_precision)
+        device (torch.device, optional): Device imposé
+        num_layers (int, optional): Ne garder que les premières couches (voir truncate_layers)
+    
+    Returns:
+        tuple: (modèle, tokenizer, device, précision effectivement appliquée)
+    """
+    # Optimisations pour le chargement
+    if device is None:
+        device = torch.device("cuda" if USE_GPU and torch.cuda.is_available() else "cpu")
+    
+    # Charger le tokenizer et le modèle en mode évaluation avec optimisations
+    tokenizer = AutoTokenizer.from_pretrained(
+        model_name,
+        local_files_only=False,
+        trust_remote_code=True,
+        use_fast=True  # Utiliser le tokenizer rapide
+    )
+    
+    # Charger le modèle avec optimisations
+    model = AutoModel.from_pretrained(
+        model_name,
+        local_files_only=False,
+        trust_remote_code=True,
+        torch_dtype=torch.float16 if device.type == "cuda" else torch.float32,
+        low_cpu_mem_usage=True,
+        device_map="auto" if device.type == "cuda" else None
+    )
+    
+    model = truncate_layers(model, num_layers)
+    
+    # Optimisations supplémentaires
+    model.eval()
+    if device.type == "cuda":
+        model = model.cuda()
+        torch.backends.cudnn.benchmark = True
+        logger.info("Modèle déplacé sur GPU avec optimisations")
+        precision = 'float16'
+    else:
+        model, precision = apply_cpu_precision(model, precision)
+    
+    return model, tokenizer, device, precision
+
 class ModelSingleton:
     _instance = None
     _initialized = False
@@ -23,38 +136,16 @@ class ModelSingleton:
     def _load_model(self):
         """Charge le modèle CamemBERT une seule fois."""
         model_name = DISTIL_MODEL_NAME if USE_DISTIL else MODEL_NAME
-        logger.info(f"Chargement du modèle {model_name}...")
+        self.model_name = model_name
+        self._fingerprint = None
+        logger.info(f"Chargement du modèle {model_name} (précision {ENCODER_PRECISION})...")
         start_time = time.time()
         
         try:
-            # Optimisations pour le chargement
-            self.device = torch.device("cuda" if USE_GPU and torch.cuda.is_available() else "cpu")
-            
-            # Charger le tokenizer et le modèle en mode évaluation avec optimisations
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                model_name,
-                local_files_only=False,
-                trust_remote_code=True,
-                use_fast=True  # Utiliser le tokenizer rapide
-            )
-            
-            # Charger le modèle avec optimisations
-            self.model = AutoModel.from_pretrained(
-                model_name,
-                local_files_only=False,
-                trust_remote_code=True,
-                torch_dtype=torch.float16 if self.device.type == "cuda" else torch.float32,
-                low_cpu_mem_usage=True,
-                device_map="auto" if self.device.type == "cuda" else None
+            self.model, self.tokenizer, self.device, self.precision = load_encoder(
+                model_name, ENCODER_PRECISION, num_layers=ENCODER_NUM_LAYERS
             )
             
-            # Optimisations supplémentaires
-            self.model.eval()
-            if self.device.type == "cuda":
-                self.model = self.model.cuda()
-                torch.backends.cudnn.benchmark = True
-                logger.info("Modèle déplacé sur GPU avec optimisations")
-            
             # Configurer le nombre de threads
             torch.set_num_threads(NUM_THREADS)
             
@@ -70,4 +161,32 @@ class ModelSingleton:
     
     def get_device(self):
         """Retourne le device utilisé."""
-        return self.device 
\ No newline at end of file
+        return self.device
+    
+    def get_fingerprint(self) -> str:
+        """
+        Retourne une empreinte courte de l'encodeur chargé.
+        
+        L'empreinte couvre le nom et la configuration du modèle, le type des
+        poids et la précision d'inférence, une somme de contrôle de chaque
+        paramètre, la longueur maximale et le pooling : deux encodeurs
+        produisant des embeddings différents n'ont pas la même empreinte.
+        """
+        if self._fingerprint is None:
+            with torch.no_grad():
+                checksums = [
+                    f"{name}:{float(param.detach().double().sum()):.6e}"
+                    for name, param in self.model.state_dict().items()
+                    if isinstance(param, torch.Tensor) and param.is_floating_point()
+                ]
+            payload = json.dumps({
+                'model': self.model_name,
+                'config': self.model.config.to_dict(),
+                'dtype': str(next(self.model.parameters()).dtype),
+                'precision': self.precision,
+                'checksums': checksums,
+                'max_length': MAX_LENGTH,
+                'pooling': 'masked_mean'
+            }, sort_keys=True, default=str)
+            self._fingerprint = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+        return self._fingerprint 
\ No newline at end of file
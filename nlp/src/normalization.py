@@ -0,0 +1,93 @@
+import logging
+import re
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Expressions de demande courantes retirées en tête de question, dans l'ordre
+REQUEST_PREFIXES = [
+    r'(quels sont|quelle est|comment|où|que faire|pourriez-vous|je souhaiterais|à propos de)\s+',
+    r'(pouvez-vous|pourriez-vous|auriez-vous|serait-il possible)\s+',
+    r'(je souhaite|je voudrais|j\'aimerais|je désire)\s+',
+    r'(j\'ai besoin|il me faut|je cherche|je recherche)\s+',
+    r'(je ne comprends pas|je ne sais pas|je suis perdu)\s+'
+]
+
+# Une seule expression pour tout le nettoyage : ponctuation et espaces (\W+)
+# remplacés par une espace, puis texte rogné
+_CLEAN = re.compile(r'\W+')
+
+# normalize_question en un seul passage : les préfixes, chacun au plus une
+# fois et dans l'ordre, sont remplacés par une espace en tête de texte (elle
+# disparaît au rognage), la ponctuation et les espaces comme dans clean_text
+_NORMALIZE = re.compile(r'\A' + ''.join(f'(?:{prefix})?' for prefix in REQUEST_PREFIXES) + r'|\W+')
+
+def clean_text(text: str) -> str:
+    """Nettoie le texte en supprimant la ponctuation et en mettant en minuscules."""
+    if not isinstance(text, str):
+        logger.warning(f"Texte non valide reçu : {text}")
+        return ""
+    return _CLEAN.sub(' ', text.lower()).strip()
+
+def normalize_question(question: str) -> str:
+    """Normalise les variations de formulation des questions."""
+    return _NORMALIZE.sub(' ', question.lower()).strip()
+
+def _batch(function: Callable[[str], str], texts):
+    """
+    Applique `function` à chaque valeur distincte d'un lot de textes.
+
+    Accepte une liste (ou tout itérable), un tableau NumPy, une Series pandas
+    (index, nom et type chaîne conservés) ou un tableau Arrow ; le résultat
+    est du même genre. Les valeurs manquantes ou non textuelles donnent "".
+    """
+    if isinstance(texts, pd.Series):
+        codes, uniques = pd.factorize(texts)
+        values = _unique_values(function, uniques)
+        # Code -1 (valeur manquante) : dernière case, la chaîne vide
+        result = pd.Series(values[codes], index=texts.index, name=texts.name)
+        if isinstance(texts.dtype, pd.StringDtype):
+            result = result.astype(texts.dtype)
+        return result
+
+    if type(texts).__module__.startswith('pyarrow'):
+        return _batch_arrow(function, texts)
+
+    if isinstance(texts, np.ndarray):
+        codes, uniques = pd.factorize(texts.astype(object, copy=False).ravel())
+        return _unique_values(function, uniques)[codes].reshape(texts.shape)
+
+    normalized = {text: function(text) if isinstance(text, str) else "" for text in dict.fromkeys(texts)}
+    return [normalized[text] for text in texts]
+
+def _unique_values(function: Callable[[str], str], uniques) -> np.ndarray:
+    """Valeurs distinctes transformées, suivies de "" pour les valeurs manquantes."""
+    values = [function(text) if isinstance(text, str) else "" for text in uniques]
+    values.append("")
+    return np.array(values, dtype=object)
+
+def _batch_arrow(function: Callable[[str], str], texts):
+    """`_batch` pour un tableau Arrow de chaînes : seul le dictionnaire est converti en objets Python."""
+    import pyarrow as pa
+
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    encoded = texts.dictionary_encode()
+    values = [function(text) for text in encoded.dictionary.to_pylist()]
+    values.append("")
+    indices = encoded.indices.fill_null(len(values) - 1)
+    return pa.array(values, type=pa.string()).take(indices)
+
+def clean_texts(texts):
+    """`clean_text` sur un lot (liste, tableau NumPy, Series pandas ou tableau Arrow)."""
+    return _batch(clean_text, texts)
+
+def normalize_questions(questions):
+    """
+    `normalize_question` sur un lot (liste, tableau NumPy, Series pandas ou
+    tableau Arrow), chaque question distincte n'étant normalisée qu'une fois.
+    """
+    return _batch(normalize_question, questions)
@@ -0,0 +1,165 @@
+import argparse
+import io
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import faiss
+import numpy as np
+import pandas as pd
+import torch
+
+from src.config import BASE_DIR, DATA_DIR, MODEL_NAME, DISTIL_MODEL_NAME, USE_DISTIL, BATCH_SIZE
+from src.data_preprocessing import encode_texts
+from src.model import FAQClassifier
+from src.normalization import normalize_questions
+from src.model_singleton import PRECISION_MODES, load_encoder
+from src.utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+def model_size_mb(model: torch.nn.Module) -> float:
+    """Taille sérialisée du state_dict de l'encodeur, en Mo."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+def top1_answers(faq_embeddings: np.ndarray, faq_categories: np.ndarray,
+                 query_embeddings: np.ndarray, query_categories: np.ndarray) -> np.ndarray:
+    """
+    Cherche la question FAQ la plus proche dans la catégorie prédite.
+
+    Les index sont construits comme dans AnswerFinder (un IndexFlatL2 par
+    catégorie) à partir des embeddings FAQ du même mode de précision.
+
+    Returns:
+        np.ndarray: Numéro de ligne FAQ de la meilleure réponse (-1 si aucune)
+    """
+    best = np.full(len(query_embeddings), -1, dtype=np.int64)
+    for category in np.unique(query_categories):
+        rows = np.flatnonzero(faq_categories == category)
+        if len(rows) == 0:
+            continue
+        index = faiss.IndexFlatL2(faq_embeddings.shape[1])
+        index.add(np.ascontiguousarray(faq_embeddings[rows], dtype=np.float32))
+        positions = np.flatnonzero(query_categories == category)
+        _, indices = index.search(np.ascontiguousarray(query_embeddings[positions], dtype=np.float32), 1)
+        best[positions] = rows[indices[:, 0]]
+    return best
+
+def measure_latency(model, tokenizer, device, texts: List[str], repeats: int) -> Dict[str, float]:
+    """Latence moyenne d'une question seule et débit par lots de BATCH_SIZE."""
+    single = texts[:repeats]
+    encode_texts(model, tokenizer, device, single[:1], 1)  # Préchauffage
+    start = time.perf_counter()
+    for text in single:
+        encode_texts(model, tokenizer, device, [text], 1)
+    single_ms = (time.perf_counter() - start) / len(single) * 1000
+
+    start = time.perf_counter()
+    encode_texts(model, tokenizer, device, texts, BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    return {'single_ms': single_ms, 'batch_qps': len(texts) / elapsed}
+
+def evaluate_mode(precision: str, model_name: str, test_questions: List[str], faq: pd.DataFrame,
+                  classifier: FAQClassifier, repeats: int) -> Dict:
+    """Encode les questions de test et la base FAQ avec un mode de précision donné."""
+    logger.info(f"Évaluation du mode {precision}...")
+    model, tokenizer, device, applied = load_encoder(model_name, precision, device=torch.device("cpu"))
+
+    test_embeddings = encode_texts(model, tokenizer, device, test_questions)
+    faq_embeddings = encode_texts(model, tokenizer, device, faq['question_clean'].tolist())
+
+    test_categories = classifier.label_encoder.inverse_transform(classifier.predict(test_embeddings))
+    faq_categories = classifier.label_encoder.inverse_transform(classifier.predict(faq_embeddings))
+    true_categories = faq['Categorie'].to_numpy()
+
+    result = {
+        'precision': applied,
+        'size_mb': model_size_mb(model),
+        'test_embeddings': test_embeddings,
+        'faq_embeddings': faq_embeddings,
+        'test_categories': test_categories,
+        'faq_categories': faq_categories,
+        'test_answers': top1_answers(faq_embeddings, true_categories, test_embeddings, test_categories),
+        'faq_answers': top1_answers(faq_embeddings, true_categories, faq_embeddings, faq_categories),
+        'faq_accuracy': float(np.mean(faq_categories == true_categories))
+    }
+    result.update(measure_latency(model, tokenizer, device, test_questions, repeats))
+
+    del model
+    return result
+
+def mean_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    """Similarité cosinus moyenne ligne à ligne."""
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return float(np.mean(np.sum(a * b, axis=1) / np.maximum(norms, 1e-12)))
+
+def generate_report(results: Dict[str, Dict], n_test: int, n_faq: int) -> str:
+    """Compare chaque mode à la référence float32."""
+    reference = results['float32']
+    report = [
+        "=== Rapport de Parité des Modes de Précision ===",
+        f"Date: {datetime.now().isoformat()}",
+        f"Questions de test: {n_test}",
+        f"Questions de la base FAQ: {n_faq}",
+        ""
+    ]
+
+    for requested, result in results.items():
+        report.append(f"Mode {requested} (appliqué: {result['precision']}):")
+        report.append(f"- Taille de l'encodeur: {result['size_mb']:.1f} Mo")
+        report.append(f"- Latence (1 question): {result['single_ms']:.1f} ms "
+                      f"(x{reference['single_ms'] / result['single_ms']:.2f} vs float32)")
+        report.append(f"- Débit par lots de {BATCH_SIZE}: {result['batch_qps']:.1f} questions/s "
+                      f"(x{result['batch_qps'] / reference['batch_qps']:.2f} vs float32)")
+        report.append(f"- Précision des catégories sur la base FAQ: {result['faq_accuracy']:.2%}")
+        if requested != 'float32':
+            report.extend([
+                f"- Similarité cosinus moyenne vs float32 (test): "
+                f"{mean_cosine(result['test_embeddings'], reference['test_embeddings']):.4f}",
+                f"- Accord des catégories (test): "
+                f"{np.mean(result['test_categories'] == reference['test_categories']):.2%}",
+                f"- Accord de la meilleure réponse (test): "
+                f"{np.mean(result['test_answers'] == reference['test_answers']):.2%}",
+                f"- Accord des catégories (base FAQ): "
+                f"{np.mean(result['faq_categories'] == reference['faq_categories']):.2%}",
+                f"- Accord de la meilleure réponse (base FAQ): "
+                f"{np.mean(result['faq_answers'] == reference['faq_answers']):.2%}"
+            ])
+        report.append("")
+
+    return "\n".join(report)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapport de parité float32 / INT8 / bfloat16 de l'encodeur")
+    parser.add_argument('--modes', nargs='+', default=['int8', 'bfloat16'], choices=PRECISION_MODES,
+                        help="Modes à comparer à float32")
+    parser.add_argument('--repeats', type=int, default=50,
+                        help="Nombre de questions pour la mesure de latence unitaire")
+    args = parser.parse_args()
+    setup_logging()
+
+    model_name = DISTIL_MODEL_NAME if USE_DISTIL else MODEL_NAME
+    test_questions = normalize_questions(pd.read_csv(DATA_DIR / "test_questions.csv")['question'].dropna()).tolist()
+    faq = pd.read_csv(DATA_DIR / "faqs_clean.csv").dropna(subset=['question', 'Categorie'])
+    faq['question_clean'] = normalize_questions(faq['question'])
+    classifier = FAQClassifier.load()
+
+    results = {}
+    for precision in ['float32'] + [mode for mode in args.modes if mode != 'float32']:
+        results[precision] = evaluate_mode(precision, model_name, test_questions, faq, classifier, args.repeats)
+
+    report = generate_report(results, len(test_questions), len(faq))
+    print(report)
+
+    reports_dir = BASE_DIR / "reports"
+    reports_dir.mkdir(exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    with open(reports_dir / f"precision_report_{timestamp}.txt", "w", encoding="utf-8") as f:
+        f.write(report)
+    print(f"\nRapport sauvegardé dans le dossier 'reports/'")
+
+if __name__ == "__main__":
+    main()
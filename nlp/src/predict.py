@@ -11,8 +11,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config import MODELS_DIR, DATA_DIR
-from src.data_preprocessing import DataPreprocessor
-from src.model import FAQClassifier
+from src.engine import FAQEngine
 from src.utils import setup_logging
 
 def parse_args():
@@ -40,30 +39,21 @@ def main(args):
     
     # Chargement des modèles
     logger.info("Chargement du modèle...")
-    classifier = FAQClassifier.load()
-    preprocessor = DataPreprocessor()
+    engine = FAQEngine(with_answers=False)
+    classifier = engine.classifier
     
-    # Prétraitement des questions
-    logger.info("Prétraitement des questions...")
-    embeddings = []
-    for question in df['question']:
-        embedding = preprocessor.preprocess_single_text(question)
-        embeddings.append(embedding)
-    embeddings = np.array(embeddings)
-    
-    # Prédictions avec confiance
-    logger.info("Prédiction des catégories...")
-    predictions = classifier.predict_with_confidence(
-        embeddings, 
-        args.confidence_threshold,
-        questions=df['question'].tolist()
+    # Encodage par lots et prédictions avec confiance (probabilités brutes en un seul appel)
+    logger.info("Prétraitement et prédiction des catégories...")
+    all_probas, predictions = engine.classify(
+        df['question'].tolist(),
+        args.confidence_threshold
     )
     
     # Préparation des résultats
     results = []
     for i, (question, pred) in enumerate(zip(df['question'], predictions)):
         # Vérification de la cohérence des probabilités
-        probas = classifier.predict_proba(embeddings[i:i+1])[0]
+        probas = all_probas[i]
         predicted_idx = np.argmax(probas)
         predicted_class = classifier.label_encoder.inverse_transform([predicted_idx])[0]
         
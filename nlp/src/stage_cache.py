@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, List, Sequence, TypeVar
+
+from src.config import STAGE_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+def file_digest(path: Path) -> str:
+    """Empreinte du contenu d'un fichier (et non de sa date de modification)."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+@dataclass
+class StageRun:
+    """Exécution d'une étape : clé, relue depuis le cache ou recalculée, durée."""
+    name: str
+    key: str
+    hit: bool
+    seconds: float
+
+class StageCache:
+    """
+    Cache disque des étapes d'un entraînement, adressé par contenu.
+
+    La clé d'une étape est un hachage de son nom, de ses paramètres et des
+    clés des étapes dont elle dépend : modifier une donnée ou un paramètre
+    change la clé de l'étape concernée et de toutes celles qui en dépendent,
+    les étapes en amont restant relues. Le résultat d'une étape est rangé
+    dans `<répertoire>/<étape>/<clé>/`, écrit dans un dossier temporaire
+    puis renommé : un dossier présent est toujours complet.
+    """
+
+    def __init__(self, directory: Path = STAGE_CACHE_DIR, enabled: bool = True):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.runs: List[StageRun] = []
+
+    @staticmethod
+    def key(name: str, params: Any, parents: Sequence[str] = ()) -> str:
+        """Clé d'une étape (paramètres sérialisés en JSON, clés triées)."""
+        payload = json.dumps({'stage': name, 'params': params, 'parents': list(parents)},
+                             sort_keys=True, default=repr)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def path(self, name: str, key: str) -> Path:
+        return self.directory / name / key
+
+    def run(self, name: str, key: str, compute: Callable[[], T],
+            save: Callable[[T, Path], None], load: Callable[[Path], T]) -> T:
+        """
+        Résultat de l'étape `name` : relu avec `load` si la clé est en cache,
+        sinon calculé par `compute` puis écrit avec `save`.
+        """
+        start_time = time.time()
+        path = self.path(name, key)
+        if self.enabled and path.is_dir():
+            try:
+                result = load(path)
+            except Exception as e:
+                logger.warning(f"Étape {name} ({key}) illisible, recalcul: {str(e)}")
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                self._record(name, key, True, start_time)
+                return result
+
+        result = compute()
+        if self.enabled:
+            self._store(name, key, result, save)
+        self._record(name, key, False, start_time)
+        return result
+
+    def _store(self, name: str, key: str, result: Any, save: Callable[[Any, Path], None]):
+        path = self.path(name, key)
+        tmp_path = path.with_name(f".{key}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        try:
+            save(result, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Écrit entre-temps par un autre entraînement : même clé, même contenu
+            if not path.is_dir():
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _record(self, name: str, key: str, hit: bool, start_time: float):
+        run = StageRun(name, key, hit, time.time() - start_time)
+        self.runs.append(run)
+        status = "relue depuis le cache" if hit else "calculée"
+        logger.info(f"Étape {name} ({key}) {status} en {run.seconds:.2f} secondes")
+
+    def report(self) -> str:
+        """Tableau des étapes exécutées : durée et provenance (cache ou calcul)."""
+        lines = ["Étapes de l'entraînement :", f"{'étape':<12} {'clé':<16} {'cache':<6} {'durée':>9}"]
+        for run in self.runs:
+            lines.append(f"{run.name:<12} {run.key:<16} {'oui' if run.hit else 'non':<6} {run.seconds:>8.2f}s")
+        total = sum(run.seconds for run in self.runs)
+        hits = sum(run.hit for run in self.runs)
+        lines.append(f"Total: {total:.2f}s, {hits}/{len(self.runs)} étapes relues depuis le cache")
+        return "\n".join(lines)
+
+    def summary(self) -> dict:
+        """Rapport des étapes au format JSON."""
+        return {
+            'stages': [
+                {'name': run.name, 'key': run.key, 'cache_hit': run.hit, 'seconds': round(run.seconds, 3)}
+                for run in self.runs
+            ],
+            'total_seconds': round(sum(run.seconds for run in self.runs), 3)
+        }
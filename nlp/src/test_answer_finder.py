@@ -0,0 +1,254 @@
+import tempfile
+import zlib
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.answer_finder import AnswerFinder
+from src.cache import LRUCache
+from src.faq_index import FAQIndex
+
+DIM = 16
+CATEGORIES = ['Compte', 'Sécurité', 'Transaction']
+
+def vector(text: str) -> np.ndarray:
+    """Embedding déterministe propre à chaque question."""
+    return np.random.default_rng(zlib.crc32(text.encode('utf-8'))).standard_normal(DIM).astype(np.float32)
+
+class StubPreprocessor:
+    """Encodeur minimal : vecteurs déterministes, garde les questions encodées."""
+    def __init__(self):
+        self.encoded = []
+
+    def embed_batch(self, questions):
+        self.encoded.extend(questions)
+        return np.stack([vector(question) for question in questions]) if questions else np.empty((0, DIM))
+
+def make_faqs(per_category: int = 20) -> pd.DataFrame:
+    rows = [(f"Question {i} sur {category} ?", f"Réponse {i // 2} ({category})", category)
+            for category in CATEGORIES for i in range(per_category)]
+    return pd.DataFrame(rows, columns=['question', 'Réponse', 'Categorie'])
+
+def build_index(faqs: pd.DataFrame, index_type: str) -> FAQIndex:
+    return FAQIndex.build(np.stack([vector(q) for q in faqs['question']]), faqs['Categorie'].tolist(),
+                          faqs['question'].tolist(), faqs['Réponse'].tolist(), index_type=index_type)
+
+def make_finder(faqs: pd.DataFrame, directory: Path) -> AnswerFinder:
+    """AnswerFinder sur un CSV et un index du dossier temporaire, sans charger l'encodeur."""
+    faq_data_path = directory / "faqs.csv"
+    faqs.to_csv(faq_data_path, index=False)
+    build_index(faqs, 'flat').save()
+    finder = AnswerFinder.__new__(AnswerFinder)
+    finder.preprocessor = StubPreprocessor()
+    finder.faq_data_path = faq_data_path
+    finder.faq_data = pd.read_csv(faq_data_path)
+    finder.index = FAQIndex.load()
+    finder.similarity_cache = LRUCache(max_entries=100)
+    finder._lexical = None
+    return finder
+
+class StubModelSingleton:
+    """Empreinte de l'encodeur courant, modifiable par le test."""
+    fingerprint = "encodeur-1"
+
+    def get_fingerprint(self) -> str:
+        return StubModelSingleton.fingerprint
+
+def sync(faqs: pd.DataFrame, directory: Path, full: bool = False):
+    """Synchronise l'index du dossier temporaire avec `faqs` ; retourne (résumé, questions encodées)."""
+    finder = AnswerFinder.__new__(AnswerFinder)
+    finder.preprocessor = StubPreprocessor()
+    finder.faq_data_path = directory / "faqs.csv"
+    finder.faq_data = faqs
+    finder.index = None
+    finder.similarity_cache = LRUCache(max_entries=100)
+    finder._lexical = None
+    return finder.sync_index(full=full), finder.preprocessor.encoded
+
+def category_neighbours(index: FAQIndex, question: str, category: str, k: int = 10) -> list:
+    _, rows, _, _ = index.search(vector(question).reshape(1, -1), [category], k)
+    return [int(row) for row in rows[0] if row >= 0]
+
+def check_update_round_trip(index_type: str):
+    """update -> save -> load -> search : lignes remplacées, ajoutées et supprimées, identifiants stables."""
+    faqs = make_faqs()
+    with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+        build_index(faqs, index_type).save(Path(first))
+        index = FAQIndex.load(Path(first))
+        assert index.index_type == index_type
+
+        # Ligne 5 (Compte) remplacée, ligne 60 (Transaction) ajoutée, lignes 7 et 25 supprimées
+        ids = [5, 60]
+        questions = ["Comment clôturer mon compte ?", "Virement instantané possible ?"]
+        answers = ["Réponse clôture", "Réponse virement"]
+        categories = ['Compte', 'Transaction']
+        embeddings = np.stack([vector(question) for question in questions])
+        updated = index.updated(ids, embeddings, categories, questions, answers, delete_ids=[7, 25])
+        assert index.is_live(7) and index.questions[5] == faqs['question'][5], "Index d'origine modifié"
+
+        updated.save(Path(second))
+        reloaded = FAQIndex.load(Path(second))
+        assert len(reloaded) == len(faqs) - 1
+        assert not reloaded.is_live(7) and not reloaded.is_live(25) and reloaded.is_live(60)
+        assert reloaded.questions[5] == questions[0] and reloaded.answer_of(5) == answers[0]
+        assert reloaded.questions[60] == questions[1] and reloaded.category_of(60) == 'Transaction'
+        # Identifiants des lignes inchangées conservés
+        for row in (0, 6, 8, 24, 26, 59):
+            assert reloaded.questions[row] == faqs['question'][row]
+            assert reloaded.category_of(row) == faqs['Categorie'][row]
+
+        # Recherche restreinte : lignes exactes (petites catégories) puis index approché
+        for exact_max in (10000, 0):
+            with mock.patch('src.faq_index.ANN_EXACT_MAX', exact_max):
+                index = FAQIndex.load(Path(second))
+                assert 7 not in category_neighbours(index, faqs['question'][7], 'Compte', k=20)
+                assert 25 not in category_neighbours(index, faqs['question'][25], 'Sécurité', k=20)
+                assert category_neighbours(index, questions[0], 'Compte')[0] == 5
+                assert category_neighbours(index, questions[1], 'Transaction')[0] == 60
+                assert category_neighbours(index, faqs['question'][8], 'Compte')[0] == 8
+                _, _, _, global_rows = index.search(vector(faqs['question'][7]).reshape(1, -1), global_k=len(index))
+                assert 7 not in global_rows[0] and 25 not in global_rows[0]
+
+        # Manifeste : empreintes identiques à celles d'un index construit sur le nouveau contenu
+        rows = reloaded.live_rows()
+        assert reloaded.stale_categories(rows, [reloaded.category_of(row) for row in rows],
+                                         [reloaded.questions[row] for row in rows],
+                                         [reloaded.answer_of(row) for row in rows]) == []
+
+def test_update_round_trip():
+    for index_type in ('flat', 'hnsw'):
+        check_update_round_trip(index_type)
+        print(f"Mise à jour de l'index {index_type}, sauvegarde et rechargement: OK")
+
+def test_with_changes():
+    """Ajout, modification et suppression de FAQs : seules les questions modifiées sont encodées."""
+    faqs = make_faqs()
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch('src.faq_index.FAISS_INDICES_DIR', Path(directory)):
+        finder = make_finder(faqs, Path(directory))
+        new_finder, summary = finder.with_changes(
+            upserts=[{'id': 3, 'question': " Mot de passe oublié ? ", 'answer': "Réinitialisez-le.",
+                      'category': 'Sécurité'},
+                     {'question': "Carte bloquée ?", 'answer': "Appelez l'agence.", 'category': 'Autre'}],
+            delete_ids=[10]
+        )
+        assert summary == {'upserted': [3, 60], 'deleted': [10]}
+        assert finder.preprocessor.encoded == ["Mot de passe oublié ?", "Carte bloquée ?"]
+
+        # L'ancien chercheur sert toujours l'ancien contenu
+        assert finder.index.is_live(10) and finder.index.category_of(3) == 'Compte'
+
+        for index in (new_finder.index, FAQIndex.load()):
+            assert not index.is_live(10)
+            assert index.category_of(3) == 'Sécurité' and index.questions[3] == "Mot de passe oublié ?"
+            assert index.category_of(60) == 'Autre'
+            assert 10 not in category_neighbours(index, faqs['question'][10], 'Compte', k=20)
+            assert 3 not in category_neighbours(index, faqs['question'][3], 'Compte', k=20)
+        answer = new_finder.find_best_answer_from_embedding(vector("Carte bloquée ?"), 'Autre')
+        assert answer['answer'] == "Appelez l'agence."
+        answer = new_finder.find_best_answer_from_embedding(vector("Mot de passe oublié ?"), 'Sécurité')
+        assert answer['answer'] == "Réinitialisez-le."
+
+        # Le CSV garde les identifiants : une reconstruction complète retrouve les mêmes lignes
+        saved = pd.read_csv(finder.faq_data_path)
+        assert saved['id'].tolist() == [i for i in range(61) if i != 10]
+        assert saved.set_index('id').loc[3, 'Categorie'] == 'Sécurité'
+        assert np.array_equal(new_finder._row_ids(), saved['id'].to_numpy())
+    print("Ajout, modification et suppression de FAQs: OK")
+
+def test_with_changes_rejects_invalid_rows():
+    """Une modification invalide est refusée sans rien écrire."""
+    faqs = make_faqs()
+    invalid = [
+        ([{'question': "Q ?", 'answer': "R", 'category': ""}], []),  # Champ vide
+        ([{'question': "Q ?", 'category': 'Compte'}], []),  # Champ manquant
+        ([{'question': 3, 'answer': "R", 'category': 'Compte'}], []),  # Pas une chaîne
+        ([{'id': 999, 'question': "Q ?", 'answer': "R", 'category': 'Compte'}], []),  # FAQ inconnue
+        ([], [999]),  # Suppression d'une FAQ inconnue
+        ([{'id': 4, 'question': "Q ?", 'answer': "R", 'category': 'Compte'}], [4]),  # Modifiée et supprimée
+        ([{'id': 4, 'question': "Q ?", 'answer': "R", 'category': 'Compte'},
+          {'id': 4, 'question': "Q2 ?", 'answer': "R", 'category': 'Compte'}], []),  # Modifiée deux fois
+    ]
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch('src.faq_index.FAISS_INDICES_DIR', Path(directory)):
+        finder = make_finder(faqs, Path(directory))
+        finder, _ = finder.with_changes(delete_ids=[7])
+        csv_before = finder.faq_data_path.read_bytes()
+        index_before = FAQIndex.path().read_bytes()
+        invalid.append(([], [7]))  # Suppression d'une FAQ déjà supprimée
+        invalid.append(([{'id': 7, 'question': "Q ?", 'answer': "R", 'category': 'Compte'}], []))
+        for upserts, delete_ids in invalid:
+            try:
+                finder.with_changes(upserts, delete_ids)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"Modification invalide acceptée: {upserts} {delete_ids}")
+        assert finder.faq_data_path.read_bytes() == csv_before
+        assert FAQIndex.path().read_bytes() == index_before
+        assert finder.preprocessor.encoded == []
+    print("Modifications invalides refusées: OK")
+
+def test_sync_index():
+    """Réencodage minimal : tout, rien, une catégorie ou seulement la reconstruction de l'index."""
+    faqs = make_faqs()
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch('src.faq_index.FAISS_INDICES_DIR', Path(directory)), \
+            mock.patch('src.answer_finder.ModelSingleton', StubModelSingleton):
+        directory = Path(directory)
+        StubModelSingleton.fingerprint = "encodeur-1"
+
+        # Pas d'index : tout est encodé
+        summary, encoded = sync(faqs, directory)
+        assert summary['action'] == 'full' and summary['embedded'] == len(faqs)
+        assert sorted(encoded) == sorted(faqs['question'])
+
+        # Rien n'a changé
+        summary, encoded = sync(faqs, directory)
+        assert summary == {'action': 'none', 'categories': [], 'embedded': 0} and encoded == []
+
+        # Une catégorie modifiée : seules ses questions sont réencodées
+        edited = faqs.copy()
+        edited.loc[21, 'question'] = "Question modifiée sur Sécurité ?"
+        edited.loc[22, 'Réponse'] = "Réponse modifiée"
+        summary, encoded = sync(edited, directory)
+        assert summary == {'action': 'categories', 'categories': ['Sécurité'], 'embedded': 20}, summary
+        assert encoded == edited.loc[edited['Categorie'] == 'Sécurité', 'question'].tolist()
+        index = FAQIndex.load()
+        assert index.questions[21] == "Question modifiée sur Sécurité ?"
+        assert category_neighbours(index, "Question modifiée sur Sécurité ?", 'Sécurité')[0] == 21
+        assert sync(edited, directory)[0]['action'] == 'none'
+
+        # Une catégorie supprimée du CSV : retirée sans rien encoder
+        reduced = edited[edited['Categorie'] != 'Transaction'].reset_index(drop=True)
+        summary, encoded = sync(reduced, directory)
+        assert summary == {'action': 'categories', 'categories': ['Transaction'], 'embedded': 0} and encoded == []
+        assert not FAQIndex.load().has_category('Transaction')
+
+        # Autres paramètres d'index : reconstruction à partir des vecteurs sauvegardés
+        with mock.patch('src.answer_finder.FAISS_INDEX_TYPE', 'hnsw'):
+            summary, encoded = sync(reduced, directory)
+            assert summary['action'] == 'reindex' and encoded == []
+            assert FAQIndex.load().index_type == 'hnsw'
+            assert sync(reduced, directory)[0]['action'] == 'none'
+
+        # Autre encodeur : tout est réencodé, même sans changement du CSV
+        StubModelSingleton.fingerprint = "encodeur-2"
+        summary, encoded = sync(reduced, directory)
+        assert summary['action'] == 'full' and len(encoded) == len(reduced)
+        assert FAQIndex.load().encoder_fingerprint == "encodeur-2"
+        assert sync(reduced, directory)[0]['action'] == 'none'
+
+        # Reconstruction complète demandée
+        summary, encoded = sync(reduced, directory, full=True)
+        assert summary['action'] == 'full' and len(encoded) == len(reduced)
+    print("Synchronisation de l'index avec le CSV: OK")
+
+if __name__ == "__main__":
+    print("=== Test de la Mise à Jour de l'Index FAQ ===")
+    test_update_round_trip()
+    test_with_changes()
+    test_with_changes_rejects_invalid_rows()
+    test_sync_index()
@@ -0,0 +1,88 @@
+import importlib
+import json
+from contextlib import contextmanager
+from unittest import mock
+
+api = importlib.import_module("api.app")  # Le paquet api réexporte l'objet Flask sous le même nom
+
+class StubEngine:
+    """Moteur minimal : la catégorie est la question ; une question contenant 'panne' fait échouer le lot."""
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, questions, min_similarity=0.7):
+        self.batches.append(list(questions))
+        if any('panne' in question for question in questions):
+            raise RuntimeError("encodeur indisponible")
+        return [{
+            'question': question,
+            'prediction': {'category': question.upper(), 'probabilities': {}, 'confidence': 1.0},
+            'answer': {'answer': f"réponse {question}", 'similarity': 1.0, 'best_question': question,
+                       'is_confident': 1, 'alternatives': []}
+        } for question in questions]
+
+@contextmanager
+def client(chunk_size: int = 2):
+    """Client de test Flask avec le moteur factice chargé."""
+    engine = StubEngine()
+    with mock.patch.object(api, 'engine', engine), mock.patch.object(api, 'models_loaded', True), \
+            mock.patch.object(api, 'PREDICT_BATCH_CHUNK_SIZE', chunk_size):
+        yield api.app.test_client(), engine
+
+def read_lines(response) -> list:
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_json_array():
+    """Tableau JSON et objet {"questions": [...]} : une ligne par question, dans l'ordre, par tranches."""
+    for body in (["a", {"question": "b"}, "c"], {"questions": ["a", {"question": "b"}, "c"]}):
+        with client() as (test_client, engine):
+            lines = read_lines(test_client.post('/predict-batch', json=body))
+        assert [line['index'] for line in lines] == [0, 1, 2]
+        assert [line['category'] for line in lines] == ["A", "B", "C"]
+        assert all(line['success'] for line in lines) and lines[1]['question'] == "b"
+        assert engine.batches == [["a", "b"], ["c"]]
+    print("Tableau JSON et objet questions: OK")
+
+def test_ndjson():
+    """Flux NDJSON : lignes vides ignorées, lignes invalides signalées sans interrompre le flux."""
+    body = '"a"\n\n{"question": "b"}\npas du json\n   \n{"autre": 1}\n42\n"c"\n'
+    with client() as (test_client, engine):
+        lines = read_lines(test_client.post('/predict-batch', data=body.encode('utf-8'),
+                                            content_type='application/x-ndjson'))
+    assert [line['index'] for line in lines] == [0, 1, 2, 3, 4, 5]
+    assert [line['success'] for line in lines] == [True, True, False, False, False, True]
+    assert lines[2]['error'] == "Question manquante ou invalide"
+    assert [line['category'] for line in lines if line['success']] == ["A", "B", "C"]
+    assert engine.batches == [["a", "b"], ["c"]]
+    print("Flux NDJSON avec lignes vides et invalides: OK")
+
+def test_bad_request():
+    """Corps sans tableau de questions : 400 sans appeler le moteur ; modèles non chargés : 503."""
+    for kwargs in ({'json': {"question": "a"}}, {'json': "a"}, {'data': "pas du json", 'content_type': 'application/json'},
+                   {'json': {"questions": "a"}}):
+        with client() as (test_client, engine):
+            response = test_client.post('/predict-batch', **kwargs)
+        assert response.status_code == 400 and response.get_json()['success'] is False, kwargs
+        assert engine.batches == []
+    with mock.patch.object(api, 'models_loaded', False), mock.patch.object(api, 'loading_error', None):
+        assert api.app.test_client().post('/predict-batch', json=["a"]).status_code == 503
+    print("Requêtes invalides refusées: OK")
+
+def test_failing_chunk():
+    """Une tranche en erreur donne une ligne d'erreur par question, puis le flux continue."""
+    with client() as (test_client, engine):
+        lines = read_lines(test_client.post('/predict-batch', json=["a", "b", "c", "panne", "d", "e"]))
+    assert [line['index'] for line in lines] == [0, 1, 2, 3, 4, 5]
+    assert [line['success'] for line in lines] == [True, True, False, False, True, True]
+    assert lines[2]['error'] == lines[3]['error'] == "Erreur lors de la prédiction: encodeur indisponible"
+    assert [line['category'] for line in lines[4:]] == ["D", "E"]
+    assert engine.batches == [["a", "b"], ["c", "panne"], ["d", "e"]]
+    print("Tranche en erreur signalée sans couper le flux: OK")
+
+if __name__ == "__main__":
+    print("=== Test de l'Endpoint /predict-batch ===")
+    test_json_array()
+    test_ndjson()
+    test_bad_request()
+    test_failing_chunk()
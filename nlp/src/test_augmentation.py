@@ -0,0 +1,81 @@
+import importlib.util
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.augmentation import augment_dataframe, augment_texts, dataset_key, get_augmenter, text_seed
+from src.config import DATA_DIR, RANDOM_STATE
+from src.normalization import normalize_questions
+
+# Fautes de frappe aléatoires (nlpaug) si disponible : la graine de chaque texte compte alors
+METHODS = ['keyboard', 'formulation'] if importlib.util.find_spec('nlpaug') else ['formulation']
+NUM_AUG = 2
+
+def load_faqs(n: int = 40) -> pd.DataFrame:
+    df = pd.read_csv(DATA_DIR / "faqs_clean.csv").head(n)
+    return df.assign(question_clean=normalize_questions(df['question'].tolist()))
+
+def test_workers_and_chunks():
+    """Mêmes variations quels que soient le nombre de processus et la taille des lots."""
+    questions = load_faqs()['question_clean'].tolist()
+    reference = augment_texts(questions, methods=METHODS, num_aug=NUM_AUG, workers=1, chunk_size=256)
+    assert all(reference), "Question sans variation"
+    for workers, chunk_size in [(1, 3), (2, 7), (3, 1), (2, 256)]:
+        results = augment_texts(questions, methods=METHODS, num_aug=NUM_AUG, workers=workers, chunk_size=chunk_size)
+        assert results == reference, f"Résultat différent avec {workers} processus et des lots de {chunk_size}"
+
+    df = load_faqs()
+    expected = augment_dataframe(df, METHODS, NUM_AUG, workers=1, chunk_size=256, cache_dir=None)
+    augmented = augment_dataframe(df, METHODS, NUM_AUG, workers=2, chunk_size=5, cache_dir=None)
+    pd.testing.assert_frame_equal(augmented, expected)
+    print(f"Augmentation ({', '.join(METHODS)}) identique sur 1 à 3 processus, lots de 1 à 256: OK")
+
+def test_cache_reuse():
+    """Un deuxième appel sur les mêmes lignes relit augmented_<clé>.csv sans rien recalculer."""
+    df = load_faqs(20)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_dir = Path(cache_dir)
+        first = augment_dataframe(df, METHODS, NUM_AUG, workers=2, chunk_size=4, cache_dir=cache_dir)
+        key = dataset_key(df, METHODS, NUM_AUG, RANDOM_STATE)
+        path = cache_dir / f"augmented_{key}.csv"
+        assert [p.name for p in cache_dir.iterdir()] == [path.name], "Fichier temporaire restant"
+
+        with mock.patch('src.augmentation.iter_augmented', side_effect=AssertionError("recalcul")):
+            second = augment_dataframe(df, METHODS, NUM_AUG, workers=2, chunk_size=4, cache_dir=cache_dir)
+        pd.testing.assert_frame_equal(second, first)
+        uncached = augment_dataframe(df, METHODS, NUM_AUG, workers=1, cache_dir=None)
+        pd.testing.assert_frame_equal(first, uncached)
+
+        # Autres lignes ou autres paramètres : autre clé, nouveau calcul
+        edited = df.copy()
+        edited.loc[0, 'question_clean'] = "question modifiée"
+        assert dataset_key(edited, METHODS, NUM_AUG, RANDOM_STATE) != key
+        assert dataset_key(df, METHODS, NUM_AUG + 1, RANDOM_STATE) != key
+        assert dataset_key(df, METHODS, NUM_AUG, RANDOM_STATE + 1) != key
+        augment_dataframe(edited, METHODS, NUM_AUG, workers=1, cache_dir=cache_dir)
+        assert len(list(cache_dir.glob("augmented_*.csv"))) == 2
+    print("Données augmentées relues depuis le cache: OK")
+
+def test_caller_random_state():
+    """L'augmentation graine chaque texte sans modifier la suite aléatoire du processus appelant."""
+    questions = load_faqs(5)['question_clean'].tolist()
+    random.seed(7)
+    np.random.seed(7)
+    expected = (random.random(), np.random.rand())
+
+    random.seed(7)
+    np.random.seed(7)
+    augment_texts(questions, methods=METHODS, num_aug=NUM_AUG, workers=1)
+    get_augmenter(METHODS, NUM_AUG).augment(questions[0], text_seed(questions[0]))
+    assert (random.random(), np.random.rand()) == expected, "État aléatoire de l'appelant modifié"
+    print("État aléatoire de l'appelant conservé: OK")
+
+if __name__ == "__main__":
+    print("=== Test de l'Augmentation des Données ===")
+    test_workers_and_chunks()
+    test_cache_reuse()
+    test_caller_random_state()
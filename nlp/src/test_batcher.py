@@ -0,0 +1,199 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.batcher import EmbeddingBatcher
+
+class StubPreprocessor:
+    """Préprocesseur minimal : garde les embeddings mis en cache par le batcher."""
+    def __init__(self):
+        self.cached = {}
+
+    def cache_embedding(self, text: str, embedding: np.ndarray):
+        self.cached[text] = embedding
+
+def vector(text: str) -> np.ndarray:
+    """Embedding déterministe propre à chaque texte."""
+    return np.frombuffer(text.encode('utf-8').ljust(16, b'\0')[:16], dtype=np.uint8).astype(np.float32)
+
+def probas(text: str) -> np.ndarray:
+    """Probabilités brutes déterministes propres à chaque texte."""
+    return vector(text)[:4] / 255
+
+def stub_encode(texts, delay: float = 0.0, batches=None):
+    if batches is not None:
+        batches.append(list(texts))
+    time.sleep(delay)
+    return np.stack([vector(text) for text in texts]), np.stack([probas(text) for text in texts])
+
+def test_concurrent_callers():
+    """Des appels concurrents sont regroupés et chacun reçoit son propre vecteur."""
+    batches = []
+    preprocessor = StubPreprocessor()
+    batcher = EmbeddingBatcher(preprocessor, max_wait_ms=20, max_batch_size=16, target_latency_ms=1000,
+                               encode=lambda texts: stub_encode(texts, 0.01, batches))
+    texts = [f"question {i}" for i in range(64)]
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher.embed, texts))
+    batcher.stop()
+
+    for text, (embedding, text_probas) in zip(texts, results):
+        assert np.array_equal(embedding, vector(text)), f"Vecteur d'un autre appelant pour {text!r}"
+        assert np.array_equal(text_probas, probas(text)), f"Probabilités d'un autre appelant pour {text!r}"
+        assert np.array_equal(preprocessor.cached[text], vector(text))
+    assert sorted(text for batch in batches for text in batch) == sorted(texts)
+    assert len(batches) < len(texts), "Aucun regroupement"
+    stats = batcher.get_stats()
+    assert stats['total_items'] == len(texts) and stats['total_batches'] == len(batches)
+    print(f"{len(texts)} appels concurrents en {len(batches)} lots, chacun avec son vecteur: OK")
+
+def test_exception_propagation():
+    """Une erreur de l'encodeur est rendue à chaque appelant du lot ; le batcher continue ensuite."""
+    failing = threading.Event()
+    failing.set()
+
+    def encode(texts):
+        time.sleep(0.02)
+        if failing.is_set():
+            raise RuntimeError("encodeur indisponible")
+        return stub_encode(texts)
+
+    batcher = EmbeddingBatcher(StubPreprocessor(), max_wait_ms=50, max_batch_size=8, encode=encode)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(batcher.embed, f"q{i}") for i in range(8)]
+        errors = []
+        for future in futures:
+            try:
+                future.result(timeout=5)
+            except RuntimeError as e:
+                errors.append(str(e))
+    assert errors == ["encodeur indisponible"] * 8, errors
+
+    failing.clear()
+    assert np.array_equal(batcher.embed("après", timeout=5)[0], vector("après"))
+    batcher.stop()
+    print("Exception de l'encodeur transmise à chaque appelant: OK")
+
+def test_adaptive_batch_size():
+    """Taille de lot ×0.75 au-delà de la latence visée, +1 pour un lot plein et rapide, bornée."""
+    batcher = EmbeddingBatcher(StubPreprocessor(), max_batch_size=16, target_latency_ms=100, encode=stub_encode)
+    batcher.stop()
+
+    batcher._record(16, 0.2)
+    assert batcher.current_batch_size == 12
+    batcher._record(12, 0.2)
+    assert batcher.current_batch_size == 9
+    batcher._record(5, 0.01)  # Lot incomplet : pas d'augmentation
+    assert batcher.current_batch_size == 9
+    batcher._record(9, 0.07)  # Lot plein mais au-delà de la moitié de la latence visée
+    assert batcher.current_batch_size == 9
+    batcher._record(9, 0.01)
+    assert batcher.current_batch_size == 10
+    for _ in range(20):
+        batcher._record(batcher.current_batch_size, 0.01)
+    assert batcher.current_batch_size == 16, "Taille de lot au-delà du maximum"
+    batcher.current_batch_size = 1
+    batcher._record(1, 1.0)
+    assert batcher.current_batch_size == 1, "Taille de lot sous 1"
+    print("Adaptation de la taille de lot: OK")
+
+def test_stop():
+    """`stop` sert les requêtes déjà déposées puis arrête le thread."""
+    batcher = EmbeddingBatcher(StubPreprocessor(), max_wait_ms=200, max_batch_size=64,
+                               encode=lambda texts: stub_encode(texts, 0.05))
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(batcher.embed, f"q{i}") for i in range(4)]
+        time.sleep(0.05)
+        batcher.stop()
+        results = [future.result(timeout=5) for future in futures]
+    assert all(np.array_equal(result[0], vector(f"q{i}")) for i, result in enumerate(results))
+    assert not batcher._thread.is_alive()
+    print("Arrêt après les requêtes en attente: OK")
+
+def collect_errors(batcher: EmbeddingBatcher, texts) -> list:
+    """Appels concurrents ; retourne l'erreur de chacun (None s'il a reçu son vecteur), sans attente infinie."""
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        futures = [pool.submit(batcher.embed, text, 5) for text in texts]
+        errors = []
+        for future in futures:
+            try:
+                future.result(timeout=10)
+                errors.append(None)
+            except RuntimeError as e:
+                errors.append(str(e))
+    return errors
+
+def test_partial_failures():
+    """Résultat incomplet ou mise en cache en erreur : chaque requête sans vecteur reçoit l'exception."""
+    batcher = EmbeddingBatcher(StubPreprocessor(), max_wait_ms=50, max_batch_size=8,
+                               encode=lambda texts: tuple(part[:-1] for part in stub_encode(texts, 0.02)))
+    errors = collect_errors(batcher, [f"q{i}" for i in range(6)])
+    assert all(error is not None and "embeddings pour un lot de" in error for error in errors), errors
+    batcher.stop()
+
+    class FailingPreprocessor(StubPreprocessor):
+        def cache_embedding(self, text: str, embedding: np.ndarray):
+            if text == "q3":
+                raise RuntimeError("cache plein")
+            super().cache_embedding(text, embedding)
+
+    batcher = EmbeddingBatcher(FailingPreprocessor(), max_wait_ms=200, max_batch_size=8,
+                               encode=lambda texts: stub_encode(texts, 0.02))
+    texts = [f"q{i}" for i in range(6)]
+    errors = collect_errors(batcher, texts)
+    failed = [text for text, error in zip(texts, errors) if error is not None]
+    assert "q3" in failed and set(errors) - {None} == {"cache plein"}, errors
+    assert np.array_equal(batcher.embed("après", timeout=5)[0], vector("après"))
+    batcher.stop()
+    print("Requêtes sans vecteur averties de l'erreur: OK")
+
+def test_thread_survives_errors():
+    """Une erreur dans la boucle du thread n'arrête pas le regroupement des requêtes suivantes."""
+    batcher = EmbeddingBatcher(StubPreprocessor(), max_wait_ms=1, encode=stub_encode)
+    collect = batcher._collect
+    calls = []
+
+    def failing_collect(first):
+        calls.append(first[0])
+        if len(calls) == 1:
+            raise RuntimeError("file corrompue")
+        return collect(first)
+
+    batcher._collect = failing_collect
+    try:
+        batcher.embed("avant", timeout=5)
+    except RuntimeError as e:
+        assert str(e) == "file corrompue"
+    else:
+        raise AssertionError("Erreur du thread ignorée")
+    assert batcher._thread.is_alive()
+    assert np.array_equal(batcher.embed("après", timeout=5)[0], vector("après"))
+    batcher.stop()
+    print("Thread de regroupement actif après une erreur: OK")
+
+def test_embed_after_stop():
+    """Après `stop`, `embed` échoue immédiatement au lieu d'attendre un thread arrêté."""
+    batcher = EmbeddingBatcher(StubPreprocessor(), encode=stub_encode)
+    batcher.stop()
+    batcher.stop()  # Deuxième arrêt sans effet
+    start_time = time.perf_counter()
+    try:
+        batcher.embed("question")
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Requête acceptée après l'arrêt")
+    assert time.perf_counter() - start_time < 1
+    print("Requête refusée après l'arrêt: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Micro-Batching des Embeddings ===")
+    test_concurrent_callers()
+    test_exception_propagation()
+    test_adaptive_batch_size()
+    test_stop()
+    test_partial_failures()
+    test_thread_survives_errors()
+    test_embed_after_stop()
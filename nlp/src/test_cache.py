@@ -1,13 +1,79 @@
 import pandas as pd
+import numpy as np
 import time
 import logging
 from pathlib import Path
+from unittest import mock
 from tqdm import tqdm
 from src.answer_finder import AnswerFinder
+from src.cache import LRUCache, estimate_size
 from src.config import DATA_DIR
 
 logger = logging.getLogger(__name__)
 
+class FakeClock:
+    """Horloge monotone contrôlée par le test (remplace time.monotonic dans src.cache)."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_lru_eviction_order():
+    """Au-delà de max_entries, l'entrée la moins récemment utilisée (lecture ou écriture) est évincée."""
+    cache = LRUCache(max_entries=3, max_bytes=None, ttl=None)
+    for key in 'abc':
+        cache.set(key, key.upper())
+    assert cache.get('a') == 'A'  # 'a' devient la plus récente
+    cache.set('d', 'D')
+    assert 'b' not in cache and all(key in cache for key in 'acd')
+    cache.set('c', 'C2')  # Remplacer une entrée la rend la plus récente, sans éviction
+    cache.set('e', 'E')
+    assert 'a' not in cache and cache.get('c') == 'C2' and len(cache) == 3
+    assert cache.get_stats()['evictions'] == 2
+    print("Ordre d'éviction LRU: OK")
+
+def test_lru_byte_cap():
+    """Le total estimé des entrées ne dépasse jamais max_bytes ; une entrée trop grande n'est pas gardée."""
+    vector = np.zeros(256, dtype=np.float32)
+    entry_size = estimate_size('k0') + estimate_size(vector)
+    cache = LRUCache(max_entries=100, max_bytes=3 * entry_size, ttl=None)
+    for i in range(10):
+        cache.set(f"k{i}", vector.copy())
+        assert cache.get_stats()['bytes'] <= cache.max_bytes
+    assert len(cache) == 3 and all(f"k{i}" in cache for i in (7, 8, 9))
+    assert cache.get_stats()['evictions'] == 7
+
+    cache.set('big', np.zeros(10000, dtype=np.float32))
+    assert 'big' not in cache and len(cache) == 3, "Une entrée plus grande que max_bytes ne doit pas vider le cache"
+    cache.clear()
+    assert len(cache) == 0 and cache.get_stats()['bytes'] == 0
+    print("Limite en octets: OK")
+
+def test_lru_ttl_and_counters():
+    """Entrées expirées jamais renvoyées, purgées aux écritures, et compteurs hits/misses/expirations."""
+    clock = FakeClock()
+    with mock.patch('src.cache.time.monotonic', clock):
+        cache = LRUCache(max_entries=100, max_bytes=None, ttl=10)
+        cache.set('a', 1)
+        clock.now += 5
+        cache.set('b', 2)
+        assert cache.get('a') == 1 and cache.get('missing') is None
+
+        clock.now += 6  # 'a' expirée (11 s), 'b' encore valide (6 s)
+        assert 'a' not in cache and 'b' in cache
+        assert cache.get('a', 'défaut') == 'défaut'
+        assert cache.get('b') == 2
+
+        clock.now += 5  # 'b' expirée ; l'écriture suivante purge sans lecture
+        cache.set('c', 3)
+        assert len(cache) == 1 and cache.get('c') == 3
+
+        stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['evictions']) == (3, 2, 2, 0), stats
+    assert stats['hit_rate'] == 3 / 5
+    print("TTL et compteurs: OK")
+
 def test_cache_performance():
     """Teste les performances du cache avec différentes configurations."""
     # Charger les questions
@@ -89,11 +155,15 @@ def optimize_cache():
     
     # 4. Stratégies de cache
     print("\n4. Stratégies de cache avancées:")
-    print("- Implémenter un cache à deux niveaux (mémoire + disque)")
+    print("- Cache à deux niveaux (mémoire + disque) : activer EMBEDDING_STORE_ENABLED")
+    print("- Utiliser EMBEDDING_STORE_DTYPE = 'float16' pour diviser la taille du cache disque par deux")
     print("- Utiliser un cache distribué pour les déploiements multiples")
     print("- Mettre en cache les résultats par catégorie")
 
 if __name__ == "__main__":
     print("=== Test des Performances du Cache ===")
+    test_lru_eviction_order()
+    test_lru_byte_cap()
+    test_lru_ttl_and_counters()
     test_cache_performance()
     optimize_cache() 
\ No newline at end of file
@@ -0,0 +1,32 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from src.config import DATA_DIR
+from src.distill import build_corpus
+from src.normalization import normalize_questions
+
+def test_corpus_excludes_test_questions():
+    """Le corpus de distillation ne contient aucune question de test, même présente dans la base FAQ."""
+    corpus = build_corpus(augment=False)
+    test_questions = set(normalize_questions(pd.read_csv(DATA_DIR / "test_questions.csv")['question'].dropna()))
+    assert corpus and not test_questions & set(corpus)
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        pd.DataFrame({'question': ["Comment ouvrir un compte ?", "Bonjour", "Quel est mon solde ?", None],
+                      'Categorie': ['Compte', 'Salutation', 'Compte', 'Autre']}) \
+            .to_csv(directory / "faqs_clean.csv", index=False)
+        with mock.patch('src.distill.DATA_DIR', directory):
+            assert len(build_corpus(augment=False)) == 3
+            pd.DataFrame({'question': ["quel est mon solde", "Question absente de la base"]}) \
+                .to_csv(directory / "test_questions.csv", index=False)
+            corpus = build_corpus(augment=False)
+        assert corpus == normalize_questions(["Comment ouvrir un compte ?", "Bonjour"])
+    print("Questions de test exclues du corpus de distillation: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Corpus de Distillation ===")
+    test_corpus_excludes_test_questions()
@@ -0,0 +1,163 @@
+import multiprocessing
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from src.embedding_store import EmbeddingStore, _HEADER
+
+DIM = 8
+FINGERPRINT = "test-store"
+
+def vectors(texts, offset: float = 0.0) -> np.ndarray:
+    """Vecteurs déterministes propres à chaque texte."""
+    return np.array([[len(text) + offset + i for i in range(DIM)] for text in texts], dtype=np.float32)
+
+def _child_put(store_dir: str, texts):
+    EmbeddingStore(FINGERPRINT, DIM, store_dir=Path(store_dir)).put_many(texts, vectors(texts))
+
+def _child_get(store_dir: str, texts, queue):
+    embeddings, found = EmbeddingStore(FINGERPRINT, DIM, store_dir=Path(store_dir)).get_many(texts)
+    queue.put((embeddings, found))
+
+def test_cross_process():
+    """Écritures d'un processus lues par un autre, et par une instance ouverte avant ces écritures."""
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = EmbeddingStore(FINGERPRINT, DIM, store_dir=Path(store_dir))
+        child_texts = [f"enfant {i}" for i in range(50)]
+        process = context.Process(target=_child_put, args=(store_dir, child_texts))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+        embeddings, found = store.get_many(child_texts + ["absent"])
+        assert found.tolist() == [True] * 50 + [False]
+        assert np.array_equal(embeddings[:50], vectors(child_texts))
+
+        parent_texts = ["parent a", "parent b"]
+        store.put_many(parent_texts, vectors(parent_texts))
+        store.put_many(parent_texts, vectors(parent_texts, offset=100))  # Déjà présents : ignorés
+        queue = context.Queue()
+        process = context.Process(target=_child_get, args=(store_dir, parent_texts + child_texts[:3], queue))
+        process.start()
+        embeddings, found = queue.get(timeout=60)
+        process.join()
+        assert found.all()
+        assert np.array_equal(embeddings, vectors(parent_texts + child_texts[:3]))
+        assert len(store) == 52
+    print("Lecture et écriture entre processus: OK")
+
+def test_header_mismatch():
+    """Un fichier d'une autre dimension, d'un autre type ou sans la bonne signature est refusé."""
+    with tempfile.TemporaryDirectory() as store_dir:
+        store_dir = Path(store_dir)
+        store = EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir)
+        store.put_many(["a"], vectors(["a"]))
+
+        # Même nom de fichier (empreinte, type), dimension différente
+        try:
+            EmbeddingStore(FINGERPRINT, DIM * 2, store_dir=store_dir)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Dimension différente acceptée")
+
+        header = bytearray(store.path.read_bytes())
+        header[:8] = b"NOTEMB00"
+        store.path.write_bytes(bytes(header))
+        try:
+            EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Signature invalide acceptée")
+    print("En-tête incompatible refusé: OK")
+
+def test_truncated_tail():
+    """Un enregistrement incomplet en fin de fichier est ignoré à la lecture et coupé avant l'ajout suivant."""
+    with tempfile.TemporaryDirectory() as store_dir:
+        store_dir = Path(store_dir)
+        store = EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir)
+        first = [f"q{i}" for i in range(10)]
+        store.put_many(first, vectors(first))
+        itemsize = store._record_dtype.itemsize
+
+        # Écriture interrompue : un enregistrement écrit à moitié
+        with open(store.path, 'ab') as f:
+            f.write(b"\x01" * (itemsize // 2))
+
+        reader = EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir)
+        assert len(reader) == 10
+        embeddings, found = reader.get_many(first)
+        assert found.all() and np.array_equal(embeddings, vectors(first))
+
+        second = [f"r{i}" for i in range(10)]
+        reader.put_many(second, vectors(second))
+        size = store.path.stat().st_size
+        assert (size - _HEADER.size) % itemsize == 0, "Fichier désaligné après l'ajout"
+        assert size == _HEADER.size + 20 * itemsize
+
+        # Les ajouts après la coupure sont lus correctement, y compris par une instance plus ancienne
+        for instance in (store, EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir)):
+            embeddings, found = instance.get_many(first + second)
+            assert found.all(), "Entrées perdues après un enregistrement incomplet"
+            assert np.array_equal(embeddings, vectors(first + second))
+    print("Enregistrement incomplet en fin de fichier: OK")
+
+def test_rotation():
+    """Au-delà de max_entries, le fichier est remplacé par les vecteurs récents ; chaque instance le suit."""
+    with tempfile.TemporaryDirectory() as store_dir:
+        store_dir = Path(store_dir)
+        store = EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir, max_entries=10)
+        reader = EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir, max_entries=10)
+        old = [f"ancien {i}" for i in range(8)]
+        new = [f"nouveau {i}" for i in range(5)]
+        store.put_many(old, vectors(old))
+        assert reader.get_many(old)[1].all()
+
+        store.put_many(new, vectors(new))  # 8 + 5 > 10 : rotation, 5 anciens gardés
+        assert len(store) == 10 and store.path.stat().st_size == _HEADER.size + 10 * store._record_dtype.itemsize
+        assert [p.name for p in store_dir.iterdir()] == [store.path.name], "Fichier temporaire restant"
+        for instance in (store, reader, EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir, max_entries=10)):
+            embeddings, found = instance.get_many(old[3:] + new)
+            assert found.all() and np.array_equal(embeddings, vectors(old[3:] + new))
+        assert not store.get_many(old[:3])[1].any()
+        assert len(reader) == 10
+
+        for i in range(30):
+            store.put_many([f"q{i}"], vectors([f"q{i}"]))
+            assert len(store) <= 10 and len(store._index) <= 10
+        assert store.get_many(["q29"])[1].all()
+
+        # Un lot plus grand que la borne ne garde que ses derniers vecteurs
+        many = [f"lot {i}" for i in range(15)]
+        store.put_many(many, vectors(many))
+        assert len(store) == 10 and store.get_many(many[5:])[1].all() and not store.get_many(many[:5])[1].any()
+    print("Rotation du fichier au-delà de max_entries: OK")
+
+def test_miss_without_reopen():
+    """Une clé absente ne rouvre pas le fichier tant qu'il n'a ni grandi ni changé."""
+    with tempfile.TemporaryDirectory() as store_dir:
+        store_dir = Path(store_dir)
+        store = EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir)
+        store.put_many(["a"], vectors(["a"]))
+        with mock.patch.object(EmbeddingStore, '_refresh', autospec=True, side_effect=EmbeddingStore._refresh) as refresh:
+            for _ in range(100):
+                assert not store.get_many(["absent", "a"])[1][0]
+            assert refresh.call_count == 0
+
+            EmbeddingStore(FINGERPRINT, DIM, store_dir=store_dir).put_many(["absent"], vectors(["absent"]))
+            refresh.reset_mock()
+            assert store.get_many(["absent"])[1].all()
+            assert refresh.call_count == 1
+    print("Clé absente sans relecture du fichier: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Cache Disque des Embeddings ===")
+    test_cross_process()
+    test_header_mismatch()
+    test_truncated_tail()
+    test_rotation()
+    test_miss_without_reopen()
@@ -0,0 +1,252 @@
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from src.batcher import EmbeddingBatcher
+from src.cache import LRUCache
+from src.config import RANDOM_STATE
+from src.engine import FAQEngine
+from src.model import FAQClassifier
+from src.normalization import normalize_question
+
+DIM = 8
+INDEX_PATHS = [Path("faq_index.faiss")]
+
+class StubPreprocessor:
+    """Encodeur minimal : vecteurs déterministes, compte les questions encodées."""
+    def __init__(self):
+        self.model = SimpleNamespace(config=SimpleNamespace(hidden_size=DIM))
+        self.embedding_store = None
+        self.cached = {}
+        self.encoded = []
+
+    def cache_key(self, question: str) -> str:
+        return normalize_question(question)
+
+    def get_cached_embedding(self, question: str):
+        return self.cached.get(self.cache_key(question))
+
+    def cache_embedding(self, question: str, embedding: np.ndarray):
+        self.cached[self.cache_key(question)] = embedding
+
+    def embed_batch(self, questions):
+        self.encoded.extend(questions)
+        return np.stack([np.full(DIM, len(question), dtype=np.float32) for question in questions])
+
+class StubClassifier:
+    """Classifieur dont la prédiction indique sa version."""
+    def __init__(self, version: int):
+        self.version = version
+        self.encoder_fingerprint = None
+        self.keyword_matcher = SimpleNamespace(match=lambda question: None)
+
+    def predict_with_confidence(self, embeddings, threshold=None, questions=None):
+        return [{'category': 'Compte', 'is_confiant': True, 'classifier': self.version} for _ in embeddings]
+
+class StubAnswerFinder:
+    """Chercheur de réponses dont la réponse indique la version de l'index."""
+    def __init__(self, version: int):
+        self.version = version
+
+    def artifact_paths(self):
+        return INDEX_PATHS
+
+    def find_best_answer_from_embedding(self, embedding, category, min_similarity, other_categories=False):
+        return {'answer': f"réponse {category}", 'index': self.version}
+
+    def find_best_answers_batch(self, embeddings, categories, min_similarity=0.7, other_categories=None):
+        return [{'answer': f"réponse {category}", 'index': self.version} for category in categories]
+
+    def keyword_answer(self, question, category):
+        return None  # Pas de réponse fixe : la question passe par le classifieur
+
+class Artifacts:
+    """Versions des fichiers du classifieur et des index, modifiables par le test."""
+    def __init__(self):
+        self.classifier = "c1"
+        self.index = "i1"
+
+    def version(self, paths) -> str:
+        return self.index if list(paths) == INDEX_PATHS else self.classifier
+
+def make_engine(artifacts: Artifacts) -> FAQEngine:
+    """Moteur assemblé sans charger de modèle."""
+    engine = FAQEngine.__new__(FAQEngine)
+    engine.faq_data_path = None
+    engine.preprocessor = StubPreprocessor()
+    engine.encoder_fingerprint = "encodeur"
+    engine.classifier = StubClassifier(1)
+    engine.classifier_version = artifacts.classifier
+    engine.fused = None
+    engine.answer_finder = StubAnswerFinder(1)
+    engine.index_version = artifacts.index
+    engine.early_exit = None
+    engine.batcher = None
+    engine.response_cache = LRUCache(max_entries=100)
+    engine._reload_lock = threading.Lock()
+    engine._next_check = time.monotonic() + 3600
+    return engine
+
+def test_response_cache_hit_key():
+    """`predict` et `predict_batch` indiquent tous deux si la réponse vient du cache de réponses."""
+    with mock.patch('src.engine.artifact_version', Artifacts().version):
+        engine = make_engine(Artifacts())
+        assert engine.predict("Ouvrir un compte ?")['response_cache_hit'] is False
+        results = engine.predict_batch(["Ouvrir un compte ?", "Carte bloquée ?"])
+        assert [result['response_cache_hit'] for result in results] == [True, False]
+        assert all(result['response_cache_hit'] for result in engine.predict_batch(["Carte bloquée ?"]))
+        assert engine.predict("Carte bloquée ?")['response_cache_hit'] is True
+        assert engine.preprocessor.encoded == ["Ouvrir un compte ?", "Carte bloquée ?"]
+    print("Clé response_cache_hit dans predict et predict_batch: OK")
+
+def test_response_cache_invalidation():
+    """Après le rechargement de l'index ou du classifieur, aucune réponse de l'ancienne version n'est servie."""
+    artifacts = Artifacts()
+    with mock.patch('src.engine.artifact_version', artifacts.version), \
+            mock.patch('src.engine.AnswerFinder', lambda *args, **kwargs: StubAnswerFinder(2)), \
+            mock.patch('src.engine.FAQClassifier.load', lambda *args, **kwargs: StubClassifier(2)), \
+            mock.patch.object(FAQEngine, '_load_fused', lambda self: None):
+        engine = make_engine(artifacts)
+        question = "Ouvrir un compte ?"
+        assert engine.predict(question)['answer']['index'] == 1
+        assert engine.predict(question)['response_cache_hit']
+
+        # Nouveaux index FAISS sur disque
+        artifacts.index = "i2"
+        assert engine.check_artifacts(force=True)
+        assert len(engine.response_cache) == 0
+        result = engine.predict(question)
+        assert not result['response_cache_hit'] and result['answer']['index'] == 2
+        assert engine.index_version == "i2"
+
+        # Nouveau classifieur sur disque
+        artifacts.classifier = "c2"
+        assert engine.check_artifacts(force=True)
+        result = engine.predict_batch([question])[0]
+        assert not result['response_cache_hit'] and result['prediction']['classifier'] == 2
+
+        # Même sans vider le cache, une version différente change la clé
+        engine.response_cache.set(engine._response_key(question, 0.7, None),
+                                  {'prediction': {'classifier': 'périmé'}, 'answer': {}})
+        engine.classifier_version = "c3"
+        assert not engine.predict(question)['response_cache_hit']
+        assert not engine.check_artifacts(force=False)
+    print("Cache de réponses invalidé après rechargement des artefacts: OK")
+
+def trained_classifier() -> FAQClassifier:
+    """Vrai FAQClassifier (règles de mot-clé comprises), entraîné sur des embeddings synthétiques."""
+    categories = ['Autre', 'Compte', 'Générale', 'Prépayée', 'Salutation', 'Sécurité', 'Transaction']
+    rng = np.random.default_rng(RANDOM_STATE)
+    y = np.repeat(np.arange(len(categories)), [60, 70, 150, 385, 30, 120, 230])
+    X = rng.standard_normal((len(categories), DIM)).astype(np.float32)[y] \
+        + rng.standard_normal((len(y), DIM)).astype(np.float32)
+    classifier = FAQClassifier()
+    classifier.train(X, y, LabelEncoder().fit(categories))
+    return classifier
+
+def test_keyword_rules_in_response_key():
+    """Même question normalisée, règles de mot-clé différentes sur le texte brut : pas de réponse partagée."""
+    pairs = [("Pouvez-vous bloquer ma carte ?", "bloquer ma carte"),
+             ("Je souhaite faire un virement", "faire un virement")]
+    classifier = trained_classifier()
+    with mock.patch('src.engine.artifact_version', Artifacts().version):
+        for batch in (False, True):
+            engine = make_engine(Artifacts())
+            engine.classifier = classifier
+            for raw, bare in pairs:
+                assert normalize_question(raw) == normalize_question(bare)
+                expected = [classifier.keyword_matcher.match(raw), classifier.keyword_matcher.match(bare)]
+                assert expected[0] != expected[1] and None not in expected
+                for order in ([raw, bare], [bare, raw]):
+                    engine.response_cache.clear()
+                    if batch:
+                        results = engine.predict_batch(order)
+                    else:
+                        results = [engine.predict(question) for question in order]
+                    categories = [result['prediction']['category'] for result in results]
+                    assert categories == [classifier.keyword_matcher.match(q) for q in order], categories
+                    assert not any(result['response_cache_hit'] for result in results)
+                    assert [result['answer']['answer'] for result in results] == \
+                        [f"réponse {category}" for category in categories]
+                assert engine.predict(raw)['response_cache_hit'] and engine.predict(bare)['response_cache_hit']
+    print("Règle de mot-clé du texte brut dans la clé du cache de réponses: OK")
+
+def test_cached_response_copies():
+    """Modifier un résultat retourné ne modifie pas l'entrée du cache de réponses."""
+    with mock.patch('src.engine.artifact_version', Artifacts().version):
+        engine = make_engine(Artifacts())
+        first = engine.predict("Ouvrir un compte ?")
+        first['prediction']['category'] = "modifiée"
+        first['answer']['answer'] = "modifiée"
+        second = engine.predict("Ouvrir un compte ?")
+        assert second['response_cache_hit']
+        assert second['prediction']['category'] == 'Compte' and second['answer']['answer'] == "réponse Compte"
+        second['answer']['answer'] = "modifiée"
+        third = engine.predict_batch(["Ouvrir un compte ?"])[0]
+        assert third['response_cache_hit'] and third['answer']['answer'] == "réponse Compte"
+    print("Copies des réponses mises en cache: OK")
+
+class StubFused:
+    """Modèle fusionné minimal : probabilités brutes d'une seule catégorie, compte les textes encodés."""
+    def __init__(self, classes, category: str):
+        self.classes = list(classes)
+        self.category = category
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        probas = np.zeros((len(texts), len(self.classes)), dtype=np.float32)
+        probas[:, self.classes.index(self.category)] = 1
+        return np.ones((len(texts), DIM), dtype=np.float32), probas
+
+class StubStore:
+    """Store disque contenant une seule question (normalisée)."""
+    def __init__(self, text: str):
+        self.text = text
+
+    def get_many(self, texts):
+        found = np.array([text == self.text for text in texts])
+        return np.where(found[:, None], 2.0, 0.0).astype(np.float32) * np.ones((len(texts), DIM), np.float32), found
+
+    def put_many(self, texts, embeddings):
+        pass
+
+def test_micro_batching_fused_probas():
+    """Avec le micro-batching, les probabilités du modèle fusionné servent sans repasser par la tête."""
+    classifier = trained_classifier()
+    question, stored = "Combien de temps faut-il ?", "Que faire maintenant ?"
+    assert classifier.keyword_matcher.match(question) is None and classifier.keyword_matcher.match(stored) is None
+    with mock.patch('src.engine.artifact_version', Artifacts().version):
+        engine = make_engine(Artifacts())
+        engine.classifier = classifier
+        engine.fused = StubFused(classifier.label_encoder.classes_, 'Salutation')
+        engine.preprocessor.embedding_store = StubStore(normalize_question(stored))
+        engine.batcher = EmbeddingBatcher(engine.preprocessor, max_wait_ms=1, encode=engine._encode)
+        try:
+            with mock.patch.object(classifier, 'predict_proba', side_effect=AssertionError("tête recalculée")):
+                result = engine.predict(question)
+            assert result['prediction']['category'] == 'Salutation'
+            assert engine.fused.encoded == [normalize_question(question)]
+
+            # Embedding lu sur disque : pas de probabilités fusionnées, la tête les calcule
+            with mock.patch.object(classifier, 'predict_proba', wraps=classifier.predict_proba) as predict_proba:
+                result = engine.predict(stored)
+            assert predict_proba.call_count == 1 and engine.fused.encoded == [normalize_question(question)]
+            assert result['prediction']['category'] == classifier.predict_with_confidence(
+                np.full((1, DIM), 2.0, dtype=np.float32), questions=[stored])[0]['category']
+        finally:
+            engine.batcher.stop()
+    print("Probabilités du modèle fusionné avec le micro-batching: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Cache de Réponses du Moteur ===")
+    test_response_cache_hit_key()
+    test_response_cache_invalidation()
+    test_keyword_rules_in_response_key()
+    test_cached_response_copies()
+    test_micro_batching_fused_probas()
@@ -0,0 +1,102 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+from sklearn.preprocessing import LabelEncoder
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import CamembertConfig, CamembertModel, PreTrainedTokenizerFast
+
+from src.config import RANDOM_STATE
+from src.data_preprocessing import encode_texts
+from src.fused_model import FusedModel
+from src.model import FAQClassifier
+
+CATEGORIES = ['Autre', 'Compte', 'Générale', 'Prépayée', 'Salutation', 'Sécurité', 'Transaction']
+WORDS = ("comment ouvrir un compte bloquer ma carte faire virement quel est le solde de mon "
+         "prépayée recharger bonjour merci code secret perdu où trouver agence horaires").split()
+HIDDEN_SIZE = 32
+
+def tiny_encoder():
+    """CamemBERT minuscule (poids aléatoires) et son tokenizer mot à mot, sans téléchargement."""
+    vocab = {'<pad>': 0, '<s>': 1, '</s>': 2, '<unk>': 3}
+    vocab.update({word: i for i, word in enumerate(sorted(set(WORDS)), start=len(vocab))})
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token='<unk>'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single='<s> $A </s>', special_tokens=[('<s>', 1), ('</s>', 2)]
+    )
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token='<pad>', unk_token='<unk>',
+                                        bos_token='<s>', eos_token='</s>')
+    torch.manual_seed(RANDOM_STATE)
+    config = CamembertConfig(vocab_size=len(vocab), hidden_size=HIDDEN_SIZE, num_hidden_layers=2,
+                             num_attention_heads=4, intermediate_size=64, max_position_embeddings=160,
+                             pad_token_id=0)
+    return CamembertModel(config).eval(), tokenizer
+
+def trained_head(seed: int):
+    """Tête d'un FAQClassifier entraîné sur des embeddings synthétiques de l'encodeur minuscule."""
+    rng = np.random.default_rng(seed)
+    y = np.repeat(np.arange(len(CATEGORIES)), 30)
+    X = rng.standard_normal((len(CATEGORIES), HIDDEN_SIZE)).astype(np.float32)[y] \
+        + rng.standard_normal((len(y), HIDDEN_SIZE)).astype(np.float32)
+    classifier = FAQClassifier()
+    classifier.train(X, y, LabelEncoder().fit(CATEGORIES))
+    return classifier.head
+
+def random_texts(n: int, seed: int = 0) -> list:
+    """Questions de 1 à 40 mots (dont des mots inconnus), pour varier les longueurs dans un lot."""
+    rng = np.random.default_rng(seed)
+    words = WORDS + ['inconnu', 'xyz']
+    return [' '.join(rng.choice(words, size=rng.integers(1, 41))) for _ in range(n)]
+
+def test_parity():
+    """Export, chargement puis `encode` : mêmes embeddings et probabilités que l'encodeur suivi de la tête."""
+    model, tokenizer = tiny_encoder()
+    head = trained_head(RANDOM_STATE)
+    texts = random_texts(37) + ["bonjour", "comment ouvrir un compte", ""]
+    with tempfile.TemporaryDirectory() as directory:
+        FusedModel.export(model, tokenizer, head, "tiny", 'float32', Path(directory))
+        fused = FusedModel.load(tokenizer, "tiny", head, Path(directory))
+    assert fused is not None and fused.classes == CATEGORIES and fused.hidden_size == HIDDEN_SIZE
+
+    for batch_size in (1, 3, 16, 64):
+        expected = encode_texts(model, tokenizer, torch.device('cpu'), texts, batch_size=batch_size)
+        embeddings, probas = fused.encode(texts, batch_size=batch_size)
+        assert embeddings.shape == (len(texts), HIDDEN_SIZE) and probas.shape == (len(texts), len(CATEGORIES))
+        assert embeddings.dtype == probas.dtype == np.float32
+        assert np.allclose(embeddings, expected, atol=1e-5), \
+            f"Écart maximal embeddings (lots de {batch_size}): {np.abs(embeddings - expected).max():.2e}"
+        expected_probas = head.predict_proba(expected)
+        assert np.allclose(probas, expected_probas, atol=1e-5), \
+            f"Écart maximal probabilités (lots de {batch_size}): {np.abs(probas - expected_probas).max():.2e}"
+        assert np.array_equal(probas.argmax(axis=1), expected_probas.argmax(axis=1))
+
+    empty_embeddings, empty_probas = fused.encode([])
+    assert empty_embeddings.shape == (0, HIDDEN_SIZE) and empty_probas.shape == (0, len(CATEGORIES))
+    print(f"Modèle fusionné identique à l'encodeur et à la tête sur {len(texts)} questions: OK")
+
+def test_stale_model():
+    """`load` ignore un modèle fusionné exporté pour un autre encodeur ou une autre tête."""
+    model, tokenizer = tiny_encoder()
+    head = trained_head(RANDOM_STATE)
+    other_head = trained_head(RANDOM_STATE + 1)
+    assert head.digest() != other_head.digest()
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        assert FusedModel.load(tokenizer, "tiny", head, directory) is None  # Pas encore exporté
+        FusedModel.export(model, tokenizer, head, "tiny", 'float32', directory)
+        assert FusedModel.load(tokenizer, "tiny", head, directory) is not None
+        assert FusedModel.load(tokenizer, "autre encodeur", head, directory) is None
+        assert FusedModel.load(tokenizer, "tiny", other_head, directory) is None
+        assert FusedModel.load(tokenizer, "tiny", None, directory) is None
+
+        # Archive illisible
+        FusedModel.path(directory).write_bytes(b"corrompu")
+        assert FusedModel.load(tokenizer, "tiny", head, directory) is None
+    print("Modèle fusionné périmé ou illisible ignoré: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Modèle Fusionné ===")
+    test_parity()
+    test_stale_model()
@@ -0,0 +1,79 @@
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from src.config import BASE_DIR, MODELS_DIR, RANDOM_STATE
+from src.inference_head import InferenceHead
+from src.model import FAQClassifier
+
+CATEGORIES = ['Autre', 'Compte', 'Générale', 'Prépayée', 'Salutation', 'Sécurité', 'Transaction']
+
+def check_parity(pipeline, head: InferenceHead, classifier: FAQClassifier, X: np.ndarray):
+    """Vérifie que la tête reproduit le pipeline au bit près (probabilités, température, classes)."""
+    expected = pipeline.predict_proba(X)
+    probas = head.predict_proba(X)
+    assert probas.dtype == expected.dtype, f"Types différents: {probas.dtype} / {expected.dtype}"
+    assert np.array_equal(probas, expected), f"Écart maximal: {np.abs(probas - expected).max()}"
+    assert np.array_equal(head.scale(probas), classifier._apply_temperature_scaling(expected))
+    assert np.array_equal(head.predict(X), pipeline.predict(X))
+
+def test_head_parity():
+    """Tête exportée à l'entraînement et relue depuis le disque : identique au pipeline sklearn."""
+    rng = np.random.default_rng(RANDOM_STATE)
+    label_encoder = LabelEncoder().fit(CATEGORIES)
+    y = np.repeat(np.arange(len(CATEGORIES)), 40)
+    centers = rng.standard_normal((len(CATEGORIES), 64)).astype(np.float32)
+    X = centers[y] + rng.standard_normal((len(y), 64)).astype(np.float32)
+
+    classifier = FAQClassifier()
+    classifier.train(X, y, label_encoder)
+    pipeline = classifier.model
+    X_test = rng.standard_normal((500, 64)).astype(np.float32) * 3
+
+    for inputs in (X_test, X_test.astype(np.float64), X_test[:1]):
+        check_parity(pipeline, classifier.head, classifier, inputs)
+
+    with tempfile.TemporaryDirectory() as directory:
+        classifier.save(directory)
+        loaded = FAQClassifier.load(directory)
+        assert loaded.head is not None and loaded._model is None, "Le pipeline ne doit pas être relu"
+        check_parity(pipeline, loaded.head, loaded, X_test)
+        assert loaded.class_names.tolist() == CATEGORIES
+        assert loaded.temperature == classifier.temperature
+    print("Parité de la tête exportée (entraînement et rechargement): OK")
+
+def test_saved_model_parity():
+    """Même vérification sur le classifieur sauvegardé dans MODELS_DIR, s'il existe."""
+    if not (MODELS_DIR / "classifier.joblib").exists():
+        print("Pas de classifier.joblib dans MODELS_DIR, test ignoré")
+        return
+    pipeline = joblib.load(MODELS_DIR / "classifier.joblib")
+    label_encoder = joblib.load(MODELS_DIR / "label_encoder.joblib")
+    classifier = FAQClassifier()
+    head = InferenceHead.from_mlp(pipeline.steps[-1][1], label_encoder.classes_.tolist(), classifier.temperature)
+    X = np.random.default_rng(RANDOM_STATE).standard_normal((1000, head.n_features)).astype(np.float32)
+    check_parity(pipeline, head, classifier, X)
+    print("Parité de la tête du classifieur sauvegardé: OK")
+
+def test_serving_imports():
+    """Le chemin de service (moteur, API) se charge sans sklearn, imblearn ni nlpaug."""
+    code = (
+        "import sys\n"
+        "for name in ('sklearn', 'imblearn', 'nlpaug'):\n"
+        "    sys.modules[name] = None\n"
+        "import src.engine, api.app\n"
+        "from src.inference_head import InferenceHead\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    print("Imports du chemin de service sans sklearn / imblearn / nlpaug: OK")
+
+if __name__ == "__main__":
+    print("=== Test de la Tête de Classification Exportée ===")
+    test_head_parity()
+    test_saved_model_parity()
+    test_serving_imports()
@@ -0,0 +1,111 @@
+import random
+import re
+
+import pandas as pd
+
+from src.config import DATA_DIR
+from src.keyword_matcher import KeywordMatcher
+from src.model import FAQClassifier
+
+def reference_match(rules: dict, text: str):
+    """
+    Parcours d'origine des règles (dans l'ordre, premier mot-clé trouvé),
+    avec une recherche par mot-clé limitée aux mots entiers.
+    """
+    text = text.lower().replace('’', "'")
+    for category, keywords in rules.items():
+        for keyword in keywords:
+            keyword = keyword.lower().replace('’', "'")
+            if keyword and re.search(r"(?<!\w)" + re.escape(keyword) + r"(?!\w)", text):
+                return category
+    return None
+
+def load_questions() -> list:
+    """Questions des fichiers CSV de data/."""
+    questions = []
+    for path in sorted(DATA_DIR.glob("*.csv")):
+        df = pd.read_csv(path)
+        if 'question' in df.columns:
+            questions.extend(df['question'].dropna().astype(str).tolist())
+    return questions
+
+def random_texts(rules: dict, n: int, seed: int = 0) -> list:
+    """Textes mêlant mots-clés de plusieurs règles, préfixes et suffixes accentués, ponctuation."""
+    keywords = [keyword for category_keywords in rules.values() for keyword in category_keywords]
+    affixes = ['', '', '', 'é', 'è', 's', 'in', 'dé', 'à', 'ç', '-', "'", '’', '_', '2']
+    separators = [' ', ' ', ', ', '. ', '?', "'", '’', '-', '\n', '']
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 5)):
+            word = rng.choice(keywords) if rng.random() < 0.7 else rng.choice(['la', 'ma carte', 'un', 'Où'])
+            if rng.random() < 0.3:
+                word = word.upper() if rng.random() < 0.5 else word.capitalize()
+            parts.append(rng.choice(affixes) + word + rng.choice(affixes))
+            parts.append(rng.choice(separators))
+        texts.append(''.join(parts))
+    return texts
+
+def test_parity():
+    """Même catégorie que le parcours des règles, sur les questions des données et des textes aléatoires."""
+    rules = FAQClassifier().keyword_rules
+    matcher = KeywordMatcher(rules)
+    questions = load_questions()
+    texts = questions + random_texts(rules, 20000)
+    different = [text for text in texts if matcher.match(text) != reference_match(rules, text)]
+    assert not different, f"Catégorie différente pour: {different[:5]}"
+    assert matcher.match_batch(texts[:500]) == [reference_match(rules, text) for text in texts[:500]]
+    matched = sum(matcher.match(text) is not None for text in texts)
+    print(f"Parité sur {len(questions)} questions et {len(texts) - len(questions)} textes aléatoires "
+          f"({matched} reconnus): OK")
+
+def test_overlapping_keywords():
+    """Quand plusieurs règles s'appliquent, la première règle l'emporte, quelle que soit la position."""
+    rules = {
+        'A': ['bleue', 'carte bleue volée'],
+        'B': ['carte bleue', 'carte'],
+        'C': ['carte', 'ma carte bleue'],
+    }
+    matcher = KeywordMatcher(rules)
+    cases = {
+        "ma carte bleue": 'A',  # 'bleue' (A) commence après 'carte bleue' (B) et 'ma carte bleue' (C)
+        "ma carte rouge": 'B',  # 'carte' dans B et C
+        "carte bleue volée": 'A',
+        "ma carte bleuet": 'B',  # 'bleue' n'est pas un mot entier
+        "MA CARTE BLEUE": 'A',
+        "rien": None,
+    }
+    for text, expected in cases.items():
+        assert matcher.match(text) == expected == reference_match(rules, text), text
+    assert KeywordMatcher({}).match("carte") is None
+    assert KeywordMatcher({'A': ['', None]}).categories == []
+    print("Mots-clés qui se chevauchent : première règle retenue: OK")
+
+def test_accented_word_boundaries():
+    """Un mot-clé ne correspond qu'à un mot entier, y compris à côté de lettres accentuées."""
+    matcher = KeywordMatcher({'Sécurité': ['vol', 'sécurité', 'activer'], 'Salutation': ["j'aimerais"]})
+    cases = {
+        "vol de carte": 'Sécurité',
+        "volontiers": None,
+        "on m'a volé ma carte": None,  # 'é' est une lettre : 'volé' n'est pas 'vol'
+        "envol": None,
+        "évol": None,
+        "vol.": 'Sécurité',
+        "l'insécurité": None,
+        "Sécurité ?": 'Sécurité',
+        "SÉCURITÉ": 'Sécurité',
+        "désactiver": None,
+        "ré-activer": 'Sécurité',  # Le tiret sépare les mots
+        "j’aimerais": 'Salutation',  # Apostrophe typographique
+        "J'AIMERAIS": 'Salutation',
+    }
+    for text, expected in cases.items():
+        assert matcher.match(text) == expected, f"{text!r}: {matcher.match(text)} au lieu de {expected}"
+    print("Limites de mots accentués: OK")
+
+if __name__ == "__main__":
+    print("=== Test des Règles de Mot-Clé ===")
+    test_parity()
+    test_overlapping_keywords()
+    test_accented_word_boundaries()
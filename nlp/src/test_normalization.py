@@ -0,0 +1,110 @@
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config import DATA_DIR
+from src.normalization import clean_text, normalize_question, clean_texts, normalize_questions
+
+def reference_clean_text(text: str) -> str:
+    """Version d'origine de clean_text (deux expressions successives)."""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def reference_normalize_question(question: str) -> str:
+    """Version d'origine de normalize_question (un re.sub par motif, puis clean_text)."""
+    patterns = [
+        r'^(quels sont|quelle est|comment|où|que faire|pourriez-vous|je souhaiterais|à propos de)\s+',
+        r'^(pouvez-vous|pourriez-vous|auriez-vous|serait-il possible)\s+',
+        r'^(je souhaite|je voudrais|j\'aimerais|je désire)\s+',
+        r'^(j\'ai besoin|il me faut|je cherche|je recherche)\s+',
+        r'^(je ne comprends pas|je ne sais pas|je suis perdu)\s+'
+    ]
+    for pattern in patterns:
+        question = re.sub(pattern, '', question.lower())
+    return reference_clean_text(question)
+
+def load_corpus() -> list:
+    """Tous les textes des fichiers CSV de data/ (questions, réponses, catégories)."""
+    texts = []
+    for path in sorted(DATA_DIR.glob("*.csv")):
+        df = pd.read_csv(path)
+        for column in df.columns:
+            if pd.api.types.is_string_dtype(df[column]):
+                texts.extend(df[column].dropna().astype(str).tolist())
+    return texts
+
+def random_texts(n: int, seed: int = 0) -> list:
+    """Textes aléatoires combinant préfixes, ponctuation, espaces et caractères Unicode."""
+    pieces = [
+        'Comment ', 'COMMENT  ', 'pouvez-vous ', 'Pourriez-vous ', "J'aimerais ", "j’aimerais ", 'je cherche\t',
+        'je ne sais pas ', 'où ', 'OÙ ', 'à propos de\n', 'quelle est', '?', '!! ', ' ', '  ', '_', '-', "'", '...',
+        'é', 'É', 'ß', 'İ', '́', '²', '½', '\xa0', ' ', '\x1c', '　', '٣', '🙂', 'carte', 'Compte', '1'
+    ]
+    rng = random.Random(seed)
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(0, 8))) for _ in range(n)]
+
+def test_parity():
+    """Mêmes résultats que les fonctions d'origine, sur les données et sur des textes aléatoires."""
+    corpus = load_corpus()
+    texts = corpus + random_texts(100000)
+    questions = [text for text in texts if reference_normalize_question(text) != normalize_question(text)]
+    cleaned = [text for text in texts if reference_clean_text(text) != clean_text(text)]
+    assert not questions, f"normalize_question diffère pour: {questions[:5]}"
+    assert not cleaned, f"clean_text diffère pour: {cleaned[:5]}"
+    print(f"Parité sur {len(corpus)} textes des données et {len(texts) - len(corpus)} textes aléatoires: OK")
+
+def test_batch_api():
+    """Versions par lot : même résultat que texte par texte, forme de l'entrée conservée."""
+    texts = load_corpus()[:2000] + ["", "Comment ?", "Comment ?"]
+    expected = [normalize_question(text) for text in texts]
+
+    assert normalize_questions(texts) == expected
+    assert normalize_questions(tuple(texts)) == expected
+    assert clean_texts(texts) == [clean_text(text) for text in texts]
+
+    array = np.array(texts, dtype=object)
+    assert normalize_questions(array).tolist() == expected
+    assert normalize_questions(array[:2000].reshape(40, 50)).ravel().tolist() == expected[:2000]
+
+    series = pd.Series(texts + [None, np.nan], index=np.arange(len(texts) + 2) * 3, name='question')
+    result = normalize_questions(series)
+    assert result.index.equals(series.index) and result.name == 'question'
+    assert result.tolist() == expected + ["", ""]
+    assert normalize_questions(series.astype('string')).dtype == 'string'
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("pyarrow absent, lots Arrow non testés")
+    else:
+        chunked = pa.chunked_array([texts[:1000], texts[1000:] + [None]])
+        assert normalize_questions(chunked).to_pylist() == expected + [""]
+    print("API par lot (liste, NumPy, pandas, Arrow): OK")
+
+def test_batch_speed():
+    """Compare `Series.apply(normalize_question)` d'origine et la version par lot sur 1 million de questions."""
+    corpus = load_corpus()
+    questions = pd.Series(np.random.default_rng(0).choice(np.array(corpus, dtype=object), 1_000_000))
+
+    start_time = time.perf_counter()
+    expected = questions.apply(reference_normalize_question)
+    apply_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    result = normalize_questions(questions)
+    batch_time = time.perf_counter() - start_time
+
+    assert result.equals(expected)
+    print(f"1 million de questions ({questions.nunique()} distinctes): apply {apply_time:.2f}s, "
+          f"par lot {batch_time:.2f}s")
+
+if __name__ == "__main__":
+    print("=== Test de la Normalisation des Questions ===")
+    test_parity()
+    test_batch_api()
+    test_batch_speed()
@@ -0,0 +1,126 @@
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from src.config import BASE_DIR
+from src.stage_cache import StageCache, file_digest
+
+def save_array(X: np.ndarray, path: Path):
+    np.save(path / "X.npy", X)
+
+def load_array(path: Path) -> np.ndarray:
+    return np.load(path / "X.npy")
+
+class Counter:
+    """Calcul d'une étape qui compte ses appels."""
+    def __init__(self, value: np.ndarray):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self) -> np.ndarray:
+        self.calls += 1
+        return self.value
+
+def test_keys():
+    """Une donnée, un paramètre ou une étape amont différents changent la clé ; l'ordre des paramètres non."""
+    with tempfile.TemporaryDirectory() as directory:
+        data = Path(directory) / "faqs.csv"
+        data.write_text("question,Categorie\nbonjour,Salutation\n", encoding='utf-8')
+        digest = file_digest(data)
+        key = StageCache.key('clean', {'data': digest, 'prefixes': ['comment']})
+        assert StageCache.key('clean', {'prefixes': ['comment'], 'data': digest}) == key
+        assert StageCache.key('augment', {'data': digest, 'prefixes': ['comment']}) != key
+        assert StageCache.key('clean', {'data': digest, 'prefixes': ['pourquoi']}) != key
+
+        data.write_text("question,Categorie\nbonsoir,Salutation\n", encoding='utf-8')
+        assert StageCache.key('clean', {'data': file_digest(data), 'prefixes': ['comment']}) != key
+
+    fit = StageCache.key('fit', {'mlp': {'alpha': 1e-4}}, ['a'])
+    assert StageCache.key('fit', {'mlp': {'alpha': 1e-4}}, ['a']) == fit
+    assert StageCache.key('fit', {'mlp': {'alpha': 1e-3}}, ['a']) != fit
+    assert StageCache.key('fit', {'mlp': {'alpha': 1e-4}}, ['b']) != fit
+    print("Clés des étapes: OK")
+
+def test_hit_and_miss():
+    """Une réexécution identique relit l'étape ; une autre clé la recalcule."""
+    with tempfile.TemporaryDirectory() as directory:
+        compute = Counter(np.arange(6.0))
+        cache = StageCache(Path(directory))
+        key = cache.key('embed', {'encoder': 'e1'})
+        first = cache.run('embed', key, compute, save_array, load_array)
+        second = StageCache(Path(directory)).run('embed', key, compute, save_array, load_array)
+        assert compute.calls == 1 and np.array_equal(first, second)
+
+        other = cache.key('embed', {'encoder': 'e2'})
+        cache.run('embed', other, compute, save_array, load_array)
+        cache.run('embed', key, compute, save_array, load_array)
+        assert compute.calls == 2
+        assert [run.hit for run in cache.runs] == [False, False, True]
+        assert sorted(p.name for p in (Path(directory) / 'embed').iterdir()) == sorted([key, other])
+        summary = cache.summary()
+        assert [stage['cache_hit'] for stage in summary['stages']] == [False, False, True]
+        assert "1/3 étapes relues depuis le cache" in cache.report()
+
+        # Cache désactivé : toujours recalculé, rien d'écrit
+        disabled = StageCache(Path(directory) / "off", enabled=False)
+        disabled.run('embed', key, compute, save_array, load_array)
+        assert compute.calls == 3 and not (Path(directory) / "off").exists()
+    print("Étape relue depuis le cache ou recalculée: OK")
+
+def test_interrupted_write():
+    """Une écriture interrompue avant le renommage ne laisse aucune entrée d'apparence valide."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = StageCache(Path(directory))
+        key = cache.key('resample', {'smote': None})
+
+        # Exception pendant l'écriture
+        def failing_save(X: np.ndarray, path: Path):
+            np.save(path / "X.npy", X)
+            raise RuntimeError("disque plein")
+        try:
+            cache.run('resample', key, Counter(np.ones(3)), failing_save, load_array)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("Erreur d'écriture ignorée")
+        assert list((Path(directory) / 'resample').iterdir()) == []
+
+        # Processus tué pendant l'écriture : le dossier temporaire reste, sans être pris pour l'étape
+        code = (
+            "import os, sys\n"
+            "from pathlib import Path\n"
+            "import numpy as np\n"
+            "from src.stage_cache import StageCache\n"
+            "def save(X, path):\n"
+            "    np.save(path / 'X.npy', X[:1])\n"
+            "    os._exit(1)\n"
+            "StageCache(Path(sys.argv[1])).run('resample', sys.argv[2], lambda: np.ones(3), save, None)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code, directory, key], cwd=BASE_DIR)
+        assert result.returncode == 1
+        leftovers = list((Path(directory) / 'resample').iterdir())
+        assert len(leftovers) == 1 and leftovers[0].name.startswith(f".{key}.")
+        assert not cache.path('resample', key).exists()
+
+        compute = Counter(np.ones(3))
+        X = cache.run('resample', key, compute, save_array, load_array)
+        assert compute.calls == 1 and not cache.runs[-1].hit and np.array_equal(X, np.ones(3))
+        X = cache.run('resample', key, compute, save_array, load_array)
+        assert compute.calls == 1 and cache.runs[-1].hit
+
+        # Entrée illisible : recalculée et remplacée
+        (cache.path('resample', key) / "X.npy").write_bytes(b"corrompu")
+        X = cache.run('resample', key, compute, save_array, load_array)
+        assert compute.calls == 2 and np.array_equal(load_array(cache.path('resample', key)), np.ones(3))
+        cache.run('resample', key, compute, save_array, load_array)
+        assert compute.calls == 2 and cache.runs[-1].hit
+    print("Écriture interrompue sans entrée valide: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Cache des Étapes d'Entraînement ===")
+    test_keys()
+    test_hit_and_miss()
+    test_interrupted_write()
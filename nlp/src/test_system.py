@@ -2,9 +2,7 @@ import pandas as pd
 import logging
 from pathlib import Path
 from src.config import DATA_DIR, MODELS_DIR
-from src.data_preprocessing import DataPreprocessor
-from src.model import FAQClassifier
-from src.answer_finder import AnswerFinder
+from src.engine import FAQEngine
 from src.utils import setup_logging
 
 def test_system():
@@ -18,28 +16,17 @@ def test_system():
     
     # Initialisation des composants
     logger.info("Initialisation des composants...")
-    preprocessor = DataPreprocessor()
-    classifier = FAQClassifier.load()
-    answer_finder = AnswerFinder()
+    engine = FAQEngine()
     
-    # Préparation des données
-    logger.info("Préparation des données...")
-    X_test, _ = preprocessor.prepare_data(test_df, augment=False)
+    # Prédictions et recherche des réponses (un seul encodage par question)
+    logger.info("Génération des prédictions et recherche des réponses...")
+    engine_results = engine.predict_batch(test_df['question'].tolist(), min_similarity=0.7)
     
-    # Prédictions
-    logger.info("Génération des prédictions...")
-    predictions = classifier.predict_with_confidence(X_test, questions=test_df['question'].tolist())
-    
-    # Recherche des réponses
-    logger.info("Recherche des réponses...")
     results = []
-    for i, (question, pred) in enumerate(zip(test_df['question'], predictions)):
-        # Recherche de la meilleure réponse
-        answer_result = answer_finder.find_best_answer(
-            question=question,
-            predicted_category=pred['category'],
-            min_similarity=0.7
-        )
+    for engine_result in engine_results:
+        question = engine_result['question']
+        pred = engine_result['prediction']
+        answer_result = engine_result['answer']
         
         # Préparation du résultat
         result = {
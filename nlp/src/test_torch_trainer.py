@@ -0,0 +1,156 @@
+import tempfile
+
+import numpy as np
+import torch
+from sklearn.preprocessing import LabelEncoder
+
+from src.config import RANDOM_STATE
+from src.inference_head import InferenceHead
+from src.model import FAQClassifier
+from src.torch_trainer import TorchMLPClassifier, balanced_class_weights
+
+CATEGORIES = ['Autre', 'Compte', 'Générale', 'Prépayée', 'Salutation', 'Sécurité', 'Transaction']
+# Effectifs déséquilibrés, compatibles avec la stratégie SMOTE du pipeline sklearn
+COUNTS = [60, 70, 150, 385, 30, 120, 230]
+
+def make_data(n_features: int = 768, seed: int = RANDOM_STATE):
+    """Embeddings synthétiques : une gaussienne par catégorie, classes déséquilibrées."""
+    rng = np.random.default_rng(seed)
+    y = np.repeat(np.arange(len(CATEGORIES)), COUNTS)
+    centers = rng.standard_normal((len(CATEGORIES), n_features)).astype(np.float32) * 0.15
+    X = centers[y] + rng.standard_normal((len(y), n_features)).astype(np.float32)
+    order = rng.permutation(len(y))
+    return X[order], y[order]
+
+def test_head_export():
+    """La tête exportée du MLP PyTorch reproduit ses probabilités au bit près, avant et après sauvegarde."""
+    X, y = make_data(n_features=64)
+    label_encoder = LabelEncoder().fit(CATEGORIES)
+    classifier = FAQClassifier()
+    classifier.backend = 'torch'
+    classifier.train(X, y, label_encoder)
+    pipeline = classifier.model
+    assert isinstance(pipeline.steps[-1][1], TorchMLPClassifier) and 'smote' not in pipeline.named_steps
+
+    X_test = np.random.default_rng(0).standard_normal((500, 64)).astype(np.float32) * 3
+    for inputs in (X_test, X_test.astype(np.float64)):
+        assert np.array_equal(classifier.head.predict_proba(inputs), pipeline.predict_proba(inputs))
+        assert np.array_equal(classifier.predict(inputs), pipeline.predict(inputs))
+
+    with tempfile.TemporaryDirectory() as directory:
+        classifier.save(directory)
+        loaded = FAQClassifier.load(directory)
+        assert loaded.head.digest() == classifier.head.digest()
+        assert np.array_equal(loaded.predict_proba(X_test), classifier.predict_proba(X_test))
+        assert loaded.class_names.tolist() == CATEGORIES
+        # Le pipeline sauvegardé (tableaux NumPy seulement) est relu sans réseau PyTorch
+        assert np.array_equal(loaded.model.predict_proba(X_test), pipeline.predict_proba(X_test))
+    print("Tête exportée du MLP PyTorch (entraînement et rechargement): OK")
+
+def test_deterministic():
+    """Même graine, mêmes données : mêmes poids."""
+    X, y = make_data(n_features=64)
+    first = InferenceHead.from_mlp(TorchMLPClassifier().fit(X, y), CATEGORIES)
+    second = InferenceHead.from_mlp(TorchMLPClassifier().fit(X, y), CATEGORIES)
+    assert first.digest() == second.digest()
+    print("Entraînement PyTorch reproductible: OK")
+
+def validation_loss(classifier: TorchMLPClassifier, X_val: np.ndarray, y_val: np.ndarray,
+                    y_train: np.ndarray) -> float:
+    """Perte d'entropie croisée pondérée (poids 'balanced' du jeu d'entraînement) des poids exposés."""
+    weights = balanced_class_weights(y_train, len(classifier.classes_))[y_val]
+    probas = classifier.predict_proba(X_val).astype(np.float64)
+    return float(np.sum(weights * -np.log(probas[np.arange(len(y_val)), y_val])) / np.sum(weights))
+
+def test_early_stopping_restores_best():
+    """L'arrêt anticipé garde les poids de l'époque de meilleure perte de validation, pas ceux de la dernière."""
+    X, y = make_data(n_features=64)
+    X, y = X[:300], y[:300]
+    classifier = TorchMLPClassifier(learning_rate_init=1e-2, n_iter_no_change=5, max_epochs=200).fit(X, y)
+    scores = classifier.validation_scores_
+    best_epoch = int(np.argmin(scores))
+    assert classifier.n_iter_ == len(scores) == best_epoch + 1 + classifier.n_iter_no_change < classifier.max_epochs
+    assert classifier.best_loss_ == scores[best_epoch] < scores[-1], "Aucune dégradation après la meilleure époque"
+
+    X_train, y_train, X_val, y_val = classifier._split(X, y)
+    restored = validation_loss(classifier, X_val, y_val, y_train)
+    assert abs(restored - classifier.best_loss_) < 1e-4, f"Poids restaurés: {restored} / {classifier.best_loss_}"
+    assert abs(restored - scores[-1]) > 1e-3
+    print(f"Arrêt anticipé à l'époque {classifier.n_iter_}, poids de l'époque {best_epoch + 1} restaurés: OK")
+
+def test_stratified_validation_split():
+    """Le jeu de validation garde chaque classe, même rare, dans ses proportions."""
+    X, y = make_data(n_features=8)
+    classifier = TorchMLPClassifier(validation_fraction=0.1)
+    X_train, y_train, X_val, y_val = classifier._split(X, y)
+    assert len(y_val) == int(np.ceil(len(y) * 0.1)) and len(y_train) + len(y_val) == len(y)
+    assert np.array_equal(np.unique(y_val), np.unique(y)), "Classe absente de la validation"
+    assert np.array_equal(np.unique(y_train), np.unique(y))
+    assert np.all(np.abs(np.bincount(y_val) - np.array(COUNTS) * 0.1) <= 1)
+
+    # Sans early stopping : tout sert à l'entraînement
+    X_train, y_train, X_val, y_val = TorchMLPClassifier(early_stopping=False)._split(X, y)
+    assert len(y_train) == len(y) and X_val is None and y_val is None
+    print("Validation stratifiée avec toutes les classes: OK")
+
+def test_sklearn_compatibility():
+    """predict / predict_proba : mêmes formes, classes et types que le backend sklearn."""
+    X, y = make_data(n_features=64)
+    label_encoder = LabelEncoder().fit(CATEGORIES)
+    X_test = np.random.default_rng(0).standard_normal((50, 64)).astype(np.float32)
+    outputs = {}
+    for backend in ('sklearn', 'torch'):
+        classifier = FAQClassifier()
+        classifier.backend = backend
+        classifier.train(X, y, label_encoder)
+        probas = classifier.model.predict_proba(X_test)
+        predictions = classifier.model.predict(X_test)
+        assert np.allclose(probas.sum(axis=1), 1.0, atol=1e-5)
+        outputs[backend] = (classifier.model.classes_, probas, predictions)
+
+    (sk_classes, sk_probas, sk_predictions), (classes, probas, predictions) = outputs['sklearn'], outputs['torch']
+    assert np.array_equal(classes, sk_classes)
+    assert probas.shape == sk_probas.shape == (len(X_test), len(CATEGORIES))
+    assert predictions.shape == sk_predictions.shape and predictions.dtype == sk_predictions.dtype
+    assert np.array_equal(predictions, classes[np.argmax(probas, axis=1)])
+
+    # Étiquettes textuelles, comme le MLPClassifier
+    labels = np.array(CATEGORIES)[y]
+    classifier = TorchMLPClassifier(max_epochs=5).fit(X, labels)
+    assert classifier.classes_.tolist() == sorted(CATEGORIES)
+    assert set(classifier.predict(X_test)) <= set(CATEGORIES)
+    assert classifier.predict_proba(X_test).shape == (50, len(CATEGORIES))
+    print("Sorties compatibles avec le backend sklearn: OK")
+
+def test_invalid_training():
+    """max_epochs < 1 et perte non finie : ValueError explicite, threads PyTorch rétablis."""
+    X, y = make_data(n_features=8)
+    threads = torch.get_num_threads()
+    for max_epochs in (0, -1):
+        try:
+            TorchMLPClassifier(max_epochs=max_epochs).fit(X, y)
+        except ValueError as e:
+            assert "max_epochs" in str(e)
+        else:
+            raise AssertionError(f"max_epochs={max_epochs} accepté")
+
+    X_nan = X.copy()
+    X_nan[3, 2] = np.nan
+    for early_stopping in (True, False):
+        try:
+            TorchMLPClassifier(early_stopping=early_stopping, max_epochs=3).fit(X_nan, y)
+        except ValueError as e:
+            assert "non finie" in str(e)
+        else:
+            raise AssertionError("Perte non finie acceptée")
+    assert torch.get_num_threads() == threads
+    print("Paramètres et pertes invalides refusés: OK")
+
+if __name__ == "__main__":
+    print("=== Test du Backend d'Entraînement PyTorch ===")
+    test_head_export()
+    test_deterministic()
+    test_early_stopping_restores_best()
+    test_stratified_validation_split()
+    test_sklearn_compatibility()
+    test_invalid_training()
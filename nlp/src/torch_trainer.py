@@ -0,0 +1,176 @@
+import copy
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.model_selection import train_test_split
+from torch.utils.data import BatchSampler, DataLoader, RandomSampler
+
+from src.config import (
+    HIDDEN_LAYERS, EARLY_STOPPING, VALIDATION_FRACTION, RANDOM_STATE, TORCH_BATCH_SIZE,
+    TORCH_LEARNING_RATE, TORCH_MAX_EPOCHS, TORCH_N_ITER_NO_CHANGE, TORCH_NUM_THREADS
+)
+from src.inference_head import InferenceHead
+from src.model import FAQDataset
+
+logger = logging.getLogger(__name__)
+
+def build_network(n_features: int, hidden_layer_sizes: Tuple[int, ...], n_classes: int) -> nn.Sequential:
+    """Même architecture que le MLPClassifier : couches linéaires et ReLU, logits en sortie."""
+    layers = []
+    sizes = [n_features, *hidden_layer_sizes]
+    for n_in, n_out in zip(sizes[:-1], sizes[1:]):
+        layers += [nn.Linear(n_in, n_out), nn.ReLU()]
+    layers.append(nn.Linear(sizes[-1], n_classes))
+    return nn.Sequential(*layers)
+
+def balanced_class_weights(y: np.ndarray, n_classes: int) -> np.ndarray:
+    """Poids n / (k · effectif) de chaque classe (comme class_weight='balanced' de sklearn)."""
+    counts = np.bincount(y, minlength=n_classes).astype(np.float64)
+    return len(y) / (n_classes * np.maximum(counts, 1))
+
+class TorchMLPClassifier(ClassifierMixin, BaseEstimator):
+    """
+    MLP de classification entraîné avec PyTorch, à utiliser à la place du
+    MLPClassifier de sklearn (CLASSIFIER_BACKEND = 'torch').
+
+    L'entraînement se fait par mini-lots (FAQDataset et DataLoader) sur tous
+    les cœurs, avec Adam ; le déséquilibre des classes est compensé par une
+    perte pondérée par classe plutôt que par SMOTE. Avec `early_stopping`,
+    une part stratifiée des données sert à la validation et les poids de la
+    meilleure époque sont gardés. Les poids appris sont exposés comme ceux
+    du MLPClassifier (`coefs_`, `intercepts_`, `activation`,
+    `out_activation_`, `classes_`) : `InferenceHead.from_mlp` exporte la même
+    tête de service, et l'estimateur sauvegardé ne contient que des tableaux
+    NumPy.
+    """
+
+    def __init__(self, hidden_layer_sizes: Tuple[int, ...] = HIDDEN_LAYERS, alpha: float = 1e-4,
+                 batch_size: int = TORCH_BATCH_SIZE, learning_rate_init: float = TORCH_LEARNING_RATE,
+                 max_epochs: int = TORCH_MAX_EPOCHS, class_weight: Optional[str] = 'balanced',
+                 early_stopping: bool = EARLY_STOPPING, validation_fraction: float = VALIDATION_FRACTION,
+                 n_iter_no_change: int = TORCH_N_ITER_NO_CHANGE, tol: float = 1e-4,
+                 num_threads: Optional[int] = TORCH_NUM_THREADS, random_state: Optional[int] = RANDOM_STATE):
+        self.hidden_layer_sizes = hidden_layer_sizes
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.learning_rate_init = learning_rate_init
+        self.max_epochs = max_epochs
+        self.class_weight = class_weight
+        self.early_stopping = early_stopping
+        self.validation_fraction = validation_fraction
+        self.n_iter_no_change = n_iter_no_change
+        self.tol = tol
+        self.num_threads = num_threads
+        self.random_state = random_state
+
+    activation = 'relu'
+    out_activation_ = 'softmax'
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> 'TorchMLPClassifier':
+        """Entraîne le réseau sur (X, y) et copie ses poids dans `coefs_` / `intercepts_`."""
+        if self.max_epochs < 1:
+            raise ValueError(f"max_epochs doit être au moins 1: {self.max_epochs}")
+        start_time = time.time()
+        X = np.asarray(X, dtype=np.float32)
+        self.classes_, y_encoded = np.unique(np.asarray(y), return_inverse=True)
+        n_classes = len(self.classes_)
+
+        if self.random_state is not None:
+            torch.manual_seed(self.random_state)
+        previous_threads = torch.get_num_threads()
+        torch.set_num_threads(self.num_threads or os.cpu_count() or previous_threads)
+        try:
+            X_train, y_train, X_val, y_val = self._split(X, y_encoded)
+            weight = None
+            if self.class_weight == 'balanced':
+                weight = torch.tensor(balanced_class_weights(y_train, n_classes), dtype=torch.float32)
+            elif self.class_weight is not None:
+                raise ValueError(f"class_weight non pris en charge: {self.class_weight}")
+
+            network = build_network(X.shape[1], tuple(self.hidden_layer_sizes), n_classes)
+            criterion = nn.CrossEntropyLoss(weight=weight)
+            optimizer = torch.optim.Adam(network.parameters(), lr=self.learning_rate_init, weight_decay=self.alpha)
+            generator = torch.Generator()
+            if self.random_state is not None:
+                generator.manual_seed(self.random_state)
+            # Un mini-lot est lu d'un seul accès au dataset (indices du lot), sans assemblage exemple par exemple
+            dataset = FAQDataset(X_train, y_train)
+            sampler = BatchSampler(RandomSampler(dataset, generator=generator), self.batch_size, drop_last=False)
+            dataloader = DataLoader(dataset, batch_size=None, sampler=sampler)
+            validation = (torch.from_numpy(X_val), torch.from_numpy(y_val)) if X_val is not None else None
+
+            self.loss_curve_ = []
+            self.validation_scores_ = []
+            best_loss, best_state, no_change = np.inf, None, 0
+            for epoch in range(self.max_epochs):
+                network.train()
+                total_loss = 0.0
+                for inputs, targets in dataloader:
+                    optimizer.zero_grad()
+                    loss = criterion(network(inputs), targets)
+                    loss.backward()
+                    optimizer.step()
+                    total_loss += loss.item() * len(targets)
+                self.loss_curve_.append(total_loss / len(y_train))
+
+                # Arrêt sur la perte de validation (perte d'entraînement sans validation)
+                if validation is not None:
+                    network.eval()
+                    with torch.no_grad():
+                        monitored = criterion(network(validation[0]), validation[1]).item()
+                    self.validation_scores_.append(monitored)
+                else:
+                    monitored = self.loss_curve_[-1]
+                if not (np.isfinite(self.loss_curve_[-1]) and np.isfinite(monitored)):
+                    raise ValueError(
+                        f"Perte non finie à l'époque {epoch + 1} : données invalides (NaN, infini) "
+                        f"ou learning_rate_init trop grand ({self.learning_rate_init})"
+                    )
+
+                if monitored < best_loss - self.tol:
+                    best_loss, no_change = monitored, 0
+                    best_state = copy.deepcopy(network.state_dict())
+                else:
+                    no_change += 1
+                    if no_change >= self.n_iter_no_change:
+                        break
+            self.n_iter_ = epoch + 1
+            self.best_loss_ = float(best_loss)
+            network.load_state_dict(best_state)
+        finally:
+            torch.set_num_threads(previous_threads)
+
+        linears = [layer for layer in network if isinstance(layer, nn.Linear)]
+        self.coefs_ = [layer.weight.detach().numpy().T.copy() for layer in linears]
+        self.intercepts_ = [layer.bias.detach().numpy().copy() for layer in linears]
+        self.n_features_in_ = X.shape[1]
+        monitored_name = "perte de validation" if validation is not None else "perte d'entraînement"
+        logger.info(f"Réseau entraîné en {time.time() - start_time:.2f} secondes ({self.n_iter_} époques, "
+                    f"meilleure {monitored_name} {self.best_loss_:.4f})")
+        return self
+
+    def _split(self, X: np.ndarray, y: np.ndarray):
+        """Jeu d'entraînement et de validation stratifié (validation None sans early stopping)."""
+        if not self.early_stopping:
+            return X, y, None, None
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=self.validation_fraction, random_state=self.random_state, stratify=y
+        )
+        return X_train, y_train, X_val, y_val
+
+    def _head(self) -> InferenceHead:
+        return InferenceHead(self.coefs_, self.intercepts_, self.activation, self.out_activation_,
+                             self.classes_, [str(label) for label in self.classes_])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilités par classe, calculées comme la tête de service (NumPy)."""
+        return self._head().predict_proba(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self._head().predict(X)
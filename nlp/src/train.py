@@ -1,8 +1,11 @@
 import argparse
+import json
 import logging
+import shutil
 import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import Optional
 from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
 import joblib
 import matplotlib.pyplot as plt
@@ -11,8 +14,13 @@ from sklearn.metrics import confusion_matrix, classification_report
 from collections import Counter
 
 from src.config import *
+from src.augmentation import FORMULATION_TEMPLATES
 from src.data_preprocessing import DataPreprocessor
+from src.fused_model import export_fused
 from src.model import FAQClassifier
+from src.model_singleton import ModelSingleton
+from src.normalization import REQUEST_PREFIXES
+from src.stage_cache import StageCache, file_digest
 from src.utils import setup_logging, save_metrics, calculate_metrics
 
 def parse_args():
@@ -24,26 +32,99 @@ def parse_args():
     parser.add_argument('--random-state', type=int, default=RANDOM_STATE,
                        help='Graine aléatoire pour la reproductibilité')
     parser.add_argument('--save-embeddings', action='store_true',
-                       help='Sauvegarder les embeddings')
+                       help="Copier les embeddings de l'étape embed dans MODELS_DIR/embeddings.npy")
     parser.add_argument('--cv-folds', type=int, default=5,
                        help='Nombre de folds pour la validation croisée')
+    parser.add_argument('--augment', action='store_true',
+                       help='Ajouter les variations des questions (AUGMENTATION_METHODS) aux données')
+    parser.add_argument('--backend', choices=['sklearn', 'torch'], default=CLASSIFIER_BACKEND,
+                       help="Backend d'entraînement du MLP (SMOTE + MLPClassifier ou PyTorch avec perte pondérée)")
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Recalculer toutes les étapes sans lire ni écrire le cache des étapes')
     return parser.parse_args()
 
+def _save_frame(df: pd.DataFrame, path: Path):
+    df.to_csv(path / "data.csv", index=False)
+
+def _load_frame(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path / "data.csv", keep_default_na=False)
+
+def _save_array(X: np.ndarray, path: Path):
+    np.save(path / "embeddings.npy", X)
+
+def _load_array(path: Path) -> np.ndarray:
+    return np.load(path / "embeddings.npy")
+
+def _save_resampled(data: tuple, path: Path):
+    np.savez(path / "resampled.npz", X=data[0], y=np.asarray(data[1]))
+
+def _load_resampled(path: Path) -> tuple:
+    with np.load(path / "resampled.npz") as data:
+        return data['X'], data['y']
+
+def _save_scores(scores: np.ndarray, path: Path):
+    save_metrics({'scores': scores.tolist()}, path / "cv_scores.json")
+
+def _load_scores(path: Path) -> np.ndarray:
+    with open(path / "cv_scores.json", encoding='utf-8') as f:
+        return np.array(json.load(f)['scores'])
+
+def _smote_params(classifier: FAQClassifier) -> Optional[dict]:
+    """Paramètres de l'étape SMOTE du pipeline (None sans SMOTE, backend 'torch')."""
+    steps = classifier.model.named_steps
+    return steps['smote'].get_params() if 'smote' in steps else None
+
+def _fit(classifier: FAQClassifier, X: np.ndarray, y: np.ndarray, label_encoder, fingerprint: str) -> FAQClassifier:
+    classifier.fit(X, y, label_encoder)
+    classifier.encoder_fingerprint = fingerprint
+    return classifier
+
 def train_model(args):
+    """
+    Entraîne le classifieur par étapes (nettoyage, augmentation, embeddings,
+    rééchantillonnage, entraînement), chacune mise en cache sous une clé
+    dérivée de ses entrées et de sa configuration (voir StageCache) : seules
+    les étapes en aval de ce qui a changé sont recalculées.
+    """
     logger = logging.getLogger(__name__)
     logger.info("Début de l'entraînement...")
-
-    # Chargement des données
-    logger.info(f"Chargement des données depuis {args.data}")
-    df = pd.read_csv(args.data)
+    cache = StageCache(enabled=STAGE_CACHE_ENABLED and not args.no_cache)
     
-    # Préparation des données
-    logger.info("Préparation des données...")
+    # Chargement et nettoyage des données
+    logger.info(f"Chargement des données depuis {args.data}")
+    clean_key = cache.key('clean', {'data': file_digest(Path(args.data)), 'prefixes': REQUEST_PREFIXES})
+    df = cache.run('clean', clean_key,
+                   lambda: DataPreprocessor.clean_data(pd.read_csv(args.data)).reset_index(drop=True),
+                   _save_frame, _load_frame)
+    data_key = clean_key
+    
+    # Augmentation (le résultat est gardé par le cache des étapes, pas dans AUGMENTATION_CACHE_DIR)
+    if args.augment:
+        data_key = cache.key('augment', {
+            'methods': AUGMENTATION_METHODS, 'num_aug': NUM_AUGMENTATIONS,
+            'seed': RANDOM_STATE, 'templates': FORMULATION_TEMPLATES
+        }, [clean_key])
+        df = cache.run('augment', data_key,
+                       lambda: DataPreprocessor.augment_data(df, cache_dir=None).reset_index(drop=True),
+                       _save_frame, _load_frame)
+    
+    # Encodage des catégories (quelques millisecondes, non mis en cache)
     preprocessor = DataPreprocessor()
-    X, y = preprocessor.prepare_data(df)
+    y = preprocessor.encode_labels(df)
+    
+    # Embeddings : propres à l'encodeur (empreinte) et aux questions
+    fingerprint = ModelSingleton().get_fingerprint()
+    embed_key = cache.key('embed', {'encoder': fingerprint}, [data_key])
+    X = cache.run('embed', embed_key,
+                  lambda: preprocessor.embed_batch(df['question_clean'].tolist(), normalize=False),
+                  _save_array, _load_array)
     
     if args.save_embeddings:
-        np.save(MODELS_DIR / "embeddings.npy", X)
+        # Copie du fichier de l'étape embed plutôt qu'une nouvelle sérialisation
+        if cache.enabled:
+            shutil.copyfile(cache.path('embed', embed_key) / "embeddings.npy", MODELS_DIR / "embeddings.npy")
+        else:
+            np.save(MODELS_DIR / "embeddings.npy", X)
         logger.info("Embeddings sauvegardés")
     
     # Split train/test avec stratification
@@ -54,6 +135,7 @@ def train_model(args):
         random_state=args.random_state,
         stratify=y
     )
+    split_params = {'test_size': args.test_size, 'random_state': args.random_state}
     
     # Vérifier la distribution des classes
     class_counts = Counter(y_train)
@@ -66,26 +148,42 @@ def train_model(args):
         logger.warning("Trop peu d'échantillons pour la validation croisée. Utilisation d'un seul fold.")
         n_folds = 1
     
+    classifier = FAQClassifier()
+    classifier.backend = args.backend
+    mlp_params = dict(classifier.model.named_steps['classifier'].get_params(),
+                      backend=args.backend, temperature=classifier.temperature)
+    
     logger.info(f"Validation croisée ({n_folds} folds)...")
     cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=args.random_state)
-    classifier = FAQClassifier()
+    cv_key = cache.key('cv', dict(split_params, n_folds=n_folds, mlp=mlp_params,
+                                  smote=_smote_params(classifier)), [embed_key])
     
     try:
         # Scores de validation croisée
-        cv_scores = cross_val_score(
+        cv_scores = cache.run('cv', cv_key, lambda: cross_val_score(
             classifier.model, X_train, y_train, 
             cv=cv, scoring='f1_weighted',
             error_score='raise'
-        )
+        ), _save_scores, _load_scores)
         logger.info(f"Scores de validation croisée: {cv_scores}")
         logger.info(f"Moyenne des scores CV: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
     except Exception as e:
         logger.warning(f"Erreur lors de la validation croisée: {str(e)}")
         logger.info("Continuation avec l'entraînement direct...")
     
+    # Rééchantillonnage (SMOTE) du jeu d'entraînement
+    classifier.configure_smote(y_train)
+    resample_key = cache.key('resample', dict(split_params, smote=_smote_params(classifier)), [embed_key])
+    X_resampled, y_resampled = cache.run('resample', resample_key,
+                                         lambda: classifier.resample(X_train, y_train),
+                                         _save_resampled, _load_resampled)
+    
     # Entraînement final
     logger.info("Entraînement du modèle final...")
-    classifier.train(X_train, y_train, preprocessor.label_encoder)
+    fit_key = cache.key('fit', {'mlp': mlp_params}, [resample_key])
+    classifier = cache.run('fit', fit_key,
+                           lambda: _fit(classifier, X_resampled, y_resampled, preprocessor.label_encoder, fingerprint),
+                           lambda classifier, path: classifier.save(path), FAQClassifier.load)
     
     # Évaluation sur le test set
     logger.info("Évaluation sur le jeu de test...")
@@ -122,6 +220,15 @@ def train_model(args):
     logger.info("Sauvegarde des modèles...")
     classifier.save()
     
+    # Modèle fusionné (encodeur + pooling + tête) servi par le moteur sur CPU
+    if FUSED_MODEL_ENABLED:
+        try:
+            export_fused(classifier)
+        except Exception as e:
+            logger.warning(f"Export du modèle fusionné impossible, le moteur utilisera l'encodeur seul: {str(e)}")
+    
+    logger.info("\n" + cache.report())
+    save_metrics(cache.summary(), MODELS_DIR / "training_stages.json")
     logger.info("Entraînement terminé avec succès!")
 
 if __name__ == "__main__":
@@ -1,9 +1,16 @@
 import logging
+import hashlib
 import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 import numpy as np
-from sklearn.metrics import precision_recall_fscore_support
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
 
 def setup_logging(level=logging.INFO):
     """Configure le logging pour le projet."""
@@ -19,6 +26,8 @@ def save_metrics(metrics: Dict[str, Any], filepath: Path):
 
 def calculate_metrics(y_true, y_pred, labels=None):
     """Calcule les métriques détaillées de classification."""
+    from sklearn.metrics import precision_recall_fscore_support
+    
     precision, recall, f1, support = precision_recall_fscore_support(
         y_true, y_pred, labels=labels, average=None
     )
@@ -40,3 +49,27 @@ class NumpyEncoder(json.JSONEncoder):
         if isinstance(obj, np.floating):
             return float(obj)
         return super().default(obj)
+
+@contextmanager
+def file_lock(file, exclusive: bool = True):
+    """Verrou consultatif inter-processus sur un fichier ouvert (sans effet hors POSIX)."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+def artifact_version(paths: Iterable[Path]) -> str:
+    """Retourne une version courte d'un ensemble de fichiers (chemin, date de modification, taille)."""
+    digest = hashlib.sha1()
+    for path in sorted(str(p) for p in paths):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            digest.update(f"{path}:absent;".encode('utf-8'))
+            continue
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode('utf-8'))
+    return digest.hexdigest()[:12]